@@ -31,6 +31,8 @@ has identified.
 # __all__ should order by constants, event classes, other classes, functions.
 __all__ = ['EvtNewRawCameraImage', 'CameraConfig', 'Camera']
 
+import collections
+import concurrent.futures
 import functools
 import io
 
@@ -88,6 +90,7 @@ class EvtNewRawCameraImage(event.Event):
     to both the raw image and a scaled and annotated version.
     '''
     image = 'A PIL.Image.Image object'
+    robot_timestamp = "The robot's timestamp for the image, in milliseconds"
 
 
 class CameraConfig:
@@ -213,6 +216,14 @@ class Camera(event.Dispatcher):
         self._gain = 0.0
         self._exposure_ms = 0
         self._auto_exposure_enabled = True
+        self._decode_executor = None
+        self._owns_decode_executor = False
+        # (future, image_id, robot_timestamp) for images being decoded by the
+        # executor, oldest first
+        self._pending_decodes = collections.deque()
+        self._decoded_image_count = 0
+        self._dropped_image_count = 0
+        self._failed_image_count = 0
 
         if np is None:
             logger.warning("Camera image processing not available due to missng NumPy or Pillow packages: %s" % _img_processing_available)
@@ -268,6 +279,54 @@ class Camera(event.Dispatcher):
                                                       gain=gain)
         self.robot.conn.send_msg(msg)
 
+    def enable_decode_executor(self, max_workers=1, use_processes=False, executor=None):
+        '''Decode camera images away from the event loop.
+
+        By default received images are decoded (and color images resized)
+        on the event loop's thread, which holds up the processing of all
+        other messages from the robot while each image is decoded.
+
+        Once enabled, completed images are handed to an executor for decoding
+        and :class:`EvtNewRawCameraImage` is dispatched back on the event loop
+        once decoding is complete.  Images are always dispatched in the order
+        they were received; an image is dropped, rather than dispatched late,
+        if a newer image finishes decoding first or arrives while it is still
+        waiting for a free worker.
+
+        Args:
+            max_workers (int): The number of worker threads or processes to
+                create.  Ignored if ``executor`` is supplied.
+            use_processes (bool): Decode in a
+                :class:`concurrent.futures.ProcessPoolExecutor` rather than a
+                :class:`concurrent.futures.ThreadPoolExecutor`.
+            executor (:class:`concurrent.futures.Executor`): Optionally
+                supply an existing executor to use.  It will not be shut down
+                by :meth:`disable_decode_executor`.
+        '''
+        self.disable_decode_executor()
+        if executor is None:
+            if use_processes:
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            self._owns_decode_executor = True
+        self._decode_executor = executor
+
+    def disable_decode_executor(self):
+        '''Return to decoding camera images on the event loop.
+
+        Any images still being decoded are dropped.  This is called
+        automatically when the connection to the robot is closed.
+        '''
+        for fut, image_id, robot_timestamp in self._pending_decodes:
+            fut.cancel()
+            self._dropped_image_count += 1
+        self._pending_decodes.clear()
+        if self._owns_decode_executor:
+            self._decode_executor.shutdown(wait=False)
+        self._decode_executor = None
+        self._owns_decode_executor = False
+
     #### Private Methods ####
 
     def _reset_partial_state(self):
@@ -330,6 +389,23 @@ class Camera(event.Dispatcher):
         msg = _clad_to_engine_iface.EnableColorImages(enable = enabled)
         self.robot.conn.send_msg(msg)
 
+    @property
+    def decoded_image_count(self):
+        '''int: The number of images decoded and dispatched.'''
+        return self._decoded_image_count
+
+    @property
+    def dropped_image_count(self):
+        '''int: The number of complete images dropped by the decode executor
+        as they were superseded by a newer image before they were decoded.
+        '''
+        return self._dropped_image_count
+
+    @property
+    def failed_image_count(self):
+        '''int: The number of complete images the decode executor failed to decode.'''
+        return self._failed_image_count
+
     @property
     def config(self):
         ''':class:`cozmo.camera.CameraConfig`: The read-only config/calibration for the camera'''
@@ -403,141 +479,196 @@ class Camera(event.Dispatcher):
 
     def _process_completed_image(self):
         data = self._partial_data[0:self._partial_size]
-        
-        # The first byte of the image is whether or not it is in color
-        is_color_image = data[0] != 0
-        
-        if self._partial_metadata.imageEncoding ==  _clad_to_game_cozmo.ImageEncoding.JPEGMinimizedGray:
-            width, height = RESOLUTIONS[self._partial_metadata.resolution]
-            
-            if is_color_image:
-                # Color images are half width
-                width = width // 2
-                data = _minicolor_to_jpeg(data, width, height)
-            else:
-                data = _minigray_to_jpeg(data, width, height)
-                
-        image = Image.open(io.BytesIO(data)).convert('RGB')
+        metadata = self._partial_metadata
 
-        # Color images need to be resized to the proper resolution
-        if is_color_image:
-            size = RESOLUTIONS[self._partial_metadata.resolution]
-            image = image.resize(size)
-        
+        if self._decode_executor is None:
+            image = _decode_image(data, metadata.imageEncoding, metadata.resolution)
+            self._dispatch_decoded_image(image, metadata.frameTimeStamp)
+            return
+
+        # Anything still waiting for a worker is now stale.
+        for pending in list(self._pending_decodes):
+            if pending[0].cancel():
+                self._pending_decodes.remove(pending)
+                self._dropped_image_count += 1
+
+        fut = self._decode_executor.submit(_decode_image, data,
+                metadata.imageEncoding, metadata.resolution)
+        self._pending_decodes.append((fut, metadata.imageId, metadata.frameTimeStamp))
+        fut.add_done_callback(self._on_image_decoded)
+
+    def _on_image_decoded(self, fut):
+        # called from an executor thread
+        if fut.cancelled():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch_pending_images)
+        except RuntimeError:
+            # loop has been closed
+            pass
+
+    def _dispatch_pending_images(self):
+        # Find the newest image that has finished decoding; anything older
+        # that's still being decoded has been superseded by it.
+        last_done = None
+        for i, (fut, image_id, robot_timestamp) in enumerate(self._pending_decodes):
+            if fut.done():
+                last_done = i
+        if last_done is None:
+            return
+
+        for i in range(last_done + 1):
+            fut, image_id, robot_timestamp = self._pending_decodes.popleft()
+            if not fut.done():
+                fut.cancel()
+                self._dropped_image_count += 1
+                continue
+            try:
+                image = fut.result()
+            except Exception as exc:
+                logger.error("Failed to decode camera image id=%s: %s", image_id, exc)
+                self._failed_image_count += 1
+                continue
+            self._dispatch_decoded_image(image, robot_timestamp)
+
+    def _dispatch_decoded_image(self, image, robot_timestamp):
+        self._decoded_image_count += 1
         self._latest_image = image
-        self.dispatch_event(EvtNewRawCameraImage, image=image)
+        self.dispatch_event(EvtNewRawCameraImage, image=image, robot_timestamp=robot_timestamp)
 
 
     #### Public Event Handlers ####
 
 
+def _decode_image(data, encoding, resolution):
+    '''Decodes a completed image to an RGB PIL image.
+
+    May be run in an executor, so must not touch any SDK state.
+    '''
+    # The first byte of the image is whether or not it is in color
+    is_color_image = data[0] != 0
+
+    if encoding == _clad_to_game_cozmo.ImageEncoding.JPEGMinimizedGray:
+        width, height = RESOLUTIONS[resolution]
+
+        if is_color_image:
+            # Color images are half width
+            width = width // 2
+            data = _minicolor_to_jpeg(data, width, height)
+        else:
+            data = _minigray_to_jpeg(data, width, height)
+
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+
+    # Color images need to be resized to the proper resolution
+    if is_color_image:
+        size = RESOLUTIONS[resolution]
+        image = image.resize(size)
+
+    return image
+
+
+# JPEG headers for the minimized image formats, patched with the
+# height and width of each image at offset 0x5e.
+# This should be 'exactly' what is done in the miniGrayToJpeg function in encodedImage.cpp
+_MINIGRAY_JPEG_HEADER = bytes([
+    0xFF, 0xD8, 0xFF, 0xE0, 0x00, 0x10, 0x4A, 0x46, 0x49, 0x46, 0x00, 0x01, 0x01, 0x00, 0x00, 0x01,
+    0x00, 0x01, 0x00, 0x00, 0xFF, 0xDB, 0x00, 0x43, 0x00, 0x10, 0x0B, 0x0C, 0x0E, 0x0C, 0x0A, 0x10, #// 0x19 = QTable
+    0x0E, 0x0D, 0x0E, 0x12, 0x11, 0x10, 0x13, 0x18, 0x28, 0x1A, 0x18, 0x16, 0x16, 0x18, 0x31, 0x23,
+    0x25, 0x1D, 0x28, 0x3A, 0x33, 0x3D, 0x3C, 0x39, 0x33, 0x38, 0x37, 0x40, 0x48, 0x5C, 0x4E, 0x40,
+    0x44, 0x57, 0x45, 0x37, 0x38, 0x50, 0x6D, 0x51, 0x57, 0x5F, 0x62, 0x67, 0x68, 0x67, 0x3E, 0x4D,
+
+    #//0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 0x0B, 0x08, 0x00, 0xF0, #// 0x5E = Height x Width
+    0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 0x0B, 0x08, 0x01, 0x28, #// 0x5E = Height x Width
+
+    #//0x01, 0x40, 0x01, 0x01, 0x11, 0x00, 0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
+    0x01, 0x90, 0x01, 0x01, 0x11, 0x00, 0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
+
+    0x01, 0x01, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x02, 0x03, 0x04,
+    0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x10, 0x00, 0x02, 0x01, 0x03, 0x03, 0x02, 0x04, 0x03,
+    0x05, 0x05, 0x04, 0x04, 0x00, 0x00, 0x01, 0x7D, 0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12,
+    0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07, 0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xA1, 0x08,
+    0x23, 0x42, 0xB1, 0xC1, 0x15, 0x52, 0xD1, 0xF0, 0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0A, 0x16,
+    0x17, 0x18, 0x19, 0x1A, 0x25, 0x26, 0x27, 0x28, 0x29, 0x2A, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39,
+    0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49, 0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59,
+    0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69, 0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79,
+    0x7A, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89, 0x8A, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98,
+    0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7, 0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
+    0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3, 0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2, 0xD3, 0xD4,
+    0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA, 0xE1, 0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0xEA,
+    0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8, 0xF9, 0xFA, 0xFF, 0xDA, 0x00, 0x08, 0x01, 0x01,
+    0x00, 0x00, 0x3F, 0x00
+])
+
+# This should be 'exactly' what is done in the miniColorToJpeg function in encodedImage.cpp
+_MINICOLOR_JPEG_HEADER = bytes([
+    0xFF, 0xD8, 0xFF, 0xE0, 0x00, 0x10, 0x4A, 0x46, 0x49, 0x46, 0x00, 0x01, 0x01, 0x00, 0x00, 0x01,
+    0x00, 0x01, 0x00, 0x00, 0xFF, 0xDB, 0x00, 0x43, 0x00, 0x10, 0x0B, 0x0C, 0x0E, 0x0C, 0x0A, 0x10, # 0x19 = QTable
+    0x0E, 0x0D, 0x0E, 0x12, 0x11, 0x10, 0x13, 0x18, 0x28, 0x1A, 0x18, 0x16, 0x16, 0x18, 0x31, 0x23,
+    0x25, 0x1D, 0x28, 0x3A, 0x33, 0x3D, 0x3C, 0x39, 0x33, 0x38, 0x37, 0x40, 0x48, 0x5C, 0x4E, 0x40,
+    0x44, 0x57, 0x45, 0x37, 0x38, 0x50, 0x6D, 0x51, 0x57, 0x5F, 0x62, 0x67, 0x68, 0x67, 0x3E, 0x4D,
+    0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 17, # 8+3*components
+    0x08, 0x00, 0xF0, # 0x5E = Height x Width
+    0x01, 0x40,
+    0x03, # 3 components
+    0x01, 0x21, 0x00, # Y 2x1 res
+    0x02, 0x11, 0x00, # Cb
+    0x03, 0x11, 0x00, # Cr
+    0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
+    0x01, 0x01, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x02, 0x03, 0x04,
+    0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x10, 0x00, 0x02, 0x01, 0x03, 0x03, 0x02, 0x04, 0x03,
+    0x05, 0x05, 0x04, 0x04, 0x00, 0x00, 0x01, 0x7D, 0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12,
+    0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07, 0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xA1, 0x08,
+    0x23, 0x42, 0xB1, 0xC1, 0x15, 0x52, 0xD1, 0xF0, 0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0A, 0x16,
+    0x17, 0x18, 0x19, 0x1A, 0x25, 0x26, 0x27, 0x28, 0x29, 0x2A, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39,
+    0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49, 0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59,
+    0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69, 0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79,
+    0x7A, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89, 0x8A, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98,
+    0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7, 0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
+    0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3, 0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2, 0xD3, 0xD4,
+    0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA, 0xE1, 0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0xEA,
+    0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8, 0xF9, 0xFA,
+    0xFF, 0xDA, 0x00, 12,
+    0x03, # 3 components
+    0x01, 0x00, # Y
+    0x02, 0x00, # Cb same AC/DC
+    0x03, 0x00, # Cr same AC/DC
+    0x00, 0x3F, 0x00
+])
+
+
 @_require_img_processing
 def _minigray_to_jpeg(minigray, width, height):
-        "Converts miniGrayToJpeg format to normal jpeg format"
-        #This should be 'exactly' what is done in the miniGrayToJpeg function in encodedImage.cpp
-        header50 = np.array([
-              0xFF, 0xD8, 0xFF, 0xE0, 0x00, 0x10, 0x4A, 0x46, 0x49, 0x46, 0x00, 0x01, 0x01, 0x00, 0x00, 0x01,
-              0x00, 0x01, 0x00, 0x00, 0xFF, 0xDB, 0x00, 0x43, 0x00, 0x10, 0x0B, 0x0C, 0x0E, 0x0C, 0x0A, 0x10, #// 0x19 = QTable
-              0x0E, 0x0D, 0x0E, 0x12, 0x11, 0x10, 0x13, 0x18, 0x28, 0x1A, 0x18, 0x16, 0x16, 0x18, 0x31, 0x23,
-              0x25, 0x1D, 0x28, 0x3A, 0x33, 0x3D, 0x3C, 0x39, 0x33, 0x38, 0x37, 0x40, 0x48, 0x5C, 0x4E, 0x40,
-              0x44, 0x57, 0x45, 0x37, 0x38, 0x50, 0x6D, 0x51, 0x57, 0x5F, 0x62, 0x67, 0x68, 0x67, 0x3E, 0x4D,
-
-              #//0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 0x0B, 0x08, 0x00, 0xF0, #// 0x5E = Height x Width
-              0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 0x0B, 0x08, 0x01, 0x28, #// 0x5E = Height x Width
-
-              #//0x01, 0x40, 0x01, 0x01, 0x11, 0x00, 0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
-              0x01, 0x90, 0x01, 0x01, 0x11, 0x00, 0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
-
-              0x01, 0x01, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x02, 0x03, 0x04,
-              0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x10, 0x00, 0x02, 0x01, 0x03, 0x03, 0x02, 0x04, 0x03,
-              0x05, 0x05, 0x04, 0x04, 0x00, 0x00, 0x01, 0x7D, 0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12,
-              0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07, 0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xA1, 0x08,
-              0x23, 0x42, 0xB1, 0xC1, 0x15, 0x52, 0xD1, 0xF0, 0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0A, 0x16,
-              0x17, 0x18, 0x19, 0x1A, 0x25, 0x26, 0x27, 0x28, 0x29, 0x2A, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39,
-              0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49, 0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59,
-              0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69, 0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79,
-              0x7A, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89, 0x8A, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98,
-              0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7, 0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
-              0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3, 0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2, 0xD3, 0xD4,
-              0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA, 0xE1, 0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0xEA,
-              0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8, 0xF9, 0xFA, 0xFF, 0xDA, 0x00, 0x08, 0x01, 0x01,
-              0x00, 0x00, 0x3F, 0x00
-            ], dtype=np.uint8)
-        
-        return _mini_to_jpeg_helper(minigray, width, height, header50)
+    "Converts miniGrayToJpeg format to normal jpeg format"
+    return _mini_to_jpeg_helper(minigray, width, height, _MINIGRAY_JPEG_HEADER)
+
 
 @_require_img_processing
 def _minicolor_to_jpeg(minicolor, width, height):
-        "Converts miniColorToJpeg format to normal jpeg format"
-        #This should be 'exactly' what is done in the miniColorToJpeg function in encodedImage.cpp
-        header = np.array([
-             0xFF, 0xD8, 0xFF, 0xE0, 0x00, 0x10, 0x4A, 0x46, 0x49, 0x46, 0x00, 0x01, 0x01, 0x00, 0x00, 0x01,
-             0x00, 0x01, 0x00, 0x00, 0xFF, 0xDB, 0x00, 0x43, 0x00, 0x10, 0x0B, 0x0C, 0x0E, 0x0C, 0x0A, 0x10, # 0x19 = QTable
-             0x0E, 0x0D, 0x0E, 0x12, 0x11, 0x10, 0x13, 0x18, 0x28, 0x1A, 0x18, 0x16, 0x16, 0x18, 0x31, 0x23,
-             0x25, 0x1D, 0x28, 0x3A, 0x33, 0x3D, 0x3C, 0x39, 0x33, 0x38, 0x37, 0x40, 0x48, 0x5C, 0x4E, 0x40,
-             0x44, 0x57, 0x45, 0x37, 0x38, 0x50, 0x6D, 0x51, 0x57, 0x5F, 0x62, 0x67, 0x68, 0x67, 0x3E, 0x4D,
-             0x71, 0x79, 0x70, 0x64, 0x78, 0x5C, 0x65, 0x67, 0x63, 0xFF, 0xC0, 0x00, 17, # 8+3*components
-             0x08, 0x00, 0xF0, # 0x5E = Height x Width
-             0x01, 0x40,
-             0x03, # 3 components
-             0x01, 0x21, 0x00, # Y 2x1 res
-             0x02, 0x11, 0x00, # Cb
-             0x03, 0x11, 0x00, # Cr
-             0xFF, 0xC4, 0x00, 0xD2, 0x00, 0x00, 0x01, 0x05, 0x01, 0x01,
-             0x01, 0x01, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x02, 0x03, 0x04,
-             0x05, 0x06, 0x07, 0x08, 0x09, 0x0A, 0x0B, 0x10, 0x00, 0x02, 0x01, 0x03, 0x03, 0x02, 0x04, 0x03,
-             0x05, 0x05, 0x04, 0x04, 0x00, 0x00, 0x01, 0x7D, 0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12,
-             0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07, 0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xA1, 0x08,
-             0x23, 0x42, 0xB1, 0xC1, 0x15, 0x52, 0xD1, 0xF0, 0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0A, 0x16,
-             0x17, 0x18, 0x19, 0x1A, 0x25, 0x26, 0x27, 0x28, 0x29, 0x2A, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39,
-             0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49, 0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59,
-             0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69, 0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79,
-             0x7A, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89, 0x8A, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98,
-             0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7, 0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
-             0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3, 0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2, 0xD3, 0xD4,
-             0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA, 0xE1, 0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0xEA,
-             0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8, 0xF9, 0xFA,
-             0xFF, 0xDA, 0x00, 12,
-             0x03, # 3 components
-             0x01, 0x00, # Y
-             0x02, 0x00, # Cb same AC/DC
-             0x03, 0x00, # Cr same AC/DC
-             0x00, 0x3F, 0x00
-            ], dtype=np.uint8)
-
-        return _mini_to_jpeg_helper(minicolor, width, height, header)
+    "Converts miniColorToJpeg format to normal jpeg format"
+    return _mini_to_jpeg_helper(minicolor, width, height, _MINICOLOR_JPEG_HEADER)
+
 
 @_require_img_processing
 def _mini_to_jpeg_helper(mini, width, height, header):
-        bufferIn = mini.tolist()
-        currLen = len(mini)
-
-        headerLength = len(header)
-        # For worst case expansion
-        bufferOut = np.array([0] * (currLen*2 + headerLength), dtype=np.uint8)
-
-        for i in range(headerLength):
-            bufferOut[i] = header[i]
-
-        bufferOut[0x5e] = height >> 8
-        bufferOut[0x5f] = height & 0xff
-        bufferOut[0x60] = width  >> 8
-        bufferOut[0x61] = width  & 0xff
-        # Remove padding at the end
-        while (bufferIn[currLen-1] == 0xff):
-            currLen -= 1
-
-        off = headerLength
-        for i in range(currLen-1):
-            bufferOut[off] = bufferIn[i+1]
-            off += 1
-            if (bufferIn[i+1] == 0xff):
-                bufferOut[off] = 0
-                off += 1
-
-        bufferOut[off] = 0xff
-        off += 1
-        bufferOut[off] = 0xD9
-
-        bufferOut[:off]
-        return np.asarray(bufferOut)
+    # Remove padding at the end
+    end = len(mini)
+    while end > 1 and mini[end-1] == 0xff:
+        end -= 1
+
+    # The first byte flags a color image and isn't part of the scan data.
+    # Every 0xFF in the scan data must be followed by a 0x00 stuff byte.
+    data = mini[1:end]
+    data = np.insert(data, np.flatnonzero(data == 0xff) + 1, 0)
+
+    header_length = len(header)
+    buffer_out = np.empty(header_length + len(data) + 2, dtype=np.uint8)
+    buffer_out[:header_length] = np.frombuffer(header, dtype=np.uint8)
+    buffer_out[0x5e] = height >> 8
+    buffer_out[0x5f] = height & 0xff
+    buffer_out[0x60] = width  >> 8
+    buffer_out[0x61] = width  & 0xff
+    buffer_out[header_length:-2] = data
+    buffer_out[-2] = 0xff
+    buffer_out[-1] = 0xD9
+    return buffer_out
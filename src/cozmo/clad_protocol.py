@@ -12,20 +12,164 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-__all__ = []
+__all__ = ['MessageTemplate', 'PackedMessage']
 
 
 import asyncio
+import collections
+import itertools
 import struct
 import sys
+import time
 
 from . import logger_protocol
+from . import metrics
+from . import recording
 
 LOG_ALL = 'all'
 
 if sys.byteorder != 'little':
     raise ImportError("Cozmo SDK doesn't support byte order '%s' - contact Anki support to request this", sys.byteorder)
 
+# messages are prefixed by a 2 byte length
+_size_prefix = struct.Struct('H')
+# ..followed by the 1 byte tag identifying the union member
+_frame_header = struct.Struct('HB')
+
+# union class -> {message name: tag}
+_union_tags = {}
+
+
+def _tags_for_union(union):
+    tags = _union_tags.get(union)
+    if tags is None:
+        tags = {name: tag for name, tag in vars(union.Tag).items()
+                if not name.startswith('_')}
+        _union_tags[union] = tags
+    return tags
+
+
+class _LayoutWriter:
+    '''Stands in for a msgbuffers.BinaryWriter to record a message's layout.
+
+    Only fixed size numeric fields and arrays are supported.
+    '''
+    def __init__(self):
+        # (struct format, length) of each field written
+        self.fields = []
+
+    def write(self, value, format):
+        self.write_farray((value,), format, 1)
+
+    def write_farray(self, value, format, length):
+        self.fields.append((format, length))
+
+    def __getattr__(self, name):
+        if name.startswith('write'):
+            raise ValueError('Message templates only support fixed size numeric fields (%s)' % name)
+        raise AttributeError(name)
+
+
+class PackedMessage(collections.namedtuple('PackedMessage', 'name tag frame objectID')):
+    '''An already framed message, as returned by :meth:`MessageTemplate.pack`.
+
+    Can be passed to :meth:`CLADProtocol.send_msg` in place of a CLAD message.
+
+    Attributes:
+        name (str): The name of the message.
+        tag (int): The message's union tag.
+        frame (bytes): The size prefixed, tagged message ready to be written.
+        objectID (int): The message's objectID field, if it has one.
+    '''
+    __slots__ = ()
+
+
+class MessageTemplate:
+    '''A message packed once, whose fields can then be changed cheaply.
+
+    Building, validating and packing a CLAD message costs far more than the
+    handful of bytes it produces.  A template packs an example message once,
+    along with its union tag and size prefix, and :meth:`pack` then just
+    patches new field values into that buffer with
+    :meth:`struct.Struct.pack_into`.
+
+    Only messages made up entirely of fixed size numeric fields (and fixed
+    length arrays of them) are supported.
+
+    Args:
+        msg: An example CLAD message, which supplies the initial field values.
+        union: The CLAD union the message is sent as a member of.
+    Raises:
+        ValueError: if the message has variable length or nested fields.
+    '''
+
+    def __init__(self, msg, union):
+        #: str: The name of the message.
+        self.name = msg.__class__.__name__
+        #: int: The message's union tag.
+        self.tag = _tags_for_union(union)[self.name]
+
+        writer = _LayoutWriter()
+        msg.pack_to(writer)
+        slots = msg.__slots__
+        if len(writer.fields) != len(slots):
+            raise ValueError('Cannot make a template of %s' % self.name)
+
+        body = msg.pack()
+        self._buf = bytearray(_frame_header.pack(len(body) + 1, self.tag) + body)
+        # field name -> (offset into _buf, struct, length)
+        self._fields = {}
+        offset = _frame_header.size
+        for slot, (format, length) in zip(slots, writer.fields):
+            packer = struct.Struct('<%d%s' % (length, format))
+            self._fields[slot.lstrip('_')] = (offset, packer, length)
+            offset += packer.size
+        self._has_object_id = 'objectID' in self._fields
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+    def _set(self, name, value):
+        try:
+            offset, packer, length = self._fields[name]
+        except KeyError:
+            raise ValueError('%s has no field called %s' % (self.name, name)) from None
+        try:
+            if length == 1:
+                packer.pack_into(self._buf, offset, value)
+            else:
+                packer.pack_into(self._buf, offset, *value)
+        except struct.error as e:
+            raise ValueError('Invalid value for %s.%s: %s' % (self.name, name, e)) from None
+
+    def get(self, name):
+        '''Returns the current value of a field.'''
+        offset, packer, length = self._fields[name]
+        values = packer.unpack_from(self._buf, offset)
+        return values[0] if length == 1 else values
+
+    def pack(self, **fields):
+        '''Update fields and return the resulting message.
+
+        Fields not passed keep the value they were last given.
+
+        Returns:
+            A :class:`PackedMessage`, which holds its own copy of the bytes so
+            is unaffected by later calls.
+        Raises:
+            ValueError: if a field doesn't exist or a value doesn't fit it.
+        '''
+        for name, value in fields.items():
+            self._set(name, value)
+        object_id = self.get('objectID') if self._has_object_id else None
+        return PackedMessage(self.name, self.tag, bytes(self._buf), object_id)
+
+
+def _msg_name(msg):
+    if type(msg) is PackedMessage:
+        return msg.name
+    return msg.__class__.__name__
+
 
 class CLADProtocol(asyncio.Protocol):
     '''Low level CLAD codec'''
@@ -34,17 +178,98 @@ class CLADProtocol(asyncio.Protocol):
     clad_encode_union = None
     _clad_log_which = None
 
+    #: int: Consumed bytes at the head of the receive buffer are only
+    #: discarded once the read cursor passes this point (or the buffer
+    #: has been fully consumed).
+    recv_compact_threshold = 64 * 1024
+
+    #: bool: If True, received messages are passed to :meth:`_skip_frame`
+    #: before being decoded, and discarded undecoded if it returns True.
+    lazy_decode = False
+
+    #: bool: If True, messages sent during one iteration of the event loop
+    #: are gathered and written to the transport in a single call once the
+    #: current iteration completes, or when :meth:`flush` is called.
+    write_gathering = True
+
+    #: bool: If True, the count and size of each message sent and received,
+    #: and the time taken to decode and route a sample of received
+    #: messages, are collected by message type (see :meth:`metrics`).
+    collect_metrics = True
+
+    #: int: Decode and route times are measured for one in every this
+    #: many received messages of each type, starting with the first.  Set to
+    #: 1 to time every message, or None to only collect counts.
+    metrics_timing_interval = 16
+
+    #: dict: The priority of each type of outgoing message, by message name.
+    #: While the transport has asked for writing to be paused, messages are
+    #: queued and then written highest priority (lowest number) first once
+    #: it resumes.  Messages that aren't listed have
+    #: :attr:`default_msg_priority`.
+    msg_priorities = {}
+
+    #: int: The priority of messages not listed in :attr:`msg_priorities`.
+    default_msg_priority = 0
+
+    #: int: Queued messages with this priority or lower (i.e. this number or
+    #: higher) may be dropped: a newer message of the same type (and target
+    #: object) replaces any queued one, and the oldest are dropped once the
+    #: queue is full.  None means no message is ever dropped.
+    droppable_msg_priority = None
+
+    #: dict: Messages that make every queued message of a given priority
+    #: stale, by message name.  While writing is paused, sending one of these
+    #: drops all queued messages of that priority so that none of them can be
+    #: written after it once writing resumes.
+    msg_supersedes = {}
+
+    #: int: The number of messages that may be queued while writing is
+    #: paused before droppable messages start being dropped.  Messages that
+    #: can't be dropped are queued regardless.
+    max_queued_msgs = 1000
+
     def __init__(self):
         super().__init__()
 
         self._buf = bytearray()
+        # read cursor into _buf; bytes before it have already been decoded.
+        self._buf_offset = 0
+        # optional recording.SessionRecorder capturing raw traffic
+        self._recorder = None
+        # framed messages waiting to be written by flush()
+        self._write_buf = []
+        self._flush_handle = None
+        self._encode_tags = None
+        if self.clad_encode_union is not None:
+            self._encode_tags = _tags_for_union(self.clad_encode_union)
+        self._metrics = metrics.ProtocolMetrics()
+        # metrics for the message most recently returned by decode_msg
+        self._decoded_stats = None
+        # messages held while the transport is paused: one OrderedDict of
+        # key -> (tag, frame) per priority, created as needed.
+        self._writing_paused = False
+        self._queues = {}
+        self._queued_count = 0
+        self._queue_keys = itertools.count()
 
     def connection_made(self, transport):
         self.transport = transport
+        if getattr(self, '_loop', None) is None:
+            self._loop = asyncio.get_event_loop()
         logger_protocol.debug('Connected to transport')
 
     def connection_lost(self, exc):
         logger_protocol.debug("Connnection to transport lost: %s" % exc)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        del self._write_buf[:]
+        self._queues.clear()
+        self._queued_count = 0
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
 
     def data_received(self, data):
         self._buf.extend(data)
@@ -52,45 +277,274 @@ class CLADProtocol(asyncio.Protocol):
 
         while True:
             msg = self.decode_msg()
-            if not msg:
+            # messages without any fields have zero length, so are falsy
+            if msg is None:
                 return
             name = msg.tag_name
             if self._clad_log_which is LOG_ALL or (self._clad_log_which is not None and name in self._clad_log_which):
                 logger_protocol.debug('RECV  %s',  msg._data)
-            self.msg_received(msg)
+            stats = self._decoded_stats
+            if stats is not None:
+                start = time.perf_counter()
+                self.msg_received(msg)
+                stats.route_time.record(time.perf_counter() - start)
+            else:
+                self.msg_received(msg)
 
     def decode_msg(self):
-        if len(self._buf) < 2:
-            return None
+        buf = self._buf
+        while True:
+            offset = self._buf_offset
+            if len(buf) - offset < 2:
+                self._compact_buf()
+                return None
+
+            # TODO: handle error
+            msg_size = _size_prefix.unpack_from(buf, offset)[0]
+            start = offset + 2
+            end = start + msg_size
+            if len(buf) < end:
+                self._compact_buf()
+                return None
+
+            self._buf_offset = end
+
+            # decode straight out of the receive buffer rather than copying the
+            # frame (and everything after it) into a new bytearray.
+            frame = memoryview(buf)[start:end]
+            if self._recorder is not None:
+                self._recorder.record(recording.DIRECTION_RECV, frame)
+            stats = None
+            if self.collect_metrics and msg_size:
+                counts = self._metrics.received(buf[start])
+                counts.count += 1
+                counts.bytes += msg_size + 2
+                interval = self.metrics_timing_interval
+                if interval and (counts.count - 1) % interval == 0:
+                    stats = counts
+            if self.lazy_decode and msg_size and self._skip_frame(buf[start]):
+                frame.release()
+                continue
+            self._decoded_stats = stats
+            try:
+                if stats is None:
+                    return self.clad_decode_union.unpack(frame)
+                decode_start = time.perf_counter()
+                msg = self.clad_decode_union.unpack(frame)
+                stats.decode_time.record(time.perf_counter() - decode_start)
+                return msg
+            except ValueError as e:
+                # skip the frame, carrying on with any that follow it
+                logger_protocol.warn("Failed to decode CLAD message for buflen=%d: %s", msg_size, e)
+                continue
+            finally:
+                frame.release()
 
-        # TODO: handle error
-        # messages are prefixed by a 2 byte length
-        msg_size = struct.unpack_from('H', self._buf)[0]
-        if len(self._buf) < 2 + msg_size:
-            return None
+    def _skip_frame(self, tag):
+        '''Returns True if a received message should be discarded undecoded.
 
-        buf, self._buf = self._buf[2:2+msg_size], self._buf[2+msg_size:]
+        Only called if :attr:`lazy_decode` is set.
 
+        Args:
+            tag (int): The union tag of the message, read from the raw frame.
+        '''
+        return False
+
+    def _compact_buf(self):
+        '''Discard already decoded bytes from the head of the receive buffer.
+
+        Called once no further complete frames are available.  The buffer is
+        only shifted once the read cursor passes :attr:`recv_compact_threshold`
+        so that a burst of small frames costs a single move rather than one
+        per frame.
+        '''
+        offset = self._buf_offset
+        if offset == 0:
+            return
+        if offset < len(self._buf) and offset < self.recv_compact_threshold:
+            return
         try:
-            return self.clad_decode_union.unpack(buf)
-        except ValueError as e:
-            logger_protocol.warn("Failed to decode CLAD message for buflen=%d: %s", len(buf), e)
+            del self._buf[:offset]
+        except BufferError:
+            # A decoded message kept a view of the buffer; leave it
+            # intact and carry on with a fresh copy of the unread tail.
+            self._buf = self._buf[offset:]
+        self._buf_offset = 0
 
     def eof_received(self):
         logger_protocol.info("EOF received on connection")
 
+    def pause_writing(self):
+        self._writing_paused = True
+        logger_protocol.debug('Transport paused writing')
+
+    def resume_writing(self):
+        self._writing_paused = False
+        queued = self._queued_count
+        # write out the queued messages, highest priority first
+        for priority in sorted(self._queues):
+            for tag, frame in self._queues[priority].values():
+                self._write_buf.append(frame)
+                self._frame_written(frame)
+        self._queues.clear()
+        self._queued_count = 0
+        logger_protocol.debug('Transport resumed writing with %d messages queued', queued)
+        self.flush()
+
     def send_msg(self, msg, **params):
+        '''Send a CLAD message, or a :class:`PackedMessage`.'''
+        if type(msg) is PackedMessage:
+            name, tag, frame = msg.name, msg.tag, msg.frame
+        else:
+            name = msg.__class__.__name__
+            tag = self._encode_tags[name]
+            frame = None
         if self.transport.is_closing():
+            logger_protocol.debug('Dropping %s sent to closed transport', name)
+            if self.collect_metrics:
+                self._metrics.sent(tag).dropped += 1
             return
-        name = msg.__class__.__name__
-        msg = self.clad_encode_union(**{name: msg})
-        msg_buf = msg.pack()
-        msg_size = struct.pack('H', len(msg_buf))
-        self.transport.write(msg_size)
-        self.transport.write(msg_buf)
+        if frame is None:
+            # Pack the message directly after its union tag, rather than
+            # wrapping it in a union instance first.
+            msg_buf = msg.pack()
+            frame = _frame_header.pack(len(msg_buf) + 1, tag) + msg_buf
+        if self._writing_paused:
+            superseded = self.msg_supersedes.get(name)
+            if superseded is not None:
+                self._drop_queued(superseded)
+            priority = self.msg_priorities.get(name, self.default_msg_priority)
+            key = None
+            if self.droppable_msg_priority is not None and priority >= self.droppable_msg_priority:
+                key = (name, getattr(msg, 'objectID', None))
+            self._queue_frame(tag, frame, priority, key)
+        else:
+            self._write_frame(frame)
         if self._clad_log_which is LOG_ALL or (self._clad_log_which is not None and name in self._clad_log_which):
             logger_protocol.debug("SENT %s", msg)
 
+    def _queue_frame(self, tag, frame, priority, key=None):
+        '''Hold a framed message until the transport resumes writing.
+
+        Args:
+            tag (int): The union tag of the message.
+            frame (bytes): The framed message.
+            priority (int): The message's priority; see :attr:`msg_priorities`.
+            key: If set, replaces any queued message with the same key.
+        '''
+        queue = self._queues.get(priority)
+        if queue is None:
+            queue = self._queues[priority] = collections.OrderedDict()
+        if key is None:
+            key = next(self._queue_keys)
+        elif key in queue:
+            # a newer message makes the queued one stale; removing it first
+            # means the replacement is written in the order it was sent.
+            del queue[key]
+            self._queued_count -= 1
+            self._record_drop(tag)
+        queue[key] = (tag, frame)
+        self._queued_count += 1
+
+        if self._queued_count > self.max_queued_msgs and self.droppable_msg_priority is not None:
+            # drop the oldest of the lowest priority droppable messages
+            for priority in sorted(self._queues, reverse=True):
+                if priority < self.droppable_msg_priority:
+                    break
+                queue = self._queues[priority]
+                if queue:
+                    dropped_tag, dropped_frame = queue.popitem(last=False)[1]
+                    self._queued_count -= 1
+                    self._record_drop(dropped_tag)
+                    break
+
+        if self.collect_metrics and self._queued_count > self._metrics.max_queue_depth:
+            self._metrics.max_queue_depth = self._queued_count
+
+    def _drop_queued(self, priority):
+        # Drops every message queued with the given priority.
+        queue = self._queues.pop(priority, None)
+        if not queue:
+            return
+        self._queued_count -= len(queue)
+        for tag, frame in queue.values():
+            self._record_drop(tag)
+
+    def _record_drop(self, tag):
+        if self.collect_metrics:
+            self._metrics.sent(tag).dropped += 1
+
+    def _frame_written(self, frame):
+        # Counts and records a frame handed to the transport.  Queued frames
+        # are only counted once written, as they may yet be dropped.
+        if self.collect_metrics and len(frame) > 2:
+            stats = self._metrics.sent(frame[2])
+            stats.count += 1
+            stats.bytes += len(frame)
+        if self._recorder is not None:
+            self._recorder.record(recording.DIRECTION_SEND, memoryview(frame)[2:])
+
+    def _write_frame(self, frame):
+        if self._writing_paused:
+            self._queue_frame(frame[2], frame, self.default_msg_priority)
+            return
+        self._frame_written(frame)
+        if not self.write_gathering:
+            self.transport.write(frame)
+            return
+        self._write_buf.append(frame)
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_soon(self.flush)
+
+    def flush(self):
+        '''Write any messages gathered by :meth:`send_msg` to the transport now.
+
+        Called automatically at the end of each event loop iteration in which
+        messages were sent; call it directly to avoid waiting for that.
+        '''
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._write_buf:
+            return
+        if not self.transport.is_closing():
+            self.transport.write(b''.join(self._write_buf))
+        del self._write_buf[:]
+
+    def close(self):
+        '''Write any gathered messages, then close the transport.
+
+        Messages are only written once the current event loop iteration
+        completes, so closing the transport directly would discard any sent
+        during this one.
+        '''
+        self.flush()
+        self.transport.close()
+
+    def metrics(self):
+        '''Returns a snapshot of the metrics collected for this connection.
+
+        Returns:
+            A :class:`cozmo.metrics.MetricsSnapshot` holding the counters for
+            each message type sent and received since the protocol was created.
+        '''
+        recv_tags = send_tags = None
+        if self.clad_decode_union is not None:
+            recv_tags = _tags_for_union(self.clad_decode_union)
+        if self.clad_encode_union is not None:
+            send_tags = self._encode_tags
+        return self._metrics.snapshot(recv_tags, send_tags, self._queued_count)
+
+    @property
+    def writing_paused(self):
+        '''bool: True while the transport has asked for writing to be paused.'''
+        return self._writing_paused
+
+    @property
+    def queued_msg_count(self):
+        '''int: The number of messages queued while writing is paused.'''
+        return self._queued_count
+
     def send_msg_new(self, msg):
         name = msg.__class__.__name__
         return self.send_msg(name, msg)
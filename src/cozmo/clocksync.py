@@ -0,0 +1,150 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Mapping of robot timestamps to the host's clock.
+
+Messages from the robot, such as object observations and camera images, are
+timestamped in milliseconds by the robot's own clock, whereas the SDK
+records when it received them using :func:`time.time`.  Each
+:class:`cozmo.robot.Robot` keeps a :class:`RobotClockSync` up to date from
+the image timestamps in its ``RobotState`` messages, and uses it to provide
+the host time at which an image was captured, for example
+:attr:`cozmo.world.CameraImage.image_capture_time` and
+:attr:`cozmo.objects.ObservableElement.last_observed_capture_time`.
+
+Comparing these with :func:`time.time` in an event handler gives the
+latency from capture to handler.
+'''
+
+# __all__ should order by constants, event classes, other classes, functions.
+__all__ = ['RobotClockSync']
+
+
+import collections
+import time
+
+
+class RobotClockSync:
+    '''Estimates the mapping from robot timestamps to host time.
+
+    Each sample pairs a robot timestamp with the host time it was received
+    at.  A least squares fit over the recent samples gives the drift between
+    the two clocks, and the fitted line is then shifted down to the sample
+    that arrived most quickly, as delays in delivery only ever make a
+    message appear later.  Converted times therefore include the minimum
+    delivery delay seen over the window.
+
+    Args:
+        window (int): The number of recent samples to base the estimate on.
+    '''
+
+    #: int: The minimum number of samples needed before times can be converted.
+    min_samples = 2
+
+    def __init__(self, window=200):
+        # (robot time, host time) in seconds
+        self._samples = collections.deque(maxlen=window)
+        # cached (drift, offset), or None if out of date
+        self._fit = None
+
+    def __repr__(self):
+        return '<%s samples=%d drift=%s offset=%s>' % (self.__class__.__name__,
+                len(self._samples), self.drift, self.offset)
+
+    #### Private Methods ####
+
+    def _update_fit(self):
+        samples = self._samples
+        count = len(samples)
+        # fit relative to the first sample to keep the sums well conditioned
+        robot_base, host_base = samples[0]
+        xs = [robot - robot_base for robot, host in samples]
+        ys = [host - host_base for robot, host in samples]
+        mean_x = sum(xs) / count
+        mean_y = sum(ys) / count
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        else:
+            slope = 1.0
+        intercept = min(y - slope * x for x, y in zip(xs, ys))
+        # host = robot * slope + offset
+        self._fit = (slope - 1.0, host_base + intercept - robot_base * slope)
+
+    #### Properties ####
+
+    @property
+    def is_synced(self):
+        '''bool: True once enough samples have been seen to convert times.'''
+        return len(self._samples) >= self.min_samples
+
+    @property
+    def drift(self):
+        '''float: How much faster the host clock runs than the robot's, as a
+        fraction (e.g. 1e-5 is 10 parts per million), or None if not synced.'''
+        if not self.is_synced:
+            return None
+        if self._fit is None:
+            self._update_fit()
+        return self._fit[0]
+
+    @property
+    def offset(self):
+        '''float: The host time, in seconds, corresponding to robot time zero,
+        or None if not synced.'''
+        if not self.is_synced:
+            return None
+        if self._fit is None:
+            self._update_fit()
+        return self._fit[1]
+
+    #### Commands ####
+
+    def add_sample(self, robot_timestamp, host_time=None):
+        '''Record the host time at which a robot timestamp was received.
+
+        A timestamp earlier than the previous sample means the robot's clock
+        was reset, and any earlier samples are discarded.
+
+        Args:
+            robot_timestamp (int): The robot's timestamp, in milliseconds.
+            host_time (float): The :func:`time.time` the timestamp was
+                received at; defaults to now.
+        '''
+        if host_time is None:
+            host_time = time.time()
+        robot_time = robot_timestamp / 1000
+        if self._samples:
+            last_robot_time = self._samples[-1][0]
+            if robot_time == last_robot_time:
+                return
+            if robot_time < last_robot_time:
+                self._samples.clear()
+        self._samples.append((robot_time, host_time))
+        self._fit = None
+
+    def robot_to_host_time(self, robot_timestamp):
+        '''Convert a robot timestamp to host time.
+
+        Args:
+            robot_timestamp (int): The robot's timestamp, in milliseconds.
+        Returns:
+            The equivalent :func:`time.time` value, or None if not yet synced.
+        '''
+        if robot_timestamp is None or not self.is_synced:
+            return None
+        if self._fit is None:
+            self._update_fit()
+        drift, offset = self._fit
+        return robot_timestamp / 1000 * (1.0 + drift) + offset
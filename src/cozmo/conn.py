@@ -27,11 +27,13 @@ dispatching them to the :class:`cozmo.robot.Robot` instance.
 '''
 
 # __all__ should order by constants, event classes, other classes, functions.
-__all__ = ['EvtRobotFound', 'CozmoConnection']
+__all__ = ['EvtLinkLatencyChanged', 'EvtLoopLag', 'EvtRobotFound', 'CozmoConnection']
 
 
 import asyncio
+import collections
 import platform
+import time
 
 import cozmoclad
 
@@ -40,6 +42,8 @@ from . import anim
 from . import clad_protocol
 from . import event
 from . import exceptions
+from . import metrics
+from . import recording
 from . import robot
 from . import version
 
@@ -70,6 +74,28 @@ class EvtConnectionClosed(event.Event):
     exc = 'The exception that triggered the closure, or None'
 
 
+class EvtLinkLatencyChanged(event.Event):
+    '''Triggered when the mean round trip time to the engine crosses the
+    latency threshold passed to :meth:`CozmoConnection.start_pinging`.
+    '''
+    conn = 'The CozmoConnection object'
+    latency = 'The cozmo.metrics.LinkLatency for the connection'
+    is_high = 'True if the latency rose above the threshold, False if it fell below'
+
+
+class EvtLoopLag(event.Event):
+    '''Triggered when the event loop runs later than the threshold passed to
+    :meth:`CozmoConnection.start_lag_monitor`.
+
+    Unlike :class:`EvtLinkLatencyChanged`, this indicates that the SDK's own
+    event loop is saturated, for example by slow event handlers.
+    '''
+    conn = 'The CozmoConnection object'
+    lag = 'How late the loop ran, in seconds'
+    threshold = 'The lag threshold, in seconds'
+    stack = 'The stack of the loop thread while it was held up, if captured, or None'
+
+
 # Some messages have no robotID but should still be forwarded to the primary robot
 FORCED_ROBOT_MESSAGES = {"AnimationAborted",
                          "AnimationEvent",
@@ -101,6 +127,58 @@ FORCED_ROBOT_MESSAGES = {"AnimationAborted",
                          "RobotRenamedEnrolledFace",
                          "UnexpectedMovement"}
 
+# Messages that only set the latest desired state of a motor or a set of
+# lights; when sent in quick succession only the last one matters, so they may
+# be coalesced (see CozmoConnection.coalesce_window).
+COALESCED_MESSAGES = {"DriveWheels",
+                      "MoveHead",
+                      "MoveLift",
+                      "SetAllActiveObjectLEDs",
+                      "SetBackpackLEDs"}
+
+
+# Priorities for messages queued while the transport has paused writing,
+# highest first.  Anything not listed in MESSAGE_PRIORITIES, such as the
+# connection handshake, actions and cancels, has the highest priority.
+# Cancels share the priority of actions so that they stay in the order they
+# were sent: a cancel must never be written after an action sent after it.
+PRIORITY_HIGH = 0
+PRIORITY_MOTORS = 1
+PRIORITY_LIGHTS = 2
+
+MESSAGE_PRIORITIES = {"DriveArc": PRIORITY_MOTORS,
+                      "DriveWheels": PRIORITY_MOTORS,
+                      "MoveHead": PRIORITY_MOTORS,
+                      "MoveLift": PRIORITY_MOTORS,
+                      "TurnInPlaceAtSpeed": PRIORITY_MOTORS,
+                      "SetActiveObjectLEDs": PRIORITY_LIGHTS,
+                      "SetAllActiveObjectLEDs": PRIORITY_LIGHTS,
+                      "SetBackpackLEDs": PRIORITY_LIGHTS,
+                      "SetHeadlight": PRIORITY_LIGHTS}
+
+# Messages that stop every motor, making any motor commands queued before them
+# stale; queued motor commands are dropped when one of these is sent.
+MOTOR_STOP_MESSAGES = {"AbortAll": PRIORITY_MOTORS,
+                       "StopAllMotors": PRIORITY_MOTORS}
+
+
+class _MsgRoute(collections.namedtuple('_MsgRoute', 'tag_name evttype has_robot_id is_forced')):
+    # How CozmoConnection.msg_received routes one type of incoming message:
+    # the event type to dispatch, whether the message carries a robotID and
+    # whether it's in FORCED_ROBOT_MESSAGES.
+    __slots__ = ()
+
+
+def _build_msg_routes(union):
+    '''Returns a list, indexed by union tag, of the _MsgRoute for each message.'''
+    routes = [None] * 256
+    for tag_name, tag in clad_protocol._tags_for_union(union).items():
+        routes[tag] = _MsgRoute(tag_name=tag_name,
+                evttype=getattr(_clad, '_Msg' + tag_name, None),
+                has_robot_id=hasattr(union.typeByTag(tag), 'robotID'),
+                is_forced=tag_name in FORCED_ROBOT_MESSAGES)
+    return routes
+
 
 class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
     '''Manages the connection to the Cozmo app to communicate with the core engine.
@@ -127,6 +205,32 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
     clad_decode_union = _clad_to_game_iface.MessageEngineToGame
     clad_encode_union = _clad_to_engine_iface.MessageGameToEngine
 
+    # Motor and light commands are superseded by the next one sent, so stale
+    # ones may be dropped while the transport is paused.
+    msg_priorities = MESSAGE_PRIORITIES
+    droppable_msg_priority = PRIORITY_MOTORS
+    msg_supersedes = MOTOR_STOP_MESSAGES
+
+    # built once, rather than looking up the event type etc for every message
+    _msg_routes = _build_msg_routes(clad_decode_union)
+    _ping_tag = clad_decode_union.Tag.Ping
+    _ui_device_connected_tag = clad_decode_union.Tag.UiDeviceConnected
+
+    #: float: If set, messages listed in :data:`COALESCED_MESSAGES` are held
+    #: for up to this many seconds before being sent, and only the most recent
+    #: message of each type (and target object) is sent.  Any other message
+    #: sends the held messages first, so ordering is preserved.  Defaults to
+    #: None, which sends every message immediately.
+    coalesce_window = None
+
+    #: bool: If True, received messages that nothing listens for are
+    #: discarded without being decoded or dispatched.  A message is listened
+    #: for if any dispatcher has an event handler registered for it, or
+    #: defines a receiver method for it (default handlers don't count).
+    #: The table of such messages is kept up to date as dispatchers are
+    #: created and handlers are added.
+    lazy_decode = False
+
     def __init__(self, *a, **kw):
         super().__init__(*a, **kw)
         self._is_connected = False
@@ -135,6 +239,35 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
         self._robots = {}
         self._primary_robot = None
 
+        # (message name, object id) -> latest message held for coalescing
+        self._coalesced_msgs = collections.OrderedDict()
+        self._coalesce_handle = None
+        self._coalesced_counts = collections.Counter()
+
+        # per-tag flags for lazy_decode, the event._subscription_version
+        # they were computed for, and tag -> event class for the tags that
+        # may be skipped.
+        self._skip_tags = None
+        self._skip_tags_version = None
+        self._skip_event_classes = None
+        self._skipped_counts = [0] * 256
+
+        # timer for start_metrics_dump
+        self._metrics_dump_handle = None
+
+        # pings sent by start_pinging: counter -> monotonic time sent
+        self._ping_handle = None
+        self._ping_interval = None
+        self._ping_counter = 0
+        self._pings_pending = collections.OrderedDict()
+        self._ping_timeout = None
+        self._latency_threshold = None
+        self._is_latency_high = False
+        self._link_latency = metrics.LinkLatency()
+
+        # the cozmo.metrics.LoopLagMonitor started by start_lag_monitor
+        self._lag_monitor = None
+
         #: A dict containing information about the device the connection is using.
         self.device_info = {}
 
@@ -157,6 +290,11 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
     def connection_lost(self, exc):
         super().connection_lost(exc)
         self._is_connected = False
+        self.stop_metrics_dump()
+        self.stop_pinging()
+        self.stop_lag_monitor()
+        for robot in self._robots.values():
+            robot.camera.disable_decode_executor()
         if self._running:
             self.abort(exceptions.ConnectionAborted("Lost connection to the device"))
             logger.error("Lost connection to the device: %s", exc)
@@ -168,7 +306,7 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
             self._running = False
             event._abort_futures(exceptions.SDKShutdown())
             self._stop_dispatcher()
-            self.transport.close()
+            self.close()
 
     def abort(self, exc):
         '''Abort the connection to the device.'''
@@ -179,8 +317,72 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
             # remainder are aborted.
             self._loop.call_soon(lambda: event._abort_futures(exc))
             self._stop_dispatcher()
-            self.transport.close()
+            self.close()
+
+
+    def send_msg(self, msg, **params):
+        name = clad_protocol._msg_name(msg)
+        if self.coalesce_window is not None and name in COALESCED_MESSAGES:
+            key = (name, getattr(msg, 'objectID', None))
+            if key in self._coalesced_msgs:
+                self._coalesced_counts[name] += 1
+            self._coalesced_msgs[key] = msg
+            if self._coalesce_handle is None:
+                self._coalesce_handle = self._loop.call_later(
+                        self.coalesce_window, self._flush_coalesced)
+            return
 
+        if self._coalesced_msgs:
+            self._flush_coalesced()
+        super().send_msg(msg, **params)
+
+    def flush(self):
+        '''Send any messages held for coalescing or write gathering now.'''
+        if self._coalesced_msgs:
+            self._flush_coalesced()
+        super().flush()
+
+    def _flush_coalesced(self):
+        '''Send any messages being held for coalescing.'''
+        if self._coalesce_handle is not None:
+            self._coalesce_handle.cancel()
+            self._coalesce_handle = None
+        msgs = list(self._coalesced_msgs.values())
+        self._coalesced_msgs.clear()
+        for msg in msgs:
+            super().send_msg(msg)
+
+    def _skip_frame(self, tag):
+        if self._skip_tags_version != event._subscription_version:
+            self._update_skip_tags()
+        if self._skip_tags[tag]:
+            self._skipped_counts[tag] += 1
+            return True
+        return False
+
+    def _update_skip_tags(self):
+        if self._skip_tags is None:
+            event_classes = {}
+            for tag, route in enumerate(self._msg_routes):
+                # messages handled directly by msg_received are always decoded
+                if tag in (self._ping_tag, self._ui_device_connected_tag):
+                    continue
+                if route is not None and route.evttype is not None:
+                    event_classes[tag] = route.evttype
+            self._skip_event_classes = event_classes
+            self._skip_tags = [False] * 256
+        else:
+            # only the tags whose events may have gained a subscriber need
+            # checking again.
+            version = self._skip_tags_version
+            event_classes = {tag: evttype for tag, evttype in self._skip_event_classes.items()
+                             if event._subscriptions_changed_since(version, evttype)}
+
+        if event_classes:
+            subscribed = event._subscribed_event_names(event_classes.values())
+            for tag, evttype in event_classes.items():
+                self._skip_tags[tag] = evttype.event_name not in subscribed
+        self._skip_tags_version = event._subscription_version
 
     def msg_received(self, msg):
         '''Receives low level communication messages from the engine.'''
@@ -188,36 +390,34 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
             return
 
         try:
-            tag_name = msg.tag_name
+            tag = msg.tag
 
-            if tag_name == 'Ping':
+            if tag == self._ping_tag:
                 # short circuit to avoid unnecessary event overhead
                 return self._handle_ping(msg._data)
 
-            elif tag_name == 'UiDeviceConnected':
+            elif tag == self._ui_device_connected_tag:
                 # handle outside of event dispatch for quick abort in case
                 # of a version mismatch problem.
                 return self._handle_ui_device_connected(msg._data)
 
+            route = self._msg_routes[tag]
+            if route is None or route.evttype is None:
+                logger.error('Received unknown CLAD message %s', msg.tag_name)
+                return
+
             msg = msg._data
-            robot_id = getattr(msg, 'robotID', None)
+            robot_id = msg.robotID if route.has_robot_id else None
 
-            if not robot_id and self._primary_robot and (tag_name in FORCED_ROBOT_MESSAGES):
+            if not robot_id and route.is_forced and self._primary_robot:
                 # Forward to the primary robot
                 robot_id = self._primary_robot.robot_id
 
-            event_name = '_Msg' +  tag_name
-
-            evttype = getattr(_clad, event_name, None)
-            if evttype is None:
-                logger.error('Received unknown CLAD message %s', event_name)
-                return
-
             if robot_id:
                 # dispatch robot-specific messages to Cozmo robot instances
-                return self._process_robot_msg(robot_id, evttype, msg)
+                return self._process_robot_msg(robot_id, route.evttype, msg)
 
-            self.dispatch_event(evttype, msg=msg)
+            self.dispatch_event(route.evttype, msg=msg)
 
         except Exception as exc:
             # No exceptions should reach this point; it's a bug if they do.
@@ -256,22 +456,98 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
         '''bool: True if currently connected to the remote engine.'''
         return self._is_connected
 
+    @property
+    def coalesced_message_count(self):
+        '''int: The number of messages that were never sent because a newer
+        message replaced them (see :attr:`coalesce_window`).'''
+        return sum(self._coalesced_counts.values())
+
+    @property
+    def coalesced_message_counts(self):
+        '''dict: The number of messages replaced by a newer message, by message name.'''
+        return dict(self._coalesced_counts)
+
+    @property
+    def skipped_message_counts(self):
+        '''dict: The number of messages discarded undecoded by
+        :attr:`lazy_decode`, by message name.'''
+        tags = clad_protocol._tags_for_union(self.clad_decode_union)
+        return {name: self._skipped_counts[tag] for name, tag in tags.items()
+                if self._skipped_counts[tag]}
+
+    @property
+    def loop_lag(self):
+        ''':class:`cozmo.metrics.LoopLagMonitor`: The event loop lag measured by
+        :meth:`start_lag_monitor`, or None if it hasn't been started.'''
+        return self._lag_monitor
+
+    @property
+    def link_latency(self):
+        ''':class:`cozmo.metrics.LinkLatency`: Round trip time and engine
+        clock offset estimates for the connection.
+
+        Round trip times are only measured while :meth:`start_pinging` is
+        active; the clock offset is estimated from the engine's own pings.
+        '''
+        return self._link_latency
+
+    @property
+    def recorder(self):
+        ''':class:`cozmo.recording.SessionRecorder`: The recorder capturing
+        traffic on this connection, or None if not recording.'''
+        return self._recorder
+
 
     #### Private Event handlers ####
 
     def _handle_ping(self, msg):
         '''Respond to a ping event.'''
+        now = time.monotonic()
         if msg.isResponse:
-            # To avoid duplication, pings originate from engine, and engine
-            # accumulates the latency info from the responses
-            logger.error("Only engine should receive responses")
+            sent_time = self._pings_pending.pop(msg.counter, None)
+            if sent_time is None:
+                # Unless start_pinging was called, pings originate from the
+                # engine, and the engine accumulates the latency info from
+                # the responses.
+                logger.error("Only engine should receive responses")
+                return
+            self._link_latency.record_rtt(now - sent_time)
+            self._check_latency_threshold()
         else:
+            self._link_latency.record_engine_time(msg.timeSent_ms / 1000, now)
             resp = _clad_to_engine_iface.Ping(
                 counter=msg.counter,
                 timeSent_ms=msg.timeSent_ms,
                 isResponse=True)
             self.send_msg(resp)
 
+    def _send_ping(self):
+        self._ping_handle = self._loop.call_later(self._ping_interval, self._send_ping)
+        now = time.monotonic()
+        # anything unanswered for too long is presumed lost
+        while self._pings_pending:
+            counter, sent_time = next(iter(self._pings_pending.items()))
+            if now - sent_time < self._ping_timeout:
+                break
+            del self._pings_pending[counter]
+            self._link_latency.pings_lost += 1
+
+        self._ping_counter = (self._ping_counter + 1) & 0xffffffff
+        self._pings_pending[self._ping_counter] = now
+        self.send_msg(_clad_to_engine_iface.Ping(
+                counter=self._ping_counter,
+                timeSent_ms=now * 1000,
+                isResponse=False))
+
+    def _check_latency_threshold(self):
+        if self._latency_threshold is None:
+            return
+        is_high = self._link_latency.mean_rtt > self._latency_threshold
+        if is_high != self._is_latency_high:
+            self._is_latency_high = is_high
+            self.dispatch_event(EvtLinkLatencyChanged, conn=self,
+                    latency=self._link_latency, is_high=is_high)
+
     def _recv_default_handler(self, event, **kw):
         '''Default event handler.'''
         if event.event_name.startswith('msg_animation'):
@@ -424,6 +700,128 @@ class CozmoConnection(event.Dispatcher, clad_protocol.CLADProtocol):
 
     #### Commands ####
 
+    def start_recording(self, path, index_interval=1000):
+        '''Start recording all messages sent to and received from the engine.
+
+        Messages are written to a binary file that can be read back using
+        :class:`cozmo.recording.SessionReader`.  Any previous recording on
+        this connection is stopped first.
+
+        Args:
+            path (str): The file to record to.  Any existing file is overwritten.
+            index_interval (int): How many messages to record between each
+                entry in the recording's seek index.
+        Returns:
+            The :class:`cozmo.recording.SessionRecorder` writing the recording.
+        '''
+        self.stop_recording()
+        self._recorder = recording.SessionRecorder(path, index_interval=index_interval)
+        logger.info('Recording session to %s', path)
+        return self._recorder
+
+    def stop_recording(self):
+        '''Stop any recording started by :meth:`start_recording` and close the file.'''
+        if self._recorder is not None:
+            self._recorder.close()
+            logger.info('Recorded %d messages to %s',
+                    self._recorder.message_count, self._recorder.path)
+            self._recorder = None
+
+    def start_metrics_dump(self, interval=60, callback=None):
+        '''Periodically report the connection's protocol metrics.
+
+        Any previous dump on this connection is stopped first.  Dumping stops
+        automatically when the connection is closed.
+
+        Args:
+            interval (float): Seconds between each report.
+            callback (callable): Called with each
+                :class:`cozmo.metrics.MetricsSnapshot`.  By default the
+                snapshot is logged to the general logger at info level.
+        '''
+        self.stop_metrics_dump()
+        if callback is None:
+            callback = lambda snapshot: logger.info('Protocol metrics:\n%s', snapshot)
+
+        def dump():
+            self._metrics_dump_handle = self._loop.call_later(interval, dump)
+            try:
+                callback(self.metrics())
+            except Exception:
+                logger.exception('Metrics dump callback failed')
+
+        self._metrics_dump_handle = self._loop.call_later(interval, dump)
+
+    def stop_metrics_dump(self):
+        '''Stop any periodic report started by :meth:`start_metrics_dump`.'''
+        if self._metrics_dump_handle is not None:
+            self._metrics_dump_handle.cancel()
+            self._metrics_dump_handle = None
+
+    def start_pinging(self, interval=1.0, latency_threshold=None, timeout=5.0):
+        '''Periodically ping the engine to measure the link's round trip time.
+
+        Results are available from :attr:`link_latency`.  Pinging stops
+        automatically when the connection is closed.
+
+        Args:
+            interval (float): Seconds between each ping.
+            latency_threshold (float): If set, an :class:`EvtLinkLatencyChanged`
+                event is dispatched each time the mean round trip time rises
+                above, or falls back below, this many seconds.
+            timeout (float): Seconds after which an unanswered ping is counted
+                as lost.
+        '''
+        self.stop_pinging()
+        self._ping_interval = interval
+        self._ping_timeout = timeout
+        self._latency_threshold = latency_threshold
+        self._is_latency_high = False
+        self._send_ping()
+
+    def stop_pinging(self):
+        '''Stop any pinging started by :meth:`start_pinging`.'''
+        if self._ping_handle is not None:
+            self._ping_handle.cancel()
+            self._ping_handle = None
+        self._pings_pending.clear()
+
+    def start_lag_monitor(self, interval=0.1, threshold=0.1, dump_stacks=False):
+        '''Monitor the scheduling lag of the connection's event loop.
+
+        Each time the lag exceeds ``threshold`` a warning is logged and an
+        :class:`EvtLoopLag` event is dispatched.  Measurements are available
+        from :attr:`loop_lag`.  Monitoring stops automatically when the
+        connection is closed.
+
+        Args:
+            interval (float): Seconds between each measurement.
+            threshold (float): Lag, in seconds, considered too high.
+            dump_stacks (bool): If True, capture the stack of the code holding
+                up the loop, and include it in the warning and the event.
+        Returns:
+            The :class:`cozmo.metrics.LoopLagMonitor`.
+        '''
+        self.stop_lag_monitor()
+
+        def lag_exceeded(lag, stack):
+            if stack:
+                logger.warning('Event loop lag %.1fms exceeded %.1fms; loop was running:\n%s',
+                        lag * 1000, threshold * 1000, stack)
+            else:
+                logger.warning('Event loop lag %.1fms exceeded %.1fms', lag * 1000, threshold * 1000)
+            self.dispatch_event(EvtLoopLag, conn=self, lag=lag, threshold=threshold, stack=stack)
+
+        self._lag_monitor = metrics.LoopLagMonitor(self._loop, interval=interval,
+                threshold=threshold, callback=lag_exceeded, dump_stacks=dump_stacks)
+        self._lag_monitor.start()
+        return self._lag_monitor
+
+    def stop_lag_monitor(self):
+        '''Stop any monitoring started by :meth:`start_lag_monitor`.'''
+        if self._lag_monitor is not None:
+            self._lag_monitor.stop()
+
     async def _wait_for_robot(self, timeout=5):
         if not self._primary_robot:
             await self.wait_for(EvtRobotFound, timeout=timeout)
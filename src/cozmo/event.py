@@ -27,6 +27,8 @@ The event can be observed in a number of different ways:
 #. By calling the :meth:`~Dispatcher.wait_for` method on the object to observe.
    This will wait until the specific event has been sent to that object and
    return the generated event.
+#. By iterating over :meth:`~Dispatcher.stream` on the object to observe,
+   which buffers the events sent to the object until they're consumed.
 #. By calling :meth:`~Dispatcher.add_event_handler` on the object
    to observe, which will cause the supplied function to be called every time
    the specified event occurs (use the :func:`oneshot` decorator
@@ -75,19 +77,25 @@ of messages the World object receives.
 '''
 
 # __all__ should order by constants, event classes, other classes, functions.
-__all__ = ['Event', 'Dispatcher', 'Filter', 'Handler',
-    'oneshot', 'filter_handler', 'wait_for_first']
+__all__ = ['EvtSlowEventHandler',
+    'Event', 'Dispatcher', 'EventStream', 'Filter', 'Handler',
+    'oneshot', 'filter_handler', 'wait_for_first',
+    'enable_dispatch_profiling', 'disable_dispatch_profiling']
 
 
 import asyncio
 import collections
+import functools
 import inspect
 import re
+import sys
+import time
 import weakref
 
 from . import base
 from . import exceptions
 from . import logger
+from . import metrics
 
 
 # from https://stackoverflow.com/questions/1175208/elegant-python-function-to-convert-camelcase-to-snake-case
@@ -101,6 +109,28 @@ registered_events = {}
 
 active_dispatchers = weakref.WeakSet()
 
+# maps (receiver class, event class) to the receiver method names that
+# Event._dispatch_to_obj should try, in order.  See _receiver_method_names.
+_receiver_method_cache = {}
+
+# incremented whenever something may have subscribed to an event, so that
+# tables derived from the subscriptions can tell they might be stale.
+# _event_subscription_versions maps an event's handler name (see
+# Event._handler_name) to the version at which that event last gained a
+# subscriber, and _dispatcher_links_version is the version at which
+# dispatchers were last linked together, or one created that may receive any
+# event.  See _subscriptions_changed_since.
+_subscription_version = 0
+_event_subscription_versions = {}
+_dispatcher_links_version = 0
+
+# maps receiver class to the names of its receiver methods.  See
+# _receiver_names.
+_receiver_names_cache = {}
+
+# the DispatchProfiler set by enable_dispatch_profiling, or None
+_dispatch_profiler = None
+
 class _rprop:
     def __init__(self, value):
         self._value = value
@@ -113,9 +143,37 @@ class docstr(str):
         return self.__str__()
 
 
+def _make_event_init(props):
+    '''Returns an __init__ method that sets exactly the given event parameters.
+
+    Generating the method per event class lets each parameter be set directly
+    to its slot, rather than looping over the keyword arguments and
+    validating each one.
+    '''
+    # Parameter names are public identifiers, so can't clash with _event or _unknown.
+    args = ''.join('%s=None, ' % k for k in props)
+    if args:
+        args = '*, ' + args
+    body = ''.join('    _event.%s = %s\n' % (k, k) for k in props)
+    source = ('def __init__(_event, %s**_unknown):\n'
+              '    if _unknown:\n'
+              '        _event._reject_params(_unknown)\n'
+              '%s'
+              '    _event._delivered_to = None\n'
+              '    _event._kwargs = None\n') % (args, body)
+    namespace = {}
+    exec(source, namespace)
+    return namespace['__init__']
+
+
 class _AutoRegister(type):
     '''helper to automatically register event classes wherever they're defined
-    without requiring a class decorator'''
+    without requiring a class decorator
+
+    Each event parameter becomes a slot, documented by the parameter's
+    description, and the class is given an ``__init__`` specialized for
+    its parameters.
+    '''
 
     def __new__(mcs, name, bases, attrs, **kw):
         if name in ('Event',):
@@ -133,16 +191,22 @@ class _AutoRegister(type):
                 props.update(base._props)
 
         newattrs = {'_internal': False}
+        slots = {}
         for k, v in attrs.items():
             if k[0] == '_':
                 newattrs[k] = v
                 continue
             if k in props:
-                raise ValueError("Event class %s duplicates property %s defined in superclass" % (self, k))
+                raise ValueError("Event class %s duplicates property %s defined in superclass" % (name, k))
+            if k == 'event_name' or any(hasattr(base, k) for base in bases):
+                raise ValueError("Event class %s property %s conflicts with an Event attribute" % (name, k))
             props.add(k)
-            newattrs[k] = docstr(v)
+            slots[k] = docstr(v)
+        newattrs['__slots__'] = slots
         newattrs['_props'] = props
         newattrs['_props_sorted'] = sorted(props)
+        if '__init__' not in attrs:
+            newattrs['__init__'] = _make_event_init(newattrs['_props_sorted'])
 
         if name[0] == '_':
             newattrs['_internal'] = True
@@ -157,7 +221,20 @@ class _AutoRegister(type):
             raise ValueError("Duplicate event name %s (%s duplicated by %s)"
                     % (name, _full_qual_name(cls), _full_qual_name(registered_events[name])))
         registered_events[name] = cls
-        return super().__init__(name, bases, attrs, **kw)
+        super().__init__(name, bases, attrs, **kw)
+
+        # Precompute everything dispatch needs to know about the class so that
+        # it isn't recalculated for every event at every dispatcher.
+        cls._event_classes = tuple(c for c in cls.__mro__
+                if isinstance(c, _AutoRegister) and hasattr(c, 'event_name'))
+        if hasattr(cls, 'event_name'):
+            handler_name = 'recv_' + _uncamelcase(cls.event_name)
+            default_handler_name = 'recv_default_handler'
+            if cls._internal:
+                handler_name = '_' + handler_name
+                default_handler_name = '_' + default_handler_name
+            cls._handler_name = handler_name
+            cls._default_handler_name = default_handler_name
 
 
 def _full_qual_name(obj):
@@ -176,16 +253,13 @@ class Event(metaclass=_AutoRegister):
     #_first_raised_by = "The object that generated the event"
     #_last_raised_by = "The object that last relayed the event to the dispatched handler"
 
-    def __init__(self, **kwargs):
-        unset = self._props.copy()
-        for k, v in kwargs.items():
-            if k not in self._props:
-                raise ValueError("Event %s has no parameter called %s" % (self.event_name, k))
-            setattr(self, k, v)
-            unset.remove(k)
-        for k in unset:
-            setattr(self, k, None)
-        self._delivered_to = set()
+    # _delivered_to marks the dispatchers the event has reached: None, the
+    # id of the only one, or a set of their ids.  _kwargs caches _params().
+    __slots__ = ('_delivered_to', '_kwargs')
+
+    def _reject_params(self, params):
+        for k in sorted(params):
+            raise ValueError("Event %s has no parameter called %s" % (self.event_name, k))
 
     def __repr__(self):
         kvs = {'name': self.event_name}
@@ -194,31 +268,48 @@ class Event(metaclass=_AutoRegister):
         return '<%s %s>' % (self.__class__.__name__, ' '.join(['%s=%s' % kv for kv in kvs.items()]),)
 
     def _params(self):
-        return {k: getattr(self, k) for k in self._props}
+        # Built on first dispatch; parameters are not expected to change after that.
+        kwargs = self._kwargs
+        if kwargs is None:
+            kwargs = self._kwargs = {k: getattr(self, k) for k in self._props}
+        return kwargs
+
+    def _mark_delivered(self, dispatcher):
+        # Returns False if the event has already been delivered to dispatcher.
+        # Most events only reach one or two dispatchers, so a set is only
+        # allocated once a second one is reached.
+        key = id(dispatcher)
+        delivered = self._delivered_to
+        if delivered is None:
+            self._delivered_to = key
+        elif delivered.__class__ is int:
+            if delivered == key:
+                return False
+            self._delivered_to = {delivered, key}
+        else:
+            if key in delivered:
+                return False
+            delivered.add(key)
+        return True
 
     @classmethod
     def _handler_method_name(cls):
-        name = 'recv_' + _uncamelcase(cls.event_name)
-        if cls._internal:
-            name = '_' + name
-        return name
+        return cls._handler_name
 
     def _dispatch_to_func(self, f):
         return f(self, **self._params())
 
     def _dispatch_to_obj(self, obj, fallback_to_default=True):
-        for cls in self._parent_event_classes():
-            f = getattr(obj, cls._handler_method_name(), None)
+        names, default_name = _receiver_method_names(obj.__class__, self.__class__)
+        for name in names:
+            f = getattr(obj, name, None)
             if f and not self._is_filtered(f):
                 return self._dispatch_to_func(f)
 
-        if fallback_to_default:
-            name = 'recv_default_handler'
-            if self._internal:
-                name = '_' + name
-            f = getattr(obj, name, None)
+        if fallback_to_default and default_name:
+            f = getattr(obj, default_name, None)
             if f and not self._is_filtered(f):
-                return f(self, **self._params())
+                return self._dispatch_to_func(f)
 
     def _dispatch_to_future(self, fut):
         if not fut.done():
@@ -234,15 +325,190 @@ class Event(metaclass=_AutoRegister):
         return True
 
     def _parent_event_classes(self):
-        for cls in self.__class__.__mro__:
-            if cls != Event and issubclass(cls, Event):
-                yield cls
+        return self._event_classes
+
+
+class EvtSlowEventHandler(Event):
+    '''Dispatched when an event handler takes longer than the profiling budget.
+
+    Only dispatched while profiling is enabled by :func:`enable_dispatch_profiling`,
+    to the dispatcher that called the handler.
+    '''
+    handler_name = 'The qualified name of the handler'
+    handled_event_name = 'The name of the event the handler was called with'
+    elapsed = 'The time the handler took, in seconds'
+    budget = 'The profiling budget, in seconds'
+
+
+def _handler_name(f):
+    name = getattr(f, '__qualname__', None)
+    if name is None:
+        # e.g. a functools.partial, or another callable object
+        name = getattr(getattr(f, 'func', None), '__qualname__', None) or type(f).__qualname__
+    return name
+
+
+def _receiver_method_names(obj_cls, event_cls):
+    '''Returns the receiver methods defined by obj_cls for event_cls.
+
+    Returns a tuple of the handler method names, most specific event first,
+    along with the name of the default handler (or None if obj_cls doesn't
+    define one).  Results are cached per class pair, so receiver methods
+    must be defined on the class rather than added to an instance.
+    '''
+    key = (obj_cls, event_cls)
+    try:
+        return _receiver_method_cache[key]
+    except KeyError:
+        pass
+    names = tuple(cls._handler_name for cls in event_cls._event_classes
+                  if getattr(obj_cls, cls._handler_name, None))
+    default_name = event_cls._default_handler_name
+    if not getattr(obj_cls, default_name, None):
+        default_name = None
+    result = _receiver_method_cache[key] = (names, default_name)
+    return result
+
+
+def _receives(obj_cls, event_cls):
+    '''Returns True if obj_cls defines a receiver method that event_cls would reach.'''
+    names, default_name = _receiver_method_names(obj_cls, event_cls)
+    if default_name is not None:
+        names += (default_name,)
+    return any(not getattr(getattr(obj_cls, name), '_passive_receiver', False) for name in names)
+
+
+def _receiver_names(obj_cls):
+    '''Returns the names of the receiver methods obj_cls defines.
+
+    Returns None if obj_cls has a default handler that isn't passive, as that
+    may receive any event.
+    '''
+    try:
+        return _receiver_names_cache[obj_cls]
+    except KeyError:
+        pass
+    defaults = ('recv_default_handler', '_recv_default_handler')
+    if any(getattr(obj_cls, name, None) and
+           not getattr(getattr(obj_cls, name), '_passive_receiver', False)
+           for name in defaults):
+        names = None
+    else:
+        names = tuple(name for name in dir(obj_cls)
+                      if name.startswith(('recv_', '_recv_')) and name not in defaults)
+    _receiver_names_cache[obj_cls] = names
+    return names
+
+
+def _subscription_added(handler_names=None):
+    '''Records that events may have gained a subscriber.
+
+    handler_names are the :attr:`Event._handler_name` of the events
+    affected; if None then any event may have.
+    '''
+    global _subscription_version, _dispatcher_links_version
+    _subscription_version += 1
+    if handler_names is None:
+        _dispatcher_links_version = _subscription_version
+    else:
+        for name in handler_names:
+            _event_subscription_versions[name] = _subscription_version
+
+
+def _subscriptions_changed_since(version, event_cls):
+    '''Returns True if event_cls may have gained a subscriber since version.
+
+    version is the value of _subscription_version at the time something
+    derived from the subscriptions was computed.
+    '''
+    if version == _subscription_version:
+        return False
+    if _dispatcher_links_version > version:
+        return True
+    for cls in event_cls._event_classes:
+        if _event_subscription_versions.get(cls._handler_name, 0) > version:
+            return True
+    return False
+
+
+def _reaches_subscriber(dispatcher, event_cls):
+    '''Returns True if an event dispatched to dispatcher may be received by anything.
+
+    Follows the same links as :meth:`Dispatcher.dispatch_event`, to children
+    and to the parent, looking for a handler or a receiver method for the
+    event.
+    '''
+    names = [cls.event_name for cls in event_cls._event_classes]
+    seen = set()
+    pending = [dispatcher]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or not obj._dispatcher_running:
+            continue
+        seen.add(id(obj))
+        handlers = obj._dispatch_handlers
+        for name in names:
+            if handlers.get(name):
+                return True
+        if _receives(obj.__class__, event_cls):
+            return True
+        pending.extend(obj._dispatch_children)
+        if obj._dispatch_parent is not None:
+            pending.append(obj._dispatch_parent)
+    return False
+
+
+def _passive_receiver(f):
+    '''Marks a receiver method that only observes events, such as by logging them.
+
+    Passive receivers don't count as subscribing to an event, so they only
+    receive events that are being dispatched for something else.
+    '''
+    f._passive_receiver = True
+    return f
 
 
 def _register_dynamic_event_type(event_name, attrs):
     return type(event_name, (Event,), attrs)
 
 
+class _CoroutineTimer:
+    '''Awaits a coroutine, adding up the time it spends running.
+
+    Time the coroutine spends suspended, waiting on whatever it awaits,
+    isn't counted.
+    '''
+    __slots__ = ('_coro', 'elapsed')
+
+    def __init__(self, coro):
+        self._coro = coro
+        #: float: The time spent running the coroutine so far, in seconds.
+        self.elapsed = 0.0
+
+    def __await__(self):
+        coro = self._coro
+        value = exc = None
+        while True:
+            start = time.perf_counter()
+            try:
+                if exc is None:
+                    yielded = coro.send(value)
+                else:
+                    yielded = coro.throw(exc)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.elapsed += time.perf_counter() - start
+            try:
+                value = yield yielded
+                exc = None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                value, exc = None, e
+
+
 class Handler(collections.namedtuple('Handler', 'obj evt f')):
     '''A Handler is returned by :meth:`Dispatcher.add_event_handler`
 
@@ -266,25 +532,351 @@ class NullHandler(Handler):
         pass
 
 
+class _UnhashableHandler(Handler):
+    '''A Handler for a callable that can't be hashed.
+
+    Such as a method bound to an object that defines ``__eq__`` but not
+    ``__hash__``.  Handlers are hashed to store them in a :class:`_HandlerList`,
+    so these hash on what equal handlers must share instead: the event and the
+    underlying function (or the callable's type).
+    '''
+    __slots__ = ()
+
+    def __hash__(self):
+        return hash((self.evt, getattr(self.f, '__func__', type(self.f))))
+
+
+def _make_handler(obj, evt, f):
+    handler = Handler(obj, evt, f)
+    try:
+        hash(handler)
+    except TypeError:
+        return _UnhashableHandler(obj, evt, f)
+    return handler
+
+
+class EventStream:
+    '''An asynchronous iterator over the events a dispatcher receives.
+
+    Returned by :meth:`Dispatcher.stream`.  Events are buffered from the
+    moment the stream is created, so none are missed between iterations,
+    and at most ``maxlen`` are held at once so a slow consumer can't make
+    the buffer grow without limit.  When the buffer is full, ``overflow``
+    chooses whether the oldest buffered event or the new event is dropped;
+    either way :attr:`dropped_count` is incremented.
+
+    Iteration stops once the stream is closed and any buffered events have
+    been consumed.  Use ``async with`` to close the stream automatically::
+
+        async with robot.world.stream(cozmo.world.EvtNewCameraImage, maxlen=2) as images:
+            async for evt in images:
+                process(evt.image)
+    '''
+
+    #: The overflow modes accepted by :meth:`Dispatcher.stream`.
+    overflow_modes = ('drop_oldest', 'drop_newest')
+
+    def __init__(self, dispatcher, event_or_filter, maxlen=100, overflow='drop_oldest'):
+        if overflow not in self.overflow_modes:
+            raise ValueError("overflow must be one of %s (not %r)" % (
+                ', '.join(self.overflow_modes), overflow))
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen must be at least 1")
+        if isinstance(event_or_filter, Filter):
+            filter_handler(event_or_filter)(self)
+            event = event_or_filter._event
+        else:
+            event = event_or_filter
+        self._loop = dispatcher._loop
+        self._buffer = collections.deque()
+        self._maxlen = maxlen
+        self._drop_oldest = overflow == 'drop_oldest'
+        self._waiter = None
+        self._exception = None
+        self._closed = False
+        #: int: The number of events received by the stream, including dropped ones.
+        self.received_count = 0
+        #: int: The number of events dropped because the buffer was full.
+        self.dropped_count = 0
+        self._handler = dispatcher.add_event_handler(event, self)
+        if isinstance(self._handler, NullHandler):
+            # the dispatcher has stopped, so nothing will ever arrive
+            self._closed = True
+
+    def __repr__(self):
+        return '<%s %s buffered=%d received=%d dropped=%d%s>' % (
+                self.__class__.__name__, self._handler.evt.__name__,
+                len(self._buffer), self.received_count, self.dropped_count,
+                ' closed' if self._closed else '')
+
+    def __call__(self, evt, **kw):
+        # called by the dispatcher with each event
+        if self._closed:
+            return
+        self.received_count += 1
+        buffer = self._buffer
+        if self._maxlen is not None and len(buffer) >= self._maxlen:
+            self.dropped_count += 1
+            if not self._drop_oldest:
+                return
+            buffer.popleft()
+        buffer.append(evt)
+        self._wake()
+
+    def __aiter__(self):
+        return self
+
+    if sys.version_info < (3, 5, 2):
+        # Python 3.5.0 and 3.5.1 expect __aiter__ to return an awaitable.
+        __aiter__ = asyncio.coroutine(__aiter__)
+
+    async def __anext__(self):
+        while not self._buffer:
+            if self._exception is not None:
+                raise self._exception
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.Future(loop=self._loop)
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._buffer.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    #### Private Methods ####
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _abort(self, exc):
+        # called by the dispatcher should the connection fail
+        self._exception = exc
+        self.close()
+
+    #### Properties ####
+
+    @property
+    def buffered_count(self):
+        '''int: The number of events waiting to be consumed.'''
+        return len(self._buffer)
+
+    @property
+    def closed(self):
+        '''bool: True once the stream has been closed.'''
+        return self._closed
+
+    #### Commands ####
+
+    def close(self):
+        '''Stop receiving events.
+
+        Events already buffered are still returned by the iterator.
+        '''
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._handler.disable()
+        except ValueError:
+            # already removed by the dispatcher
+            pass
+        self._wake()
+
+
+def _filter_index_key(f):
+    '''Returns the (attribute, value) to index a filtered handler under, or None.
+
+    Only handlers with a single :class:`Filter` are indexed, on one of its
+    equality constraints; callable predicates can't be indexed.
+    '''
+    filters = getattr(f, '_handler_filters', None)
+    if filters is None or len(filters) != 1:
+        return None
+    constraints = filters[0]._filters
+    for attr in sorted(constraints):
+        value = constraints[attr]
+        if callable(value):
+            continue
+        try:
+            hash(value)
+        except TypeError:
+            continue
+        return attr, value
+    return None
+
+
+class _HandlerList:
+    '''The handlers registered with a dispatcher for one event.
+
+    Handlers are kept in an OrderedDict so that they can be added and removed
+    in constant time, however many there are, while still being iterated in
+    the order they were added.  Adding the same handler more than once is
+    counted, and it stays registered until removed as many times.
+
+    Handlers whose :class:`Filter` requires an event attribute to equal a
+    given value are also indexed by that value, so :meth:`matching` only
+    returns those waiting on the value an event actually carries.  The
+    index uses the filter's values at the time the handler was added.
+    '''
+    __slots__ = ('_handlers', '_unindexed', '_index', '_next_seq')
+
+    def __init__(self):
+        # Handler -> [times added, sequence number, index key or None]
+        self._handlers = collections.OrderedDict()
+        # handlers that aren't indexed, in the order they were added
+        self._unindexed = collections.OrderedDict()
+        # attribute name -> value -> OrderedDict of handlers
+        self._index = {}
+        self._next_seq = 0
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, list(self._handlers))
+
+    def __iter__(self):
+        return iter(self._handlers)
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def __contains__(self, handler):
+        return handler in self._handlers
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def add(self, handler):
+        entry = self._handlers.get(handler)
+        if entry is not None:
+            entry[0] += 1
+            return
+        key = _filter_index_key(handler.f)
+        self._handlers[handler] = [1, self._next_seq, key]
+        self._next_seq += 1
+        if key is None:
+            self._unindexed[handler] = None
+        else:
+            attr, value = key
+            by_value = self._index.setdefault(attr, {})
+            bucket = by_value.get(value)
+            if bucket is None:
+                bucket = by_value[value] = collections.OrderedDict()
+            bucket[handler] = None
+
+    def remove(self, handler):
+        '''Remove one registration of handler; raises KeyError if there isn't one.'''
+        entry = self._handlers[handler]
+        if entry[0] > 1:
+            entry[0] -= 1
+        else:
+            self.discard_all(handler)
+
+    def discard_all(self, handler):
+        '''Remove every registration of handler.'''
+        entry = self._handlers.pop(handler, None)
+        if entry is None:
+            return
+        key = entry[2]
+        if key is None:
+            del self._unindexed[handler]
+            return
+        attr, value = key
+        by_value = self._index[attr]
+        bucket = by_value[value]
+        del bucket[handler]
+        if not bucket:
+            del by_value[value]
+            if not by_value:
+                del self._index[attr]
+
+    def matching(self, event):
+        '''Returns the handlers that may accept event, in the order they were added.
+
+        Indexed handlers waiting on other values are left out; everything
+        returned must still be checked against its filters.
+        '''
+        if not self._index:
+            return self._handlers
+        found = []
+        for attr, by_value in self._index.items():
+            try:
+                bucket = by_value.get(getattr(event, attr, None))
+            except TypeError:
+                # unhashable values can't equal any indexed value
+                continue
+            if bucket:
+                found.extend(bucket)
+        if not found:
+            return self._unindexed
+        if self._unindexed:
+            found.extend(self._unindexed)
+        found.sort(key=lambda handler: self._handlers[handler][1])
+        return found
+
+
 class Dispatcher(base.Base):
     '''Mixin to provide event dispatch handling.'''
 
+    #: bool: If True then events are delivered to handlers and receiver
+    #: methods immediately from within :meth:`dispatch_event` rather than
+    #: from a newly scheduled :class:`asyncio.Task`.  A Task is only created
+    #: to continue the dispatch once a handler returns a coroutine; until it
+    #: completes, later events are also delivered from Tasks, so they are
+    #: still delivered in order up to the first ``await`` in that handler.
+    #: Set on :class:`Dispatcher` to enable it for all objects.
+    inline_dispatch = False
+
     def __init__(self, *a, dispatch_parent=None, loop=None, **kw):
         super().__init__(**kw)
         active_dispatchers.add(self)
+        names = _receiver_names(self.__class__)
+        if names is None or names:
+            _subscription_added(names)
         self._dispatch_parent = dispatch_parent
         self._dispatch_children = []
-        self._dispatch_handlers = collections.defaultdict(list)
+        self._dispatch_handlers = collections.defaultdict(_HandlerList)
         if not loop:
             raise ValueError("Loop was not supplied to "+self.__class__.__name__)
         self._loop = loop or asyncio.get_event_loop()
         self._dispatcher_running = True
+        # number of inline dispatches that have been handed off to a Task
+        # and not yet completed.
+        self._inline_dispatch_tasks = 0
+        # event class -> (whether dispatching it here may deliver it anywhere,
+        # the _subscription_version that was computed at)
+        self._subscribed = {}
 
     def _set_parent_dispatcher(self, parent):
         self._dispatch_parent = parent
+        _subscription_added()
 
     def _add_child_dispatcher(self, child):
         self._dispatch_children.append(child)
+        _subscription_added()
+
+    def _may_deliver(self, event_cls):
+        # An entry is rebuilt once the event may have gained a subscriber, so
+        # handlers coming and going for other events don't affect it.
+        # Removing handlers doesn't invalidate it, as delivering an event
+        # that no-one receives is harmless.
+        try:
+            result, version = self._subscribed[event_cls]
+        except KeyError:
+            pass
+        else:
+            if (version == _subscription_version or
+                    not _subscriptions_changed_since(version, event_cls)):
+                return result
+        version = _subscription_version
+        result = _reaches_subscriber(self, event_cls)
+        self._subscribed[event_cls] = (result, version)
+        return result
 
     def _stop_dispatcher(self):
         """Stop dispatching events - call before closing the connection to prevent stray dispatched events"""
@@ -332,8 +924,12 @@ class Dispatcher(base.Base):
             # futures can only be called once.
             f = oneshot(f)
 
-        handler = Handler(self, event, f)
-        self._dispatch_handlers[event.event_name].append(handler)
+        handler = _make_handler(self, event, f)
+        registered = self._dispatch_handlers[event.event_name]
+        if not registered:
+            # only the first handler for an event changes what's subscribed
+            _subscription_added((event._handler_name,))
+        registered.add(handler)
         return handler
 
     def remove_event_handler(self, event, f):
@@ -352,16 +948,22 @@ class Dispatcher(base.Base):
         if not (isinstance(event, Event) or (isinstance(event, type) and  issubclass(event, Event))):
             raise TypeError("event must be a subclasss or instance of Event")
 
-        if isinstance(f, Handler):
-            for i, h in enumerate(self._dispatch_handlers[event.event_name]):
-                if h == f:
-                    del self._dispatch_handlers[event.event_name][i]
-                    return
-        else:
-            for i, h in enumerate(self._dispatch_handlers[event.event_name]):
-                if h.f == f:
-                    del self._dispatch_handlers[event.event_name][i]
-                    return
+        handlers = self._dispatch_handlers.get(event.event_name)
+        if handlers:
+            if isinstance(f, Handler):
+                handler = f
+            else:
+                event_cls = event if isinstance(event, type) else event.__class__
+                handler = _make_handler(self, event_cls, f)
+            if handler in handlers:
+                handlers.remove(handler)
+                return
+            if not isinstance(f, Handler):
+                # registered for the event under a different class object
+                for handler in handlers:
+                    if handler.f == f:
+                        handlers.remove(handler)
+                        return
         raise ValueError("No matching handler found for %s (%s)" % (event.event_name, f) )
 
     def dispatch_event(self, event, **kw):
@@ -373,9 +975,15 @@ class Dispatcher(base.Base):
             event (:class:`Event`): An class or instance of :class:`Event`
             kw (dict): If a class is passed to event, then the remaining keywords
                 are passed to it to create an instance of the event.
+        Events are only dispatched if a handler or receiver method on this
+        object, or on one of the objects it passes events on to, may receive
+        them; otherwise the event is dropped here.
+
         Returns:
             A :class:`asyncio.Task` or :class:`asyncio.Future` that will
-            complete once all event handlers have been called.
+            complete once all event handlers have been called, or None if
+            the event was delivered to all handlers immediately (see
+            :attr:`inline_dispatch`) or there was nothing to deliver it to.
         Raises:
             :class:`TypeError` if an invalid event is supplied.
         '''
@@ -392,51 +1000,150 @@ class Dispatcher(base.Base):
         else:
             event_cls = event.__class__
 
-        if id(self) in event._delivered_to:
+        if not self._may_deliver(event_cls):
             return
-        event._delivered_to.add(id(self))
 
-        handlers = set()
-        for cls in event._parent_event_classes():
-            for handler in self._dispatch_handlers[cls.event_name]:
+        if not event._mark_delivered(self):
+            return
+
+        # Each handler is registered for a single event class, so appears
+        # at most once here.
+        handlers = []
+        for cls in event._event_classes:
+            registered = self._dispatch_handlers.get(cls.event_name)
+            if not registered:
+                continue
+            oneshots = None
+            for handler in registered.matching(event):
                 if event._is_filtered(handler.f):
                     continue
-
                 if getattr(handler.f, '_oneshot_handler', False):
-                    # Disable oneshot events prior to actual dispatch
-                    handler.disable()
-                handlers.add(handler)
-
-        return asyncio.ensure_future(self._dispatch_event(event, handlers), loop=self._loop)
-
-    async def _dispatch_event(self, event, handlers):
-        # iterate through events from child->parent
-        # update the dispatched_to set for each event so each handler
-        # only receives the most specific event if they are monitoring for both.
-
-        try:
-            # dispatch to local handlers
-            for handler in handlers:
-                if isinstance(handler.f, asyncio.Future):
-                    event._dispatch_to_future(handler.f)
-                else:
+                    if oneshots is None:
+                        oneshots = []
+                    oneshots.append(handler)
+                handlers.append(handler)
+            if oneshots is not None:
+                # Disable oneshot events prior to actual dispatch
+                for handler in oneshots:
+                    registered.discard_all(handler)
+
+        if not self.inline_dispatch:
+            return asyncio.ensure_future(self._dispatch_event(event, handlers), loop=self._loop)
+
+        steps = self._dispatch_steps(event, handlers)
+        pending = None
+        if not self._inline_dispatch_tasks:
+            try:
+                pending = next(steps, None)
+            except exceptions.StopPropogation:
+                return
+            except Exception as exc:
+                # Report handler failures as a Task would, rather than raising
+                # them into whatever triggered the event.
+                self._loop.call_exception_handler({
+                    'message': 'Exception while dispatching %s' % event.event_name,
+                    'exception': exc,
+                })
+                return
+            if pending is None:
+                # delivered to everything without needing to wait
+                return
+
+        # Either a handler returned a coroutine that must complete before
+        # delivery continues, or an earlier event is still being dispatched
+        # from a Task.  Continuing from a Task of its own means this one
+        # can't start before the earlier one; as in task mode, it's
+        # delivered while the earlier one's handler awaits, not after it.
+        task = asyncio.ensure_future(self._continue_dispatch(steps, pending), loop=self._loop)
+        self._inline_dispatch_tasks += 1
+        task.add_done_callback(self._inline_dispatch_done)
+        return task
+
+    def _inline_dispatch_done(self, task):
+        self._inline_dispatch_tasks -= 1
+
+    def _dispatch_steps(self, event, handlers):
+        # Delivers the event, yielding each coroutine returned by a handler
+        # so the caller can await it before delivery continues.
+        # Order is: local handlers, children, self methods and then parent.
+
+        profiler = _dispatch_profiler
+
+        # dispatch to local handlers
+        for handler in handlers:
+            if isinstance(handler.f, asyncio.Future):
+                event._dispatch_to_future(handler.f)
+            else:
+                if profiler is None:
                     result = event._dispatch_to_func(handler.f)
-                    if asyncio.iscoroutine(result):
-                        await result
+                else:
+                    result = self._profile_call(profiler, event, _handler_name(handler.f),
+                            event._dispatch_to_func, handler.f)
+                if asyncio.iscoroutine(result):
+                    yield result
 
-            # dispatch to children
-            for child in self._dispatch_children:
-                child.dispatch_event(event)
+        # dispatch to children
+        for child in self._dispatch_children:
+            child.dispatch_event(event)
 
-            # dispatch to self methods
+        # dispatch to self methods
+        if profiler is None:
             result = event._dispatch_to_obj(self)
-            if asyncio.iscoroutine(result):
-                await result
+        else:
+            names, default_name = _receiver_method_names(self.__class__, event.__class__)
+            if names or default_name:
+                name = '%s.%s' % (self.__class__.__qualname__, names[0] if names else default_name)
+                result = self._profile_call(profiler, event, name, event._dispatch_to_obj, self)
+            else:
+                result = None
+        if asyncio.iscoroutine(result):
+            yield result
+
+        # dispatch to parent dispatcher
+        if self._dispatch_parent:
+            self._dispatch_parent.dispatch_event(event)
+
+    def _profile_call(self, profiler, event, name, call, arg):
+        start = time.perf_counter()
+        try:
+            result = call(arg)
+        except BaseException:
+            self._record_handler_time(profiler, event, name, time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        if asyncio.iscoroutine(result):
+            # the body of a coroutine handler only runs once it's awaited
+            return self._profile_coroutine(profiler, event, name, result, elapsed)
+        self._record_handler_time(profiler, event, name, elapsed)
+        return result
+
+    async def _profile_coroutine(self, profiler, event, name, coro, elapsed):
+        timer = _CoroutineTimer(coro)
+        try:
+            return await timer
+        finally:
+            self._record_handler_time(profiler, event, name, elapsed + timer.elapsed)
+
+    def _record_handler_time(self, profiler, event, name, elapsed):
+        if profiler.record(name, event.event_name, elapsed):
+            logger.warning('%s: handler %s took %.1fms to handle %s (budget %.1fms)',
+                    self, name, elapsed * 1e3, event.event_name, profiler.budget * 1e3)
+            if not isinstance(event, EvtSlowEventHandler):
+                # deliver after the current event, rather than part way through it
+                self._loop.call_soon(functools.partial(self.dispatch_event,
+                        EvtSlowEventHandler, handler_name=name,
+                        handled_event_name=event.event_name, elapsed=elapsed,
+                        budget=profiler.budget))
 
-            # dispatch to parent dispatcher
-            if self._dispatch_parent:
-                self._dispatch_parent.dispatch_event(event)
+    async def _dispatch_event(self, event, handlers):
+        await self._continue_dispatch(self._dispatch_steps(event, handlers))
 
+    async def _continue_dispatch(self, steps, pending=None):
+        try:
+            if pending is not None:
+                await pending
+            for pending in steps:
+                await pending
         except exceptions.StopPropogation:
             pass
 
@@ -446,16 +1153,15 @@ class Dispatcher(base.Base):
         This prevents coroutines awaiting a Future from blocking forever
         should a hard failure occur with the connection.
         '''
-        handlers = set()
-        for evh in self._dispatch_handlers.values():
-            for h in evh:
-                handlers.add(h)
-
-        for handler in handlers:
-            if isinstance(handler.f, asyncio.Future):
-                if not handler.f.done():
-                    handler.f.set_exception(exc)
-                handler.disable()
+        for handlers in self._dispatch_handlers.values():
+            for handler in list(handlers):
+                if isinstance(handler.f, asyncio.Future):
+                    if not handler.f.done():
+                        handler.f.set_exception(exc)
+                    handlers.discard_all(handler)
+                elif isinstance(handler.f, EventStream):
+                    handlers.discard_all(handler)
+                    handler.f._abort(exc)
 
     async def wait_for(self, event_or_filter, timeout=30):
         '''Waits for the specified event to be sent to the current object.
@@ -485,6 +1191,30 @@ class Dispatcher(base.Base):
              return await asyncio.wait_for(f, timeout, loop=self._loop)
         return await f
 
+    def stream(self, event_or_filter, maxlen=100, overflow='drop_oldest'):
+        '''Returns an asynchronous iterator over the events sent to this object.
+
+        Unlike calling :meth:`wait_for` in a loop, events that arrive while
+        the consumer is busy are buffered rather than missed::
+
+            async with robot.world.stream(cozmo.objects.EvtObjectTapped) as taps:
+                async for evt in taps:
+                    print("Tapped", evt.obj)
+
+        Args:
+            event_or_filter (:class:`Event`): Either a :class:`Event` class
+                or a :class:`Filter` instance to receive.
+            maxlen (int): The most events to buffer, or None for no limit.
+            overflow (str): What to do with an event that arrives when the
+                buffer is full: ``'drop_oldest'`` discards the oldest buffered
+                event to make room for it, ``'drop_newest'`` discards it.
+        Returns:
+            An :class:`EventStream`.  Close it when done with it.
+        Raises:
+            :class:`ValueError` if maxlen or overflow is invalid.
+        '''
+        return EventStream(self, event_or_filter, maxlen=maxlen, overflow=overflow)
+
 
 def oneshot(f):
     '''Event handler decorator; causes the handler to only be dispatched to once.'''
@@ -534,6 +1264,12 @@ class Filter:
     """Provides fine-grain filtering of events for dispatch.
 
     See the ::func::`filter_handler` method for further details.
+
+    Dispatchers index handlers with a single filter by one of its exact
+    match values, so waiting on events for a particular object stays cheap
+    however many other waiters there are.  The index is built when the
+    handler is added, so set a filter's values, and apply all of a handler's
+    filters, before adding it.
     """
 
     def __init__(self, event, **filters):
@@ -609,7 +1345,70 @@ async def wait_for_first(*futures, discard_remaining=True, loop=None):
     return result
 
 
+def enable_dispatch_profiling(budget=0.05):
+    '''Start timing every event handler called by any dispatcher.
+
+    Each call is recorded by handler and event type in a
+    :class:`cozmo.metrics.DispatchProfiler`.  Calls that take longer than
+    ``budget`` are logged and reported with an :class:`EvtSlowEventHandler`,
+    as they hold up the processing of everything else, including messages
+    from the robot.  Profiling adds nothing to dispatch while disabled.
+
+    Args:
+        budget (float): The time, in seconds, a handler may take.
+    Returns:
+        The :class:`cozmo.metrics.DispatchProfiler`; call its
+        :meth:`~cozmo.metrics.DispatchProfiler.report` method for a summary.
+        If profiling was already enabled, the existing profiler is returned
+        with its budget updated.
+    '''
+    global _dispatch_profiler
+    if _dispatch_profiler is None:
+        _dispatch_profiler = metrics.DispatchProfiler(budget)
+    else:
+        _dispatch_profiler.budget = budget
+    return _dispatch_profiler
+
+
+def disable_dispatch_profiling():
+    '''Stop timing event handlers.
+
+    Returns:
+        The :class:`cozmo.metrics.DispatchProfiler` that was in use, or None.
+    '''
+    global _dispatch_profiler
+    profiler, _dispatch_profiler = _dispatch_profiler, None
+    return profiler
+
+
 def _abort_futures(exc):
     '''Trigger the exception handler for all pending Future handlers.'''
     for obj in active_dispatchers:
         obj._abort_event_futures(exc)
+
+
+def _subscribed_event_names(event_classes):
+    '''Returns the names of the events in event_classes that something listens for.
+
+    An event counts as listened for if any active dispatcher has a handler
+    registered for it (or one of its parent event classes), or defines a
+    receiver method for it.  Default handlers are not counted.
+    '''
+    handled = set()
+    dispatcher_classes = set()
+    for obj in list(active_dispatchers):
+        dispatcher_classes.add(obj.__class__)
+        for event_name, handlers in obj._dispatch_handlers.items():
+            if handlers:
+                handled.add(event_name)
+
+    names = set()
+    for event_cls in event_classes:
+        if any(cls.event_name in handled for cls in event_cls._event_classes):
+            names.add(event_cls.event_name)
+            continue
+        for obj_cls in dispatcher_classes:
+            if _receiver_method_names(obj_cls, event_cls)[0]:
+                names.add(event_cls.event_name)
+                break
+    return names
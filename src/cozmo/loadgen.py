@@ -0,0 +1,405 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Synthetic engine traffic for stress testing the SDK.
+
+:class:`SyntheticEngine` is a :class:`cozmo.replay.EngineServer` that
+generates configurable streams of ``RobotState``, ``RobotObservedObject``,
+``RobotObservedFace`` and ``ImageChunk`` messages, and answers
+``QueueSingleAction`` requests with ``RobotCompletedAction`` after a
+configurable delay.
+
+:func:`measure_capacity` ramps up the rate of that traffic until the SDK's
+event loop falls behind, to find the scaling limits of the SDK on a given
+machine::
+
+    engine = cozmo.loadgen.SyntheticEngine(robot_state_hz=60, num_faces=10)
+    engine.start_in_thread()
+
+    async def program(sdk_conn):
+        await sdk_conn.wait_for_robot()
+        report = await cozmo.loadgen.measure_capacity(engine, sdk_conn)
+        print(report)
+
+    cozmo.connect(program, connector=engine.connector())
+'''
+
+# __all__ should order by constants, event classes, other classes, functions.
+__all__ = ['LoadReport', 'LoadStep', 'SyntheticEngine', 'measure_capacity']
+
+
+import asyncio
+import collections
+import io
+import math
+import random
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from . import logger
+from . import camera
+from . import metrics
+from . import replay
+
+from ._clad import _clad_to_game_anki, _clad_to_game_cozmo, _clad_to_game_iface
+
+
+_LIGHT_CUBE_TYPES = (_clad_to_game_cozmo.ObjectType.Block_LIGHTCUBE1,
+                     _clad_to_game_cozmo.ObjectType.Block_LIGHTCUBE2,
+                     _clad_to_game_cozmo.ObjectType.Block_LIGHTCUBE3)
+
+
+
+# How often each stream wakes up to send whatever is due, in seconds.
+_STREAM_TICK = 0.005
+# How far a stream may fall behind before sends are dropped, in seconds.
+_STREAM_MAX_BACKLOG = 0.05
+
+
+def _pack(msg):
+    union = _clad_to_game_iface.MessageEngineToGame(**{msg.__class__.__name__: msg})
+    return union.pack()
+
+
+def _make_jpeg(width, height, seed):
+    rnd = random.Random(seed)
+    if Image is None:
+        # Without PIL the SDK can't decode images either; just send noise.
+        return bytes(rnd.randrange(256) for i in range(width * height // 8))
+    image = Image.frombytes('L', (width, height),
+            bytes(rnd.randrange(256) for i in range(width * height)))
+    out = io.BytesIO()
+    image.convert('RGB').save(out, format='JPEG', quality=50)
+    return out.getvalue()
+
+
+class LoadStep(collections.namedtuple('LoadStep', 'offered_rate achieved_rate max_lag')):
+    '''The result of one step of :func:`measure_capacity`.
+
+    ``offered_rate`` is the message rate the engine was configured for,
+    ``achieved_rate`` the rate the SDK actually received, both in messages
+    per second, and ``max_lag`` the worst event loop lag seen, in seconds.
+    '''
+    __slots__ = ()
+
+
+class LoadReport(collections.namedtuple('LoadReport', 'sustained_rate lag_threshold steps')):
+    '''The result of :func:`measure_capacity`.
+
+    ``sustained_rate`` is the highest rate, in messages per second, the SDK
+    accepted without its event loop lag exceeding ``lag_threshold``; it is
+    zero if even the first step failed.  ``steps`` is the list of
+    :class:`LoadStep` instances measured.
+    '''
+    __slots__ = ()
+
+    def __str__(self):
+        lines = ['Sustained %.0f msgs/sec (lag threshold %.0fms)' %
+                 (self.sustained_rate, self.lag_threshold * 1000)]
+        for step in self.steps:
+            lines.append('  offered %9.0f  achieved %9.0f  max lag %7.1fms' %
+                         (step.offered_rate, step.achieved_rate, step.max_lag * 1000))
+        return '\n'.join(lines)
+
+
+class SyntheticEngine(replay.EngineServer):
+    '''A fake engine that generates synthetic traffic for stress testing.
+
+    All rates are multiplied by :attr:`rate_scale`, and may be changed
+    while traffic is flowing.  A rate of zero disables that stream.  The
+    messages themselves are packed once, when the first SDK connects, so
+    other settings must be made before then.
+
+    Args:
+        robot_state_hz (float): Rate to send ``RobotState`` messages at.
+        num_objects (int): Number of objects to report as observed, up to 4
+            (the three light cubes and the charger); the SDK ignores
+            observations of any other object type that it has no definition
+            for.
+        num_faces (int): Number of distinct faces to report as observed.
+        observation_hz (float): Rate to send a ``RobotObservedObject`` for
+            every object and a ``RobotObservedFace`` for every face.
+        image_hz (float): Rate to send complete images, as ``ImageChunk``
+            messages.
+        image_resolution (int): The ``ImageResolution`` of the images.
+        action_delay (float): Seconds to wait before answering each
+            ``QueueSingleAction`` with a ``RobotCompletedAction``.
+        action_result (int): The ``ActionResult`` to complete actions with.
+        loop (:class:`asyncio.BaseEventLoop`): The loop to run the server on.
+    '''
+
+    def __init__(self, robot_state_hz=60, num_objects=0, num_faces=0,
+                 observation_hz=15, image_hz=0,
+                 image_resolution=_clad_to_game_cozmo.ImageResolution.QVGA, action_delay=0.0,
+                 action_result=_clad_to_game_cozmo.ActionResult.SUCCESS, loop=None):
+        super().__init__(loop=loop)
+        if num_objects > len(_LIGHT_CUBE_TYPES) + 1:
+            raise ValueError('At most %d objects are supported' % (len(_LIGHT_CUBE_TYPES) + 1))
+        if image_resolution not in camera.RESOLUTIONS:
+            raise ValueError('Unsupported image resolution %s' % image_resolution)
+        self.robot_state_hz = robot_state_hz
+        self.num_objects = num_objects
+        self.num_faces = num_faces
+        self.observation_hz = observation_hz
+        self.image_hz = image_hz
+        self.image_resolution = image_resolution
+        self.action_delay = action_delay
+        self.action_result = action_result
+
+        #: float: Multiplier applied to all stream rates.
+        self.rate_scale = 1.0
+
+        self._streams = {}
+        self._packed = {}
+        self._pending_actions = {}
+        self._messages_sent = 0
+        # connection -> number of messages streamed to it
+        self._messages_sent_to = {}
+
+    #### Private Methods ####
+
+    def _robot_state_msgs(self):
+        msg = _clad_to_game_iface.RobotState(robotID=1, batteryVoltage=4.5,
+                carryingObjectID=-1, carryingObjectOnTopID=-1,
+                headTrackingObjectID=-1, localizedToObjectID=-1)
+        return [_pack(msg)]
+
+    def _observation_msgs(self):
+        msgs = []
+        for i in range(self.num_objects):
+            if i < len(_LIGHT_CUBE_TYPES):
+                family = _clad_to_game_cozmo.ObjectFamily.LightCube
+                object_type = _LIGHT_CUBE_TYPES[i]
+            else:
+                family = _clad_to_game_cozmo.ObjectFamily.Charger
+                object_type = _clad_to_game_cozmo.ObjectType.Charger_Basic
+            msg = _clad_to_game_iface.RobotObservedObject(robotID=1,
+                    objectFamily=family, objectType=object_type, objectID=i + 1,
+                    pose=_clad_to_game_anki.PoseStruct3d(x=100.0 * (i + 1), q0=1.0))
+            msgs.append(_pack(msg))
+        for i in range(self.num_faces):
+            msg = _clad_to_game_iface.RobotObservedFace(robotID=1, faceID=i + 1,
+                    pose=_clad_to_game_anki.PoseStruct3d(x=500.0, y=100.0 * i, q0=1.0))
+            msgs.append(_pack(msg))
+        return msgs
+
+    def _image_msgs(self):
+        width, height = camera.RESOLUTIONS[self.image_resolution]
+        data = _make_jpeg(width, height, 0)
+        chunk_size = _clad_to_game_cozmo.ImageConstants.IMAGE_CHUNK_SIZE
+        chunk_count = int(math.ceil(len(data) / chunk_size))
+        msgs = []
+        # Every image is given the same id; the SDK only relies on the chunk
+        # ids to reassemble them.
+        for chunk_id in range(chunk_count):
+            msg = _clad_to_game_cozmo.ImageChunk(imageId=1,
+                    imageEncoding=_clad_to_game_cozmo.ImageEncoding.JPEGColor,
+                    resolution=self.image_resolution, imageChunkCount=chunk_count,
+                    chunkId=chunk_id,
+                    data=list(data[chunk_id * chunk_size:(chunk_id + 1) * chunk_size]))
+            msgs.append(_pack(msg))
+        return msgs
+
+    async def _stream(self, proto, rate_attr, msgs):
+        # Sends msgs rate_attr times a second, scaled by rate_scale.  Sends
+        # are batched up every _STREAM_TICK seconds so that high rates aren't
+        # limited by timer resolution.  Falling behind (because the SDK
+        # isn't reading fast enough) drops sends rather than bursting to
+        # catch up.
+        loop = self._loop
+        last_time = loop.time()
+        due = 0
+        while not proto.transport.is_closing():
+            await asyncio.sleep(_STREAM_TICK, loop=loop)
+            now = loop.time()
+            hz = getattr(self, rate_attr) * self.rate_scale
+            due = min(due + (now - last_time) * hz, 1 + hz * _STREAM_MAX_BACKLOG)
+            last_time = now
+
+            while due >= 1:
+                await proto.drain()
+                for msg_buf in msgs:
+                    proto.send_packed(msg_buf)
+                self._messages_sent += len(msgs)
+                self._messages_sent_to[proto] = self._messages_sent_to.get(proto, 0) + len(msgs)
+                due -= 1
+
+    def _complete_action(self, proto, id_tag, result):
+        self._pending_actions.pop((proto, id_tag), None)
+        msg = _clad_to_game_iface.RobotCompletedAction(robotID=1, idTag=id_tag,
+                result=result,
+                completionInfo=_clad_to_game_cozmo.ActionCompletedUnion(
+                    defaultCompleted=_clad_to_game_cozmo.DefaultCompleted()))
+        proto.send_msg(msg)
+
+    def _packed_msgs(self, name):
+        msgs = self._packed.get(name)
+        if msgs is None:
+            msgs = self._packed[name] = getattr(self, name)()
+        return msgs
+
+    #### Properties ####
+
+    @property
+    def messages_sent(self):
+        '''int: The total number of messages generated for all connections.'''
+        return self._messages_sent
+
+    @property
+    def offered_rate(self):
+        '''float: The number of messages per second currently being offered
+        to each connection.'''
+        image_chunks = 0
+        if self.image_hz:
+            image_chunks = len(self._packed_msgs('_image_msgs'))
+        return self.rate_scale * (self.robot_state_hz
+                + self.observation_hz * (self.num_objects + self.num_faces)
+                + self.image_hz * image_chunks)
+
+    #### Commands ####
+
+    def messages_sent_to(self, proto):
+        '''Returns the number of messages generated for one connection.
+
+        Args:
+            proto (:class:`cozmo.replay._EngineProtocol`): The engine's end
+                of the connection (see :meth:`~cozmo.replay.EngineServer.connection_for`).
+        '''
+        return self._messages_sent_to.get(proto, 0)
+
+    #### Hooks ####
+
+    def sdk_connected(self, proto):
+        # send an initial state immediately, so the SDK finds the robot
+        proto.send_packed(self._packed_msgs('_robot_state_msgs')[0])
+        streams = []
+        for rate_attr, msgs_name in (('robot_state_hz', '_robot_state_msgs'),
+                                     ('observation_hz', '_observation_msgs'),
+                                     ('image_hz', '_image_msgs')):
+            msgs = self._packed_msgs(msgs_name)
+            if msgs:
+                streams.append(asyncio.ensure_future(
+                        self._stream(proto, rate_attr, msgs), loop=self._loop))
+        self._streams[proto] = streams
+
+    def sdk_disconnected(self, proto, exc):
+        self._messages_sent_to.pop(proto, None)
+        for stream in self._streams.pop(proto, ()):
+            stream.cancel()
+        for key in [key for key in self._pending_actions if key[0] is proto]:
+            self._pending_actions.pop(key).cancel()
+
+    def message_received(self, proto, msg):
+        super().message_received(proto, msg)
+        tag_name = msg.tag_name
+        msg = msg._data
+        if tag_name == 'RequestAvailableAnimations':
+            proto.send_msg(_clad_to_game_iface.EndOfMessage())
+
+        elif tag_name == 'DeleteAllCustomObjects':
+            proto.send_msg(_clad_to_game_iface.RobotDeletedAllCustomObjects(robotID=1))
+
+        elif tag_name == 'QueueSingleAction':
+            self._pending_actions[(proto, msg.idTag)] = self._loop.call_later(
+                    self.action_delay, self._complete_action, proto, msg.idTag,
+                    self.action_result)
+
+        elif tag_name == 'CancelActionByIdTag':
+            handle = self._pending_actions.pop((proto, msg.idTag), None)
+            if handle is not None:
+                handle.cancel()
+                self._complete_action(proto, msg.idTag,
+                        _clad_to_game_cozmo.ActionResult.CANCELLED_WHILE_RUNNING)
+
+
+async def measure_capacity(engine, sdk_conn, lag_threshold=0.05, step_duration=2.0,
+                           scale_factor=1.5, max_steps=20, loop=None):
+    '''Ramp up an engine's traffic until the SDK can no longer keep up.
+
+    Must be run on the SDK's event loop, while the SDK is connected to the
+    engine.  The engine should normally be run on its own thread (see
+    :meth:`cozmo.replay.EngineServer.start_in_thread`) so that generating
+    the traffic doesn't count against the SDK.
+
+    Each step runs the engine for ``step_duration`` seconds while measuring
+    the lag of the SDK's event loop, then multiplies the engine's
+    :attr:`~SyntheticEngine.rate_scale` by ``scale_factor``.  The ramp stops
+    once the lag exceeds ``lag_threshold`` or ``sdk_conn`` receives less than
+    90% of the traffic offered to it, and the engine's rate_scale is restored.
+    The traffic received is counted from ``sdk_conn``'s own metrics, so it
+    only includes messages the SDK has actually read and decoded.
+
+    Args:
+        engine (:class:`SyntheticEngine`): The engine the SDK is connected to.
+        sdk_conn (:class:`cozmo.conn.CozmoConnection`): The SDK connection
+            to measure.  Traffic the engine sends to any other connections
+            isn't counted.
+        lag_threshold (float): Maximum acceptable event loop lag, in seconds.
+        step_duration (float): How long to run each step for, in seconds.
+        scale_factor (float): How much to increase the rate by at each step.
+        max_steps (int): Maximum number of steps to run.
+        loop (:class:`asyncio.BaseEventLoop`): The SDK's event loop; by
+            default the loop ``sdk_conn`` runs on.
+    Returns:
+        A :class:`LoadReport`.
+    Raises:
+        :class:`ValueError` if ``sdk_conn`` isn't connected to ``engine``, or
+        isn't collecting metrics (see
+        :attr:`cozmo.clad_protocol.CLADProtocol.collect_metrics`).
+    '''
+    if loop is None:
+        loop = sdk_conn.loop
+    proto = engine.connection_for(sdk_conn)
+    if proto is None:
+        raise ValueError('%s is not connected to %s' % (sdk_conn, engine))
+
+    if not sdk_conn.collect_metrics:
+        raise ValueError('%s is not collecting metrics' % sdk_conn)
+
+    initial_scale = engine.rate_scale
+    steps = []
+    sustained_rate = 0
+    try:
+        for i in range(max_steps):
+            offered_rate = engine.offered_rate
+            monitor = metrics.LoopLagMonitor(loop, interval=min(0.01, lag_threshold / 2),
+                    threshold=lag_threshold)
+            start_count = sdk_conn.metrics().received_count
+            start_time = loop.time()
+            monitor.start()
+            try:
+                await asyncio.sleep(step_duration, loop=loop)
+            finally:
+                monitor.stop()
+            # count what the SDK decoded, rather than what the engine wrote;
+            # socket buffers can absorb a lot of traffic the SDK never reads.
+            received = sdk_conn.metrics().received_count - start_count
+            achieved_rate = received / (loop.time() - start_time)
+            max_lag = monitor.max_lag or 0
+
+            step = LoadStep(offered_rate, achieved_rate, max_lag)
+            steps.append(step)
+            logger.info('Load step %d: offered=%.0f achieved=%.0f max_lag=%.1fms',
+                    i, offered_rate, achieved_rate, max_lag * 1000)
+            if max_lag > lag_threshold or achieved_rate < 0.9 * offered_rate:
+                break
+            sustained_rate = achieved_rate
+            engine.rate_scale *= scale_factor
+    finally:
+        engine.rate_scale = initial_scale
+
+    return LoadReport(sustained_rate, lag_threshold, steps)
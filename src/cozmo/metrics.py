@@ -0,0 +1,645 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Per-message protocol metrics.
+
+Each :class:`cozmo.clad_protocol.CLADProtocol` (and so each
+:class:`cozmo.conn.CozmoConnection`) counts the messages and bytes it
+sends and receives for every message type, and records how long a sample
+of the received messages took to decode and to route to the objects that
+handle them (see
+:attr:`cozmo.clad_protocol.CLADProtocol.metrics_timing_interval`).  The
+counters are kept in flat per-tag tables so are cheap enough to leave
+enabled permanently.  The time event handlers themselves take is measured
+separately, by :class:`DispatchProfiler`.
+
+Call :meth:`cozmo.conn.CozmoConnection.metrics` to take a
+:class:`MetricsSnapshot`::
+
+    snapshot = conn.metrics()
+    print(snapshot)
+    robot_state = snapshot.received['RobotState']
+    print(robot_state.count, robot_state.decode_time.percentile(99))
+
+or :meth:`cozmo.conn.CozmoConnection.start_metrics_dump` to log a snapshot
+periodically.
+
+:class:`LinkLatency` tracks the round trip time of pings sent by
+:meth:`cozmo.conn.CozmoConnection.start_pinging`, along with the offset
+between the engine's clock and the host's.
+
+:class:`DispatchProfiler` times the event handlers called by every
+:class:`cozmo.event.Dispatcher` while enabled with
+:func:`cozmo.event.enable_dispatch_profiling`.
+
+:class:`LoopLagMonitor` measures how late the event loop runs scheduled
+callbacks, which shows when the SDK itself, rather than the link to the
+engine, is the bottleneck.
+'''
+
+# __all__ should order by constants, event classes, other classes, functions.
+__all__ = ['DispatchProfiler', 'HandlerStats', 'Histogram', 'LinkLatency', 'LoopLagMonitor',
+           'MessageStats', 'MetricsSnapshot', 'ProtocolMetrics']
+
+
+import bisect
+import collections
+import sys
+import threading
+import time
+import traceback
+
+
+# Upper bounds of the histogram buckets in seconds: 1us, 2us, 4us .. ~1s.
+# Values above the last bound are counted in an extra overflow bucket.
+_BUCKET_BOUNDS = tuple(1e-6 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    '''A histogram of durations with logarithmic (power of two) buckets.'''
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    #: tuple: The upper bound of each bucket, in seconds.
+    bounds = _BUCKET_BOUNDS
+
+    def __init__(self):
+        #: list: The number of values recorded in each bucket.  The final
+        #: entry counts values larger than the last of :attr:`bounds`.
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        #: int: The number of values recorded.
+        self.count = 0
+        #: float: The sum of the values recorded.
+        self.total = 0.0
+        #: float: The smallest value recorded, or None.
+        self.min = None
+        #: float: The largest value recorded, or None.
+        self.max = None
+
+    def __repr__(self):
+        return '<%s count=%d mean=%s max=%s>' % (self.__class__.__name__,
+                self.count, self.mean, self.max)
+
+    @property
+    def mean(self):
+        '''float: The mean of the values recorded, or None.'''
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def record(self, value):
+        '''Record one value.
+
+        Args:
+            value (float): The duration to record, in seconds.
+        '''
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        '''Estimate a percentile of the values recorded.
+
+        The estimate is the upper bound of the bucket the percentile falls
+        in, capped at the largest value recorded.
+
+        Args:
+            pct (float): The percentile to estimate, from 0 to 100.
+        Returns:
+            The estimated value in seconds, or None if nothing was recorded.
+        '''
+        if not self.count:
+            return None
+        target = self.count * pct / 100.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                if i == len(_BUCKET_BOUNDS):
+                    return self.max
+                return min(_BUCKET_BOUNDS[i], self.max)
+        return self.max
+
+    def copy(self):
+        '''Returns an independent copy of the histogram.'''
+        result = Histogram()
+        result.counts = list(self.counts)
+        result.count = self.count
+        result.total = self.total
+        result.min = self.min
+        result.max = self.max
+        return result
+
+
+class MessageStats:
+    '''Counters for one type of message.
+
+    Args:
+        timed (bool): If True, the stats include decode and routing timings,
+            as collected for received messages.
+    '''
+
+    __slots__ = ('count', 'bytes', 'dropped', 'decode_time', 'route_time')
+
+    def __init__(self, timed=False):
+        #: int: The number of messages.
+        self.count = 0
+        #: int: The number of bytes, including the size prefix of each message.
+        self.bytes = 0
+        #: int: For sent messages, the number that were never written to the
+        #: transport, as the connection was closed or they were dropped from
+        #: the queue while writing was paused.
+        self.dropped = 0
+        #: :class:`Histogram`: For received messages, the time taken to
+        #: decode each sampled message; None for sent messages.
+        self.decode_time = Histogram() if timed else None
+        #: :class:`Histogram`: For received messages, the time taken by
+        #: :meth:`~cozmo.clad_protocol.CLADProtocol.msg_received` for each
+        #: sampled message; None for sent messages.  That covers routing the
+        #: message and dispatching the resulting event, but unless
+        #: :attr:`cozmo.event.Dispatcher.inline_dispatch` is set, dispatching
+        #: only schedules a Task to run the event handlers later, so their
+        #: run time isn't included (see :class:`DispatchProfiler`).
+        self.route_time = Histogram() if timed else None
+
+    def __repr__(self):
+        return '<%s count=%d bytes=%d>' % (self.__class__.__name__, self.count, self.bytes)
+
+    def copy(self):
+        '''Returns an independent copy of the stats.'''
+        result = MessageStats()
+        result.count = self.count
+        result.bytes = self.bytes
+        result.dropped = self.dropped
+        if self.decode_time is not None:
+            result.decode_time = self.decode_time.copy()
+            result.route_time = self.route_time.copy()
+        return result
+
+
+def _format_us(value):
+    if value is None:
+        return '-'
+    return '%.0f' % (value * 1e6)
+
+
+class MetricsSnapshot(collections.namedtuple('MetricsSnapshot',
+        'duration received sent queue_depth max_queue_depth')):
+    '''A point in time copy of a connection's metrics.
+
+    Attributes:
+        duration (float): Seconds since the metrics started being collected.
+        received (dict): :class:`MessageStats` for each type of message
+            received, by message name.
+        sent (dict): :class:`MessageStats` for each type of message sent,
+            by message name.
+        queue_depth (int): The number of outgoing messages queued while the
+            transport has paused writing.
+        max_queue_depth (int): The largest number of messages ever queued.
+    '''
+    __slots__ = ()
+
+    @property
+    def received_count(self):
+        '''int: The total number of messages received.'''
+        return sum(stats.count for stats in self.received.values())
+
+    @property
+    def received_bytes(self):
+        '''int: The total number of bytes received.'''
+        return sum(stats.bytes for stats in self.received.values())
+
+    @property
+    def sent_count(self):
+        '''int: The total number of messages sent.'''
+        return sum(stats.count for stats in self.sent.values())
+
+    @property
+    def sent_bytes(self):
+        '''int: The total number of bytes sent.'''
+        return sum(stats.bytes for stats in self.sent.values())
+
+    @property
+    def dropped_count(self):
+        '''int: The total number of outgoing messages dropped.'''
+        return sum(stats.dropped for stats in self.sent.values())
+
+    def __str__(self):
+        duration = self.duration or 1
+        lines = ['%-36s %9s %9s %11s %9s %9s %9s %9s' % ('received', 'count', 'msgs/sec',
+                 'bytes/sec', 'dec p50us', 'dec p99us', 'rte p50us', 'rte p99us')]
+        for name, stats in sorted(self.received.items(), key=lambda item: -item[1].count):
+            lines.append('%-36s %9d %9.1f %11.0f %9s %9s %9s %9s' % (
+                name, stats.count, stats.count / duration, stats.bytes / duration,
+                _format_us(stats.decode_time.percentile(50)),
+                _format_us(stats.decode_time.percentile(99)),
+                _format_us(stats.route_time.percentile(50)),
+                _format_us(stats.route_time.percentile(99))))
+        lines.append('%-36s %9s %9s %11s %9s' % ('sent', 'count', 'msgs/sec', 'bytes/sec',
+                     'dropped'))
+        for name, stats in sorted(self.sent.items(), key=lambda item: -item[1].count):
+            lines.append('%-36s %9d %9.1f %11.0f %9d' % (
+                name, stats.count, stats.count / duration, stats.bytes / duration, stats.dropped))
+        lines.append('queue depth %d (max %d)' % (self.queue_depth, self.max_queue_depth))
+        return '\n'.join(lines)
+
+
+class ProtocolMetrics:
+    '''Collects the metrics for one connection, indexed by union tag.'''
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        #: int: The largest number of outgoing messages queued at once.
+        self.max_queue_depth = 0
+        self._received = [None] * 256
+        self._sent = [None] * 256
+
+    def received(self, tag):
+        '''Returns the :class:`MessageStats` for received messages with this tag.'''
+        stats = self._received[tag]
+        if stats is None:
+            stats = self._received[tag] = MessageStats(timed=True)
+        return stats
+
+    def sent(self, tag):
+        '''Returns the :class:`MessageStats` for sent messages with this tag.'''
+        stats = self._sent[tag]
+        if stats is None:
+            stats = self._sent[tag] = MessageStats()
+        return stats
+
+    def snapshot(self, recv_tags, send_tags, queue_depth=0):
+        '''Returns a :class:`MetricsSnapshot` of the metrics collected so far.
+
+        Args:
+            recv_tags (dict): Message name to tag for received messages.
+            send_tags (dict): Message name to tag for sent messages.
+            queue_depth (int): The number of outgoing messages currently queued.
+        '''
+        return MetricsSnapshot(
+            duration=time.monotonic() - self.start_time,
+            received=self._by_name(self._received, recv_tags),
+            sent=self._by_name(self._sent, send_tags),
+            queue_depth=queue_depth,
+            max_queue_depth=self.max_queue_depth)
+
+    @staticmethod
+    def _by_name(table, tags):
+        result = {}
+        if tags is None:
+            return result
+        for name, tag in tags.items():
+            stats = table[tag]
+            if stats is not None:
+                result[name] = stats.copy()
+        return result
+
+
+class LinkLatency:
+    '''Round trip time and clock offset estimates for the link to the engine.
+
+    Round trip times are kept both in a cumulative :class:`Histogram` and in
+    a rolling window of the most recent samples, from which the current
+    latency is estimated.
+
+    Args:
+        window (int): The number of recent samples to base estimates on.
+    '''
+
+    def __init__(self, window=50):
+        #: :class:`Histogram`: Every round trip time measured, in seconds.
+        self.rtt_histogram = Histogram()
+        #: int: The number of pings that were never answered.
+        self.pings_lost = 0
+        self._rtts = collections.deque(maxlen=window)
+        self._offsets = collections.deque(maxlen=window)
+
+    def __repr__(self):
+        return '<%s rtt=%s mean_rtt=%s clock_offset=%s>' % (self.__class__.__name__,
+                self.rtt, self.mean_rtt, self.clock_offset)
+
+    def record_rtt(self, rtt):
+        '''Record the round trip time of one ping.
+
+        Args:
+            rtt (float): The round trip time, in seconds.
+        '''
+        self.rtt_histogram.record(rtt)
+        self._rtts.append(rtt)
+
+    def record_engine_time(self, engine_time, host_time):
+        '''Record the engine's clock as seen when one of its messages arrived.
+
+        Args:
+            engine_time (float): The engine's timestamp for the message, in seconds.
+            host_time (float): The host's monotonic time when it arrived, in seconds.
+        '''
+        self._offsets.append(engine_time - host_time)
+
+    @property
+    def rtt(self):
+        '''float: The most recent round trip time in seconds, or None.'''
+        if not self._rtts:
+            return None
+        return self._rtts[-1]
+
+    @property
+    def mean_rtt(self):
+        '''float: The mean round trip time over the recent window in seconds, or None.'''
+        if not self._rtts:
+            return None
+        return sum(self._rtts) / len(self._rtts)
+
+    def percentile(self, pct):
+        '''The given percentile of the round trip times in the recent window.
+
+        Args:
+            pct (float): The percentile to return, from 0 to 100.
+        Returns:
+            The round trip time in seconds, or None if none have been measured.
+        '''
+        if not self._rtts:
+            return None
+        rtts = sorted(self._rtts)
+        index = min(len(rtts) - 1, int(len(rtts) * pct / 100.0))
+        return rtts[index]
+
+    @property
+    def clock_offset(self):
+        '''float: The estimated engine clock time minus the host's monotonic
+        time in seconds, or None if no engine timestamps have been seen.
+
+        Transit delays only ever make the engine's clock appear further
+        behind, so the estimate uses the largest recent sample, corrected by
+        half the mean round trip time when that is known.
+        '''
+        if not self._offsets:
+            return None
+        return max(self._offsets) + (self.mean_rtt or 0) / 2
+
+    def engine_to_host_time(self, engine_time):
+        '''Convert an engine timestamp to the host's monotonic clock.
+
+        Args:
+            engine_time (float): The engine time, in seconds.
+        Returns:
+            The equivalent :func:`time.monotonic` time, or None if the
+            clock offset is not yet known.
+        '''
+        offset = self.clock_offset
+        if offset is None:
+            return None
+        return engine_time - offset
+
+
+class HandlerStats:
+    '''Timings for one event handler handling one type of event.'''
+
+    __slots__ = ('time', 'slow_count')
+
+    def __init__(self):
+        #: :class:`Histogram`: The time taken by each call to the handler.
+        self.time = Histogram()
+        #: int: The number of calls that exceeded the profiler's budget.
+        self.slow_count = 0
+
+    def __repr__(self):
+        return '<%s count=%d total=%s slow=%d>' % (self.__class__.__name__,
+                self.count, self.time.total, self.slow_count)
+
+    @property
+    def count(self):
+        '''int: The number of times the handler was called.'''
+        return self.time.count
+
+    def copy(self):
+        '''Returns an independent copy of the stats.'''
+        result = HandlerStats()
+        result.time = self.time.copy()
+        result.slow_count = self.slow_count
+        return result
+
+
+class DispatchProfiler:
+    '''Records how long event handlers take, by handler and event type.
+
+    Only the time a handler spends running is recorded.  For coroutine
+    handlers that is the total time spent running until the coroutine
+    completes; time spent suspended in an ``await`` isn't counted.
+
+    Args:
+        budget (float): Calls taking longer than this many seconds are
+            counted as slow.
+    '''
+
+    def __init__(self, budget=0.05):
+        #: float: The time in seconds a handler may take before it's counted as slow.
+        self.budget = budget
+        self.start_time = time.monotonic()
+        self._stats = {}
+
+    def __repr__(self):
+        return '<%s budget=%s handlers=%d>' % (self.__class__.__name__,
+                self.budget, len(self._stats))
+
+    def record(self, handler_name, event_name, elapsed):
+        '''Record one call to a handler.
+
+        Args:
+            handler_name (str): The qualified name of the handler.
+            event_name (str): The name of the event it was called with.
+            elapsed (float): The time the call took, in seconds.
+        Returns:
+            True if the call exceeded :attr:`budget`.
+        '''
+        key = (handler_name, event_name)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = HandlerStats()
+        stats.time.record(elapsed)
+        if elapsed > self.budget:
+            stats.slow_count += 1
+            return True
+        return False
+
+    def stats(self):
+        '''Returns a copy of the :class:`HandlerStats` recorded so far.
+
+        Returns:
+            A dict mapping ``(handler_name, event_name)`` to :class:`HandlerStats`.
+        '''
+        return {key: stats.copy() for key, stats in self._stats.items()}
+
+    def report(self, limit=20):
+        '''Returns a table of the handlers that took the most time in total.
+
+        Args:
+            limit (int): The maximum number of handlers to list, or None for all.
+        '''
+        items = sorted(self._stats.items(), key=lambda item: -item[1].time.total)
+        if limit is not None:
+            items = items[:limit]
+        lines = ['%-48s %-28s %9s %9s %9s %9s %9s %6s' % ('handler', 'event', 'count',
+                 'total ms', 'mean us', 'p99 us', 'max us', 'slow')]
+        for (handler_name, event_name), stats in items:
+            hist = stats.time
+            lines.append('%-48s %-28s %9d %9.1f %9s %9s %9s %6d' % (
+                handler_name, event_name, hist.count, hist.total * 1e3,
+                _format_us(hist.mean), _format_us(hist.percentile(99)),
+                _format_us(hist.max), stats.slow_count))
+        return '\n'.join(lines)
+
+    def reset(self):
+        '''Discard everything recorded so far.'''
+        self.start_time = time.monotonic()
+        self._stats.clear()
+
+
+class LoopLagMonitor:
+    '''Measures the scheduling lag of an event loop.
+
+    Every ``interval`` seconds the monitor schedules a callback and records
+    how much later than requested it actually ran.  A busy loop, for
+    example one decoding camera images or running a slow event handler,
+    runs it late.
+
+    With ``dump_stacks`` set, a watchdog thread also notices when the loop
+    has stopped running callbacks for longer than ``threshold`` and captures
+    the loop thread's stack at that moment, which shows the code that's
+    holding it up.
+
+    Args:
+        loop (:class:`asyncio.BaseEventLoop`): The loop to monitor.
+        interval (float): Seconds between each measurement.
+        threshold (float): Lag, in seconds, above which ``callback`` is called.
+        callback (callable): Called on the loop with the lag in seconds and
+            the captured stack (a string, or None) for each measurement
+            that exceeds ``threshold``.
+        dump_stacks (bool): Whether to capture the stack of stalled loops.
+    '''
+
+    def __init__(self, loop, interval=0.1, threshold=0.1, callback=None, dump_stacks=False):
+        self.interval = interval
+        #: float: The lag, in seconds, considered too high.
+        self.threshold = threshold
+        #: :class:`Histogram`: Every lag measured, in seconds.
+        self.lag_histogram = Histogram()
+        #: float: The most recent lag measured, in seconds, or None.
+        self.last_lag = None
+        #: str: The stack captured during the most recent stall, or None.
+        self.last_stall_stack = None
+        self._loop = loop
+        self._callback = callback
+        self._dump_stacks = dump_stacks
+        self._handle = None
+        self._expected_time = None
+        self._heartbeat = None
+        self._loop_thread_id = None
+        self._watchdog = None
+        self._watchdog_stop = None
+        # the heartbeat the watchdog captured a stack for, and that stack
+        self._stall = (None, None)
+
+    def __repr__(self):
+        return '<%s interval=%s threshold=%s last_lag=%s running=%s>' % (
+                self.__class__.__name__, self.interval, self.threshold,
+                self.last_lag, self.is_running)
+
+    #### Private Methods ####
+
+    def _schedule(self):
+        self._heartbeat = time.monotonic()
+        self._expected_time = self._loop.time() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._measure)
+
+    def _measure(self):
+        lag = max(0.0, self._loop.time() - self._expected_time)
+        heartbeat = self._heartbeat
+        self.lag_histogram.record(lag)
+        self.last_lag = lag
+        self._schedule()
+        if lag > self.threshold:
+            stall_heartbeat, stack = self._stall
+            if stall_heartbeat != heartbeat:
+                # the watchdog didn't catch this stall
+                stack = None
+            if self._callback is not None:
+                self._callback(lag, stack)
+
+    def _watch(self, stop):
+        # runs on the watchdog thread
+        check_interval = min(self.interval, self.threshold) / 2
+        while not stop.wait(check_interval):
+            heartbeat = self._heartbeat
+            if heartbeat is None or self._stall[0] == heartbeat:
+                continue
+            if time.monotonic() - heartbeat - self.interval > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                stack = ''.join(traceback.format_stack(frame))
+                del frame
+                self.last_stall_stack = stack
+                self._stall = (heartbeat, stack)
+
+    #### Properties ####
+
+    @property
+    def is_running(self):
+        '''bool: True while the monitor is measuring.'''
+        return self._handle is not None
+
+    @property
+    def max_lag(self):
+        '''float: The largest lag measured, in seconds, or None.'''
+        return self.lag_histogram.max
+
+    def percentile(self, pct):
+        '''Estimate a percentile of the lags measured.
+
+        Args:
+            pct (float): The percentile to estimate, from 0 to 100.
+        Returns:
+            The estimated lag in seconds, or None if nothing was measured.
+        '''
+        return self.lag_histogram.percentile(pct)
+
+    #### Commands ####
+
+    def start(self):
+        '''Start measuring.  Must be called from the loop's own thread.'''
+        if self.is_running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._schedule()
+        if self._dump_stacks:
+            self._watchdog_stop = threading.Event()
+            self._watchdog = threading.Thread(target=self._watch, args=(self._watchdog_stop,),
+                    name='LoopLagMonitor', daemon=True)
+            self._watchdog.start()
+
+    def stop(self):
+        '''Stop measuring.'''
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._heartbeat = None
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog.join()
+            self._watchdog = None
@@ -185,6 +185,13 @@ class ObservableElement(event.Dispatcher):
         #: In milliseconds relative to robot epoch.
         self.last_observed_robot_timestamp = None
 
+        #: float: The host time (as per :func:`time.time`) at which the image
+        #: the element was last observed in was captured, estimated from
+        #: :attr:`last_observed_robot_timestamp` by the robot's
+        #: :class:`~cozmo.clocksync.RobotClockSync`.
+        #: ``None`` if not observed, or the clocks are not yet synced.
+        self.last_observed_capture_time = None
+
         #: :class:`~cozmo.util.ImageBox`: The ImageBox defining where the
         #: object was last visible within Cozmo's camera view.
         #: ``None`` if the element has not yet been observed.
@@ -245,15 +252,21 @@ class ObservableElement(event.Dispatcher):
         self._is_visible = True
 
         changed_fields |= {'last_observed_time', 'last_observed_robot_timestamp',
-                           'last_event_time', 'last_observed_image_box'}
+                           'last_observed_capture_time', 'last_event_time',
+                           'last_observed_image_box'}
 
         now = time.time()
         self.last_observed_time = now
         self.last_observed_robot_timestamp = timestamp
+        robot = self._robot if self._robot is not None else getattr(self.world, 'robot', None)
+        if robot is not None:
+            self.last_observed_capture_time = robot.clock_sync.robot_to_host_time(timestamp)
         self.last_event_time = now
         self.last_observed_image_box = image_box
         self._reset_observed_timeout_handler()
         self._dispatch_observed_event(changed_fields, image_box)
+        if self.world is not None and self.world.batch_observations:
+            self.world._add_observation(self, timestamp, changed_fields)
 
         if newly_visible:
             self._dispatch_appeared_event(changed_fields, image_box)
@@ -0,0 +1,251 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Recording of the raw CLAD traffic between the SDK and the engine.
+
+A :class:`SessionRecorder` attached to a connection (see
+:meth:`cozmo.conn.CozmoConnection.start_recording`) appends every message
+sent and received to a compact binary file, which can later be read back
+with a :class:`SessionReader` for offline analysis.
+
+Recording copies each raw message into a buffered file without decoding or
+formatting it, so is cheap enough to leave enabled while streaming camera
+images.
+
+The recording file starts with a header::
+
+    8s  magic (b'COZMOREC')
+    H   format version
+    d   wall clock time (time.time()) the recording started
+    d   monotonic time (time.monotonic()) the recording started
+
+followed by one record per message::
+
+    d   monotonic time the message was sent or received
+    B   direction (:data:`DIRECTION_RECV` or :data:`DIRECTION_SEND`)
+    H   message length
+    ... the message bytes, exactly as sent over the wire
+
+All values are little-endian.  Every ``index_interval`` messages an entry
+is also appended to an index file alongside the recording (the same path
+with ``.idx`` appended) so readers can seek by time without scanning the
+entire recording.  Each index entry is::
+
+    d   monotonic time of the message
+    Q   offset of the message's record in the recording file
+    Q   number of the message within the recording
+'''
+
+# __all__ should order by constants, event classes, other classes, functions.
+__all__ = ['DIRECTION_RECV', 'DIRECTION_SEND', 'SessionRecorder', 'SessionReader']
+
+
+import bisect
+import mmap
+import os
+import struct
+import time
+
+
+#: Direction of a message received by the SDK from the engine.
+DIRECTION_RECV = 0
+#: Direction of a message sent by the SDK to the engine.
+DIRECTION_SEND = 1
+
+_MAGIC = b'COZMOREC'
+_VERSION = 1
+
+_file_header = struct.Struct('<8sHdd')
+_record_header = struct.Struct('<dBH')
+_index_entry = struct.Struct('<dQQ')
+
+
+def _index_path(path):
+    return path + '.idx'
+
+
+class SessionRecorder:
+    '''Records raw CLAD messages to a file.
+
+    Args:
+        path (str): The file to write the recording to.  Any existing
+            file will be overwritten.
+        index_interval (int): How many messages to record between each
+            entry in the seek index.
+    '''
+
+    def __init__(self, path, index_interval=1000):
+        self.path = path
+        self.index_interval = index_interval
+        self._file = open(path, 'wb')
+        self._index_file = open(_index_path(path), 'wb')
+        self.start_time = time.time()
+        self.start_monotonic = time.monotonic()
+        self._file.write(_file_header.pack(_MAGIC, _VERSION,
+                self.start_time, self.start_monotonic))
+        self._offset = _file_header.size
+        self._message_count = 0
+
+    def __repr__(self):
+        return '<%s path=%s message_count=%d>' % (self.__class__.__name__,
+                self.path, self._message_count)
+
+    @property
+    def message_count(self):
+        '''int: The number of messages recorded so far.'''
+        return self._message_count
+
+    @property
+    def is_closed(self):
+        '''bool: True once the recording has been closed.'''
+        return self._file is None
+
+    def record(self, direction, data, timestamp=None):
+        '''Append a single message to the recording.
+
+        Args:
+            direction (int): :data:`DIRECTION_RECV` or :data:`DIRECTION_SEND`
+            data (bytes-like): The packed message, without its size prefix.
+            timestamp (float): The monotonic time the message was sent or
+                received.  Defaults to now.
+        '''
+        if self._file is None:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        if self._message_count % self.index_interval == 0:
+            self._index_file.write(_index_entry.pack(timestamp, self._offset, self._message_count))
+
+        self._file.write(_record_header.pack(timestamp, direction, len(data)))
+        self._file.write(data)
+        self._offset += _record_header.size + len(data)
+        self._message_count += 1
+
+    def flush(self):
+        '''Flush buffered messages out to the file.'''
+        if self._file is not None:
+            self._file.flush()
+            self._index_file.flush()
+
+    def close(self):
+        '''Flush and close the recording.'''
+        if self._file is not None:
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+
+class SessionReader:
+    '''Reads back a recording written by :class:`SessionRecorder`.
+
+    The recording is memory mapped; the data of each message returned is a
+    :class:`memoryview` onto the file and is only valid until the reader is
+    closed.
+
+    Iterating over the reader yields ``(timestamp, direction, data)`` tuples
+    for each message in the order they were recorded.
+
+    Args:
+        path (str): The recording to read.
+    Raises:
+        :class:`ValueError` if the file isn't a recording.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _file_header.size:
+                raise ValueError('%s is not a CLAD session recording' % path)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, self.start_time, self.start_monotonic = _file_header.unpack_from(self._view)
+        if magic != _MAGIC:
+            raise ValueError('%s is not a CLAD session recording' % path)
+        if version != _VERSION:
+            raise ValueError('Unsupported recording version %d in %s' % (version, path))
+
+        self._index_times, self._index_offsets = self._load_index()
+
+    def __repr__(self):
+        return '<%s path=%s>' % (self.__class__.__name__, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return self.messages()
+
+    def _load_index(self):
+        times = []
+        offsets = []
+        try:
+            with open(_index_path(self.path), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return times, offsets
+        size = len(self._view)
+        for i in range(len(data) // _index_entry.size):
+            timestamp, offset, message_number = _index_entry.unpack_from(data, i * _index_entry.size)
+            # ignore entries for messages that never made it to disk
+            if offset + _record_header.size > size:
+                break
+            times.append(timestamp)
+            offsets.append(offset)
+        return times, offsets
+
+    def messages(self, start_time=None):
+        '''Generates the recorded messages.
+
+        Args:
+            start_time (float): Optionally skip messages recorded before this
+                monotonic time (see :attr:`start_monotonic`).  The index is
+                used to avoid scanning the start of the recording.
+        Returns:
+            A generator of ``(timestamp, direction, data)`` tuples.
+        '''
+        view = self._view
+        size = len(view)
+        offset = _file_header.size
+        if start_time is not None and self._index_times:
+            i = bisect.bisect_right(self._index_times, start_time) - 1
+            if i >= 0:
+                offset = self._index_offsets[i]
+
+        while offset + _record_header.size <= size:
+            timestamp, direction, length = _record_header.unpack_from(view, offset)
+            offset += _record_header.size
+            if offset + length > size:
+                # truncated final record
+                return
+            if start_time is None or timestamp >= start_time:
+                yield timestamp, direction, view[offset:offset+length]
+            offset += length
+
+    def close(self):
+        '''Release the memory mapped recording.'''
+        if self._mmap is not None:
+            self._view.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # message data is still referenced; the map will be
+                # released once that's garbage collected.
+                pass
+            self._mmap = None
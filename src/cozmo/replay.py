@@ -0,0 +1,393 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Local stand-in engines for testing and benchmarking without a robot.
+
+An :class:`EngineServer` listens on a local TCP port and speaks the engine
+side of the CLAD protocol, including the ``UiDeviceConnected`` handshake,
+so that an unmodified :class:`cozmo.conn.CozmoConnection` can connect to it
+using the :class:`cozmo.run.TCPConnector` returned by
+:meth:`EngineServer.connector`.
+
+:class:`ReplayEngine` plays back the engine to SDK traffic from a session
+recorded with :meth:`cozmo.conn.CozmoConnection.start_recording` (or any
+other sequence of timestamped messages) in real time, at a multiple of real
+time, or as fast as the SDK can accept it::
+
+    engine = cozmo.replay.ReplayEngine('session.rec', speed=4.0)
+    loop.run_until_complete(engine.start())
+    cozmo.connect(program, connector=engine.connector())
+'''
+
+# __all__ should order by constants, event classes, other classes, functions.
+__all__ = ['EngineServer', 'ReplayEngine']
+
+
+import asyncio
+import concurrent.futures
+import threading
+
+import cozmoclad
+from cozmoclad.clad.externalInterface import messageEngineToGame_hash
+from cozmoclad.clad.externalInterface import messageGameToEngine_hash
+
+from . import logger
+from . import clad_protocol
+from . import recording
+from . import run
+
+from ._clad import _clad_to_engine_iface, _clad_to_game_cozmo, _clad_to_game_iface
+
+
+def _clad_hash(value):
+    return list(value.to_bytes(16, byteorder='little'))
+
+
+class _EngineProtocol(clad_protocol.CLADProtocol):
+    '''The engine side of a single SDK connection.'''
+
+    clad_decode_union = _clad_to_engine_iface.MessageGameToEngine
+    clad_encode_union = _clad_to_game_iface.MessageEngineToGame
+
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+        self._can_write = asyncio.Event(loop=server._loop)
+        self._can_write.set()
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.server._connection_made(self)
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        # release anything waiting for the transport to drain
+        self._can_write.set()
+        self.server._connection_lost(self, exc)
+
+    def pause_writing(self):
+        super().pause_writing()
+        self._can_write.clear()
+
+    def resume_writing(self):
+        super().resume_writing()
+        self._can_write.set()
+
+    async def drain(self):
+        '''Wait until the transport's write buffer has room for more data.'''
+        await self._can_write.wait()
+
+    def send_packed(self, msg_buf):
+        '''Send an already packed ``MessageEngineToGame`` union.'''
+        if self.transport.is_closing():
+            return
+        self._write_frame(clad_protocol._size_prefix.pack(len(msg_buf)) + msg_buf)
+
+    def msg_received(self, msg):
+        self.server.message_received(self, msg)
+
+
+class EngineServer:
+    '''Base class for local engines that SDK connections can connect to.
+
+    On each new connection the server sends the ``UiDeviceConnected``
+    handshake using the CLAD hashes and build version of the installed
+    cozmoclad package, so the SDK will always accept it, and answers any
+    pings from the SDK.  Once the SDK replies to the handshake,
+    :meth:`sdk_connected` is called; subclasses override it (and
+    :meth:`message_received`) to generate traffic.
+
+    Args:
+        loop (:class:`asyncio.BaseEventLoop`): The loop to run the server on.
+    '''
+
+    def __init__(self, loop=None):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._server = None
+        self._thread = None
+        self.host = None
+        #: list: The :class:`_EngineProtocol` instances of connected SDKs.
+        self.connections = []
+
+    def __repr__(self):
+        return '<%s host=%s port=%s connections=%d>' % (self.__class__.__name__,
+                self.host, self.port, len(self.connections))
+
+    #### Private Methods ####
+
+    def _connection_made(self, proto):
+        self.connections.append(proto)
+        logger.debug('%s: SDK connected', self)
+        msg = _clad_to_game_iface.UiDeviceConnected(
+                connectionType=_clad_to_game_cozmo.UiConnectionType.SdkOverTcp,
+                deviceID=1,
+                successful=True,
+                toGameCLADHash=_clad_hash(messageEngineToGame_hash.messageEngineToGameHash),
+                toEngineCLADHash=_clad_hash(messageGameToEngine_hash.messageGameToEngineHash),
+                buildVersion=cozmoclad.__build_version__)
+        proto.send_msg(msg)
+
+    def _connection_lost(self, proto, exc):
+        if proto in self.connections:
+            self.connections.remove(proto)
+        self.sdk_disconnected(proto, exc)
+
+    #### Properties ####
+
+    @property
+    def port(self):
+        '''int: The TCP port the server is listening on, or None if not started.'''
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    #### Hooks ####
+
+    def sdk_connected(self, proto):
+        '''Called once an SDK has accepted the connection handshake.
+
+        Args:
+            proto (:class:`_EngineProtocol`): The connection to the SDK.
+        '''
+
+    def sdk_disconnected(self, proto, exc):
+        '''Called when an SDK connection is closed.'''
+
+    def message_received(self, proto, msg):
+        '''Called with each ``MessageGameToEngine`` union sent by the SDK.
+
+        Args:
+            proto (:class:`_EngineProtocol`): The connection that sent the message.
+            msg: The decoded CLAD union.
+        '''
+        tag_name = msg.tag_name
+        if tag_name == 'UiDeviceConnectionSuccess':
+            self.sdk_connected(proto)
+        elif tag_name == 'UiDeviceConnectionWrongVersion':
+            logger.error('%s: SDK rejected the connection: %s', self, msg._data)
+            proto.close()
+        elif tag_name == 'Ping' and not msg._data.isResponse:
+            proto.send_msg(_clad_to_game_iface.Ping(counter=msg._data.counter,
+                    timeSent_ms=msg._data.timeSent_ms, isResponse=True))
+
+    #### Commands ####
+
+    async def start(self, host='127.0.0.1', port=0):
+        '''Start listening for SDK connections.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on; by default a free port is
+                chosen (see :attr:`port`).
+        Returns:
+            The server instance.
+        '''
+        self.host = host
+        self._server = await self._loop.create_server(
+                lambda: _EngineProtocol(self), host, port)
+        return self
+
+    async def stop(self):
+        '''Stop listening and close any open SDK connections.'''
+        if self._server is None:
+            return
+        self._server.close()
+        for proto in list(self.connections):
+            proto.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        '''Start the server on a new event loop in a background thread.
+
+        Running the engine on its own thread keeps the cost of generating
+        traffic out of measurements of the SDK's own event loop.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on.
+        Returns:
+            The server instance, once it is listening.
+        '''
+        self._loop = asyncio.new_event_loop()
+        started = concurrent.futures.Future()
+
+        def run_loop():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.start(host, port))
+            except Exception as e:
+                started.set_exception(e)
+                self._loop.close()
+                return
+            started.set_result(self)
+            try:
+                self._loop.run_forever()
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run_loop, name='EngineServer', daemon=True)
+        self._thread.start()
+        return started.result()
+
+    def stop_thread(self):
+        '''Stop a server started with :meth:`start_in_thread`.'''
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def connector(self, **kw):
+        '''Returns a :class:`cozmo.run.TCPConnector` that connects to this server.
+
+        Keyword arguments are passed on to the connector.
+        '''
+        return run.TCPConnector(tcp_port=self.port, ip_addr=self.host, **kw)
+
+    def connection_for(self, sdk_conn):
+        '''Returns the server's end of an SDK connection.
+
+        Args:
+            sdk_conn (:class:`cozmo.conn.CozmoConnection`): A connection
+                from the SDK to this server.
+        Returns:
+            The :class:`_EngineProtocol` the server is using to talk to
+            ``sdk_conn``, or None if it isn't connected to this server.
+        '''
+        sockname = sdk_conn.transport.get_extra_info('sockname')
+        for proto in list(self.connections):
+            if proto.transport.get_extra_info('peername') == sockname:
+                return proto
+        return None
+
+
+class ReplayEngine(EngineServer):
+    '''Replays recorded engine traffic to each SDK that connects.
+
+    Replay of the messages starts once the SDK has completed the connection
+    handshake.  Any ``UiDeviceConnected`` messages in the source are skipped,
+    as the server has already sent its own.
+
+    Args:
+        source: The messages to replay.  Either the path of a recording made
+            by :class:`cozmo.recording.SessionRecorder`, an open
+            :class:`cozmo.recording.SessionReader`, or an iterable of
+            ``(timestamp, msg)`` tuples where ``msg`` is an already packed
+            ``MessageEngineToGame`` union or a CLAD engine to game message.
+            Only recordings and lists can be replayed more than once.
+        speed (float): The multiple of real time to replay at.  ``None``
+            replays as fast as the SDK accepts the messages.
+        start_time (float): For recordings, skip messages recorded before
+            this monotonic time.
+        loop (:class:`asyncio.BaseEventLoop`): The loop to run the server on.
+    '''
+
+    def __init__(self, source, speed=1.0, start_time=None, loop=None):
+        super().__init__(loop=loop)
+        self._owns_reader = isinstance(source, str)
+        if self._owns_reader:
+            source = recording.SessionReader(source)
+        self.source = source
+        self.speed = speed
+        self.start_time = start_time
+        self._replays = {}
+        self._messages_sent = 0
+
+    #### Private Methods ####
+
+    def _iter_messages(self):
+        if not isinstance(self.source, recording.SessionReader):
+            yield from self.source
+            return
+
+        skip_tag = _clad_to_game_iface.MessageEngineToGame.Tag.UiDeviceConnected
+        for timestamp, direction, data in self.source.messages(self.start_time):
+            if direction != recording.DIRECTION_RECV or not data or data[0] == skip_tag:
+                continue
+            # copy out of the memory map, as the transport may buffer it.
+            yield timestamp, bytes(data)
+
+    async def _replay(self, proto):
+        loop = self._loop
+        start = loop.time()
+        first_timestamp = None
+        count = 0
+        for timestamp, msg in self._iter_messages():
+            await proto.drain()
+            if proto.transport.is_closing():
+                break
+
+            if self.speed:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = (timestamp - first_timestamp) / self.speed - (loop.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay, loop=loop)
+
+            if isinstance(msg, (bytes, bytearray, memoryview)):
+                proto.send_packed(msg)
+            else:
+                proto.send_msg(msg)
+            count += 1
+            self._messages_sent += 1
+
+        logger.debug('%s: replayed %d messages in %.3fs', self, count, loop.time() - start)
+        return count
+
+    #### Properties ####
+
+    @property
+    def messages_sent(self):
+        '''int: The total number of messages replayed to all connections.'''
+        return self._messages_sent
+
+    #### Hooks ####
+
+    def sdk_connected(self, proto):
+        self._replays[proto] = asyncio.ensure_future(self._replay(proto), loop=self._loop)
+
+    def sdk_disconnected(self, proto, exc):
+        replay = self._replays.pop(proto, None)
+        if replay is not None:
+            replay.cancel()
+
+    #### Commands ####
+
+    async def wait_for_replay(self, timeout=None):
+        '''Wait for the replay to every currently connected SDK to finish.
+
+        Args:
+            timeout (float): Maximum time to wait, in seconds.
+        Returns:
+            The number of messages replayed to each connection.
+        Raises:
+            :class:`asyncio.TimeoutError`
+        '''
+        replays = list(self._replays.values())
+        if not replays:
+            return []
+        return await asyncio.wait_for(asyncio.gather(*replays, loop=self._loop), timeout,
+                                      loop=self._loop)
+
+    async def stop(self):
+        await super().stop()
+        for replay in self._replays.values():
+            replay.cancel()
+        self._replays.clear()
+        if self._owns_reader:
+            self.source.close()
@@ -51,6 +51,8 @@ from . import action
 from . import anim
 from . import behavior
 from . import camera
+from . import clad_protocol
+from . import clocksync
 from . import conn
 from . import event
 from . import exceptions
@@ -85,6 +87,15 @@ MIN_LIFT_HEIGHT_MM = 32.0
 MAX_LIFT_HEIGHT_MM = 92.0
 
 
+# Pre-packed motor commands, as these may be sent many times a second.
+_drive_wheels_template = clad_protocol.MessageTemplate(
+        _clad_to_engine_iface.DriveWheels(), _clad_to_engine_iface.MessageGameToEngine)
+_move_head_template = clad_protocol.MessageTemplate(
+        _clad_to_engine_iface.MoveHead(), _clad_to_engine_iface.MessageGameToEngine)
+_move_lift_template = clad_protocol.MessageTemplate(
+        _clad_to_engine_iface.MoveLift(), _clad_to_engine_iface.MessageGameToEngine)
+
+
 #### Actions
 
 class GoToPose(action.Action):
@@ -610,6 +621,9 @@ class Robot(event.Dispatcher):
         #: ``None`` if no image was received yet.
         #: In milliseconds relative to robot epoch.
         self.last_image_robot_timestamp = None
+        #: :class:`cozmo.clocksync.RobotClockSync`: Maps the robot's
+        #: timestamps to host time, using :attr:`last_image_robot_timestamp`.
+        self.clock_sync = clocksync.RobotClockSync()
         self._pose_angle = None
         self._pose_pitch = None
         self._head_angle = None
@@ -846,6 +860,7 @@ class Robot(event.Dispatcher):
     #    msg = kw.get('msg')
     #    logger_protocol.debug("Robot received unhandled internal event_name=%s  kw=%s", event.event_name, kw)
 
+    @event._passive_receiver
     def recv_default_handler(self, event, **kw):
         logger.debug("Robot received unhandled public event=%s", event)
 
@@ -883,6 +898,8 @@ class Robot(event.Dispatcher):
         self.carrying_object_on_top_id = msg.carryingObjectOnTopID  # int_32 will be -1 if no object on top of object being carried
         self.head_tracking_object_id = msg.headTrackingObjectID  # int_32 will be -1 if head is not tracking to any object
         self.localized_to_object_id = msg.localizedToObjectID  # int_32 Will be -1 if not localized to any object
+        if msg.lastImageTimeStamp != self.last_image_robot_timestamp:
+            self.clock_sync.add_sample(msg.lastImageTimeStamp)
         self.last_image_robot_timestamp = msg.lastImageTimeStamp
         self._robot_status_flags = msg.status  # uint_16 as bitflags - See _clad_to_game_cozmo.RobotStatusFlag
         self._game_status_flags = msg.gameStatus  # uint_8  as bitflags - See _clad_to_game_cozmo.GameStatusFlag
@@ -990,10 +1007,10 @@ class Robot(event.Dispatcher):
         if r_wheel_acc is None:
             r_wheel_acc = r_wheel_speed
 
-        msg = _clad_to_engine_iface.DriveWheels(lwheel_speed_mmps=l_wheel_speed,
-                                                rwheel_speed_mmps=r_wheel_speed,
-                                                lwheel_accel_mmps2=l_wheel_acc,
-                                                rwheel_accel_mmps2=r_wheel_acc)
+        msg = _drive_wheels_template.pack(lwheel_speed_mmps=l_wheel_speed,
+                                          rwheel_speed_mmps=r_wheel_speed,
+                                          lwheel_accel_mmps2=l_wheel_acc,
+                                          rwheel_accel_mmps2=r_wheel_acc)
 
         self.conn.send_msg(msg)
         if duration:
@@ -1013,7 +1030,7 @@ class Robot(event.Dispatcher):
         Args:
             speed (float): Motor speed for Cozmo's head, measured in radians per second.
         '''
-        msg = _clad_to_engine_iface.MoveHead(speed_rad_per_sec=speed)
+        msg = _move_head_template.pack(speed_rad_per_sec=speed)
         self.conn.send_msg(msg)
 
     def move_lift(self, speed):
@@ -1024,8 +1041,7 @@ class Robot(event.Dispatcher):
         Args:
             speed (float): Motor speed for Cozmo's lift, measured in radians per second.
         '''
-        msg = _clad_to_engine_iface.MoveLift()
-        msg = _clad_to_engine_iface.MoveLift(speed_rad_per_sec=speed)
+        msg = _move_lift_template.pack(speed_rad_per_sec=speed)
         self.conn.send_msg(msg)
 
     def say_text(self, text, play_excited_animation=False, use_cozmo_voice=True,
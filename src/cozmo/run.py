@@ -405,8 +405,11 @@ class _LoopThread:
         abort_future (:class:`concurrent.futures.Future): Optional future to
             raise an exception on in the event of an exception occurring within
             the thread.
+        lag_threshold (float): If set, monitor the loop for lag above this
+            many seconds (see :func:`connect_on_loop`).
     '''
-    def __init__(self, loop, f=None, conn_factory=conn.CozmoConnection, connector=None, abort_future=None):
+    def __init__(self, loop, f=None, conn_factory=conn.CozmoConnection, connector=None, abort_future=None,
+                 lag_threshold=None):
         self.loop = loop
         self.f = f
         if not abort_future:
@@ -414,6 +417,7 @@ class _LoopThread:
         self.abort_future = abort_future
         self.conn_factory = conn_factory
         self.connector = connector
+        self.lag_threshold = lag_threshold
         self.thread = None
         self._running = False
 
@@ -428,7 +432,8 @@ class _LoopThread:
         def run_loop():
             asyncio.set_event_loop(self.loop)
             try:
-                coz_conn = connect_on_loop(self.loop, self.conn_factory, self.connector)
+                coz_conn = connect_on_loop(self.loop, self.conn_factory, self.connector,
+                                           lag_threshold=self.lag_threshold)
                 q.put(coz_conn)
             except Exception as e:
                 self.abort_future.set_exception(e)
@@ -471,7 +476,7 @@ class _LoopThread:
             self.stop()
 
 
-def _connect_async(f, conn_factory=conn.CozmoConnection, connector=None):
+def _connect_async(f, conn_factory=conn.CozmoConnection, connector=None, lag_threshold=None):
     # use the default loop, if one is available for the current thread,
     # if not create  a new loop and make it the default.
     #
@@ -487,7 +492,7 @@ def _connect_async(f, conn_factory=conn.CozmoConnection, connector=None):
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
-    coz_conn = connect_on_loop(loop, conn_factory, connector)
+    coz_conn = connect_on_loop(loop, conn_factory, connector, lag_threshold=lag_threshold)
     try:
         loop.run_until_complete(f(coz_conn))
     finally:
@@ -496,11 +501,12 @@ def _connect_async(f, conn_factory=conn.CozmoConnection, connector=None):
         loop.run_forever()
 
 
-def _connect_sync(f, conn_factory=conn.CozmoConnection, connector=None):
+def _connect_sync(f, conn_factory=conn.CozmoConnection, connector=None, lag_threshold=None):
     loop = asyncio.new_event_loop()
     abort_future = concurrent.futures.Future()
     conn_factory = functools.partial(conn_factory, _sync_abort_future=abort_future)
-    lt = _LoopThread(loop, conn_factory=conn_factory, connector=connector, abort_future=abort_future)
+    lt = _LoopThread(loop, conn_factory=conn_factory, connector=connector, abort_future=abort_future,
+                     lag_threshold=lag_threshold)
     loop.set_exception_handler(functools.partial(_sync_exception_handler, abort_future))
 
     coz_conn = lt.start()
@@ -511,7 +517,7 @@ def _connect_sync(f, conn_factory=conn.CozmoConnection, connector=None):
         lt.stop()
 
 
-def connect_on_loop(loop, conn_factory=conn.CozmoConnection, connector=None):
+def connect_on_loop(loop, conn_factory=conn.CozmoConnection, connector=None, lag_threshold=None):
     '''Uses the supplied event loop to connect to a device.
 
     Will run the event loop in the current thread until the
@@ -530,12 +536,20 @@ def connect_on_loop(loop, conn_factory=conn.CozmoConnection, connector=None):
             subclass that handles opening the USB connection to a device.
             By default, it will connect to the first Android or iOS device that
             has the Cozmo app running in SDK mode.
+        lag_threshold (float): If set, start monitoring the event loop once
+            connected, and warn (with the stack of the code responsible)
+            whenever callbacks run more than this many seconds late; see
+            :meth:`cozmo.conn.CozmoConnection.start_lag_monitor`.  If None
+            then a value will be read from the COZMO_LOOP_LAG_THRESHOLD
+            environment variable, if set.
 
     Returns:
         A :class:`cozmo.conn.CozmoConnection` instance.
     '''
     if connector is None:
         connector = _DEFAULT_CONNECTOR
+    if lag_threshold is None and os.environ.get('COZMO_LOOP_LAG_THRESHOLD'):
+        lag_threshold = float(os.environ['COZMO_LOOP_LAG_THRESHOLD'])
 
     factory = functools.partial(conn_factory, loop=loop)
 
@@ -546,10 +560,12 @@ def connect_on_loop(loop, conn_factory=conn.CozmoConnection, connector=None):
         return await connector.connect(loop, factory, conn_check)
 
     transport, coz_conn = loop.run_until_complete(connect())
+    if lag_threshold is not None:
+        coz_conn.start_lag_monitor(threshold=lag_threshold, dump_stacks=True)
     return coz_conn
 
 
-def connect(f, conn_factory=conn.CozmoConnection, connector=None):
+def connect(f, conn_factory=conn.CozmoConnection, connector=None, lag_threshold=None):
     '''Connects to the Cozmo Engine on the mobile device and supplies the connection to a function.
 
     Accepts a function, f, that is given a :class:`cozmo.conn.CozmoConnection` object as
@@ -578,13 +594,16 @@ def connect(f, conn_factory=conn.CozmoConnection, connector=None):
             subclass that handles opening the USB connection to a device.
             By default it will connect to the first Android or iOS device that
             has the Cozmo app running in SDK mode.
+        lag_threshold (float): If set, warn whenever the event loop runs more
+            than this many seconds late (see :func:`connect_on_loop`).
     '''
     if asyncio.iscoroutinefunction(f):
-        return _connect_async(f, conn_factory, connector)
-    return _connect_sync(f, conn_factory, connector)
+        return _connect_async(f, conn_factory, connector, lag_threshold)
+    return _connect_sync(f, conn_factory, connector, lag_threshold)
 
 
-def connect_with_tkviewer(f, conn_factory=conn.CozmoConnection, connector=None, force_on_top=False):
+def connect_with_tkviewer(f, conn_factory=conn.CozmoConnection, connector=None, force_on_top=False,
+                          lag_threshold=None):
     '''Setup a connection to a device and run a user function while displaying Cozmo's camera.
 
     This display a Tk window on the screen showing a view of Cozmo's camera.
@@ -606,6 +625,8 @@ def connect_with_tkviewer(f, conn_factory=conn.CozmoConnection, connector=None,
             By default it will connect to the first Android or iOS device that
             has the Cozmo app running in SDK mode.
         force_on_top (bool): Specifies whether the window should be forced on top of all others
+        lag_threshold (float): If set, warn whenever the event loop runs more
+            than this many seconds late (see :func:`connect_on_loop`).
     '''
     try:
         from . import tkview
@@ -635,7 +656,8 @@ def connect_with_tkviewer(f, conn_factory=conn.CozmoConnection, connector=None,
     try:
         if not inspect.iscoroutinefunction(f):
             conn_factory = functools.partial(conn_factory, _sync_abort_future=abort_future)
-        lt = _LoopThread(loop, f=view_connector, conn_factory=conn_factory, connector=connector)
+        lt = _LoopThread(loop, f=view_connector, conn_factory=conn_factory, connector=connector,
+                         lag_threshold=lag_threshold)
         lt.start()
         viewer.mainloop()
     except BaseException as e:
@@ -706,7 +728,7 @@ def setup_basic_logging(general_log_level=None, protocol_log_level=None,
 
 def run_program(f, use_viewer=False, conn_factory=conn.CozmoConnection,
                 connector=None, force_viewer_on_top=False,
-                deprecated_filter="default"):
+                deprecated_filter="default", lag_threshold=None):
     '''Connect to Cozmo and run the provided program/function f.
 
     Args:
@@ -728,6 +750,8 @@ def run_program(f, use_viewer=False, conn_factory=conn.CozmoConnection,
             location. You can hide all deprecated warnings by passing in "ignore",
             see https://docs.python.org/3/library/warnings.html#warning-filter
             for more information.
+        lag_threshold (float): If set, warn whenever the event loop runs more
+            than this many seconds late (see :func:`connect_on_loop`).
     '''
     setup_basic_logging(deprecated_filter=deprecated_filter)
 
@@ -752,8 +776,9 @@ def run_program(f, use_viewer=False, conn_factory=conn.CozmoConnection,
 
     try:
         if use_viewer:
-            connect_with_tkviewer(wrapper, conn_factory=conn_factory, connector=connector, force_on_top=force_viewer_on_top)
+            connect_with_tkviewer(wrapper, conn_factory=conn_factory, connector=connector,
+                                  force_on_top=force_viewer_on_top, lag_threshold=lag_threshold)
         else:
-            connect(wrapper, conn_factory=conn_factory, connector=connector)
+            connect(wrapper, conn_factory=conn_factory, connector=connector, lag_threshold=lag_threshold)
     except exceptions.ConnectionError as e:
         sys.exit("A connection error occurred: %s" % e)
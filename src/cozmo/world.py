@@ -50,7 +50,7 @@ showing where faces, pets and objects have been observed.
 '''
 
 # __all__ should order by constants, event classes, other classes, functions.
-__all__ = ['EvtNewCameraImage',
+__all__ = ['EvtNewCameraImage', 'EvtObservationsBatch',
            'CameraImage', 'World']
 
 import asyncio
@@ -75,6 +75,21 @@ class EvtNewCameraImage(event.Event):
     image = 'A CameraImage object'
 
 
+class EvtObservationsBatch(event.Event):
+    '''Dispatched with every object, face and pet observed in one engine tick.
+
+    Only dispatched while :attr:`World.batch_observations` is True.  Each
+    observed element is listed once, mapped to the set of field names that
+    changed over all of its observations in the batch; the element itself
+    holds its latest state.  The usual per-element events, such as
+    :class:`cozmo.objects.EvtObjectObserved`, are still dispatched.
+    '''
+    robot_timestamp = 'The robot timestamp of the observations, in milliseconds'
+    objects = 'An OrderedDict of each cozmo.objects.ObservableObject observed to its updated field names'
+    faces = 'An OrderedDict of each cozmo.faces.Face observed to its updated field names'
+    pets = 'An OrderedDict of each cozmo.pets.Pet observed to its updated field names'
+
+
 class World(event.Dispatcher):
     '''Represents the state of the world, as known to a Cozmo robot.'''
 
@@ -134,6 +149,12 @@ class World(event.Dispatcher):
         self._pets = {}
         self._active_behavior = None
         self._active_action = None
+        #: bool: Set to True to also have observations coalesced into a
+        #: :class:`EvtObservationsBatch` once per engine tick.
+        self.batch_observations = False
+        self._observation_batch = None
+        self._observation_batch_timestamp = None
+        self._observation_flush_handle = None
         self._init_light_cubes()
 
 
@@ -202,6 +223,48 @@ class World(event.Dispatcher):
         logger.debug('Allocated pet_id=%s to pet=%s', pet.pet_id, pet)
         return pet
 
+    def _add_observation(self, element, timestamp, changed_fields):
+        # Called by ObservableElement each time an element is observed.
+        # Observations are grouped by robot timestamp, and the batch is sent
+        # once the timestamp changes or, at the latest, once the messages
+        # that arrived together have all been handled.
+        batch = self._observation_batch
+        if batch is not None and timestamp != self._observation_batch_timestamp:
+            self._flush_observations()
+            batch = None
+        if batch is None:
+            batch = self._observation_batch = collections.OrderedDict()
+            self._observation_batch_timestamp = timestamp
+            if self._observation_flush_handle is None:
+                self._observation_flush_handle = self._loop.call_soon(self._flush_observations)
+        updated = batch.get(element)
+        if updated is None:
+            batch[element] = set(changed_fields)
+        else:
+            updated |= changed_fields
+
+    def _flush_observations(self):
+        if self._observation_flush_handle is not None:
+            self._observation_flush_handle.cancel()
+            self._observation_flush_handle = None
+        batch = self._observation_batch
+        if not batch:
+            return
+        self._observation_batch = None
+        observed_objects = collections.OrderedDict()
+        observed_faces = collections.OrderedDict()
+        observed_pets = collections.OrderedDict()
+        for element, updated in batch.items():
+            if isinstance(element, faces.Face):
+                observed_faces[element] = updated
+            elif isinstance(element, pets.Pet):
+                observed_pets[element] = updated
+            else:
+                observed_objects[element] = updated
+        self.dispatch_event(EvtObservationsBatch,
+                robot_timestamp=self._observation_batch_timestamp,
+                objects=observed_objects, faces=observed_faces, pets=observed_pets)
+
     def _update_visible_obj_count(self, obj, inc):
         obscls = objects.ObservableObject
 
@@ -446,9 +509,11 @@ class World(event.Dispatcher):
     def recv_evt_action_completed(self, evt, *, action, **kw):
         self._active_action = None
 
-    def recv_evt_new_raw_camera_image(self, evt, *, image, **kw):
+    def recv_evt_new_raw_camera_image(self, evt, *, image, robot_timestamp=None, **kw):
         self._last_image_number += 1
-        processed_image = CameraImage(image, self.image_annotator, self._last_image_number)
+        processed_image = CameraImage(image, self.image_annotator, self._last_image_number,
+                robot_timestamp=robot_timestamp,
+                capture_time=self.robot.clock_sync.robot_to_host_time(robot_timestamp))
         self.latest_image = processed_image
         self.dispatch_event(EvtNewCameraImage, image=processed_image)
 
@@ -1035,7 +1100,8 @@ class CameraImage:
     that can resize and add dynamic annotations to the image, such as
     marking up the location of objects, faces and pets.
     '''
-    def __init__(self, raw_image, image_annotator, image_number=0):
+    def __init__(self, raw_image, image_annotator, image_number=0,
+                 robot_timestamp=None, capture_time=None):
         #: :class:`PIL.Image.Image`: the raw unprocessed image from the camera
         self.raw_image = raw_image
 
@@ -1048,6 +1114,15 @@ class CameraImage:
         #: float: The time the image was received and processed by the SDK
         self.image_recv_time = time.time()
 
+        #: int: The robot's timestamp for when the image was captured, in
+        #: milliseconds relative to robot epoch.  ``None`` if not known.
+        self.image_robot_timestamp = robot_timestamp
+
+        #: float: The host time (as per :func:`time.time`) at which the image
+        #: was captured, estimated by the robot's
+        #: :class:`~cozmo.clocksync.RobotClockSync`.  ``None`` if not known.
+        self.image_capture_time = capture_time
+
     def annotate_image(self, scale=None, fit_size=None):
         '''Adds any enabled annotations to the image.
 
@@ -0,0 +1,557 @@
+# Copyright (c) 2016 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Micro-benchmarks for SDK hot paths.
+
+Not collected by py.test; run directly, optionally naming the benchmarks
+to run::
+
+    python -m tests.benchmark
+    python -m tests.benchmark decode
+'''
+
+import asyncio
+import collections
+import random
+import struct
+import sys
+import time
+
+from cozmo import _clad
+from cozmo import camera
+from cozmo import clad_protocol
+from cozmo import conn
+from cozmo import event
+from cozmo._clad import _clad_to_engine_iface, _clad_to_game_iface
+
+from . import test_camera
+
+
+def _timeit(f, repeat=5):
+    '''Returns the best wall time of several runs of f.'''
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _report(name, count, elapsed):
+    print('%-40s %8d ops  %9.3f ms  %12.0f ops/sec' %
+          (name, count, elapsed * 1000, count / elapsed))
+
+
+def _pending_tasks(loop):
+    '''Returns the loop's unfinished tasks.
+
+    asyncio.all_tasks() only exists on Python 3.7+; Task.all_tasks() also
+    returns finished tasks.
+    '''
+    return {task for task in asyncio.Task.all_tasks(loop) if not task.done()}
+
+
+#### CLAD frame decoding ####
+
+class _NullMsg:
+    tag_name = 'Null'
+    _data = None
+
+
+class _NullUnion:
+    # isolate the framing cost from CLAD's own unpack cost
+    @classmethod
+    def unpack(cls, buf):
+        return _NullMsg
+
+
+class _CountingProtocol(clad_protocol.CLADProtocol):
+    clad_decode_union = _NullUnion
+    collect_metrics = False
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def msg_received(self, msg):
+        self.count += 1
+
+
+class _MeteredProtocol(_CountingProtocol):
+    '''The current decoder, with the default per-message metrics enabled.'''
+    collect_metrics = True
+
+
+class _TimedProtocol(_MeteredProtocol):
+    '''The current decoder, timing the decode and routing of every message.'''
+    metrics_timing_interval = 1
+
+
+class _ResliceProtocol(_CountingProtocol):
+    '''The previous decoder, which re-sliced the buffer for every frame.'''
+    def decode_msg(self):
+        if len(self._buf) < 2:
+            return None
+        msg_size = struct.unpack_from('H', self._buf)[0]
+        if len(self._buf) < 2 + msg_size:
+            return None
+        buf, self._buf = self._buf[2:2+msg_size], self._buf[2+msg_size:]
+        return self.clad_decode_union.unpack(buf)
+
+
+def _burst(frame_count):
+    # interleave RobotState sized frames with ImageChunk sized frames
+    frames = []
+    for i in range(frame_count):
+        size = 1200 if i % 4 == 0 else 120
+        frames.append(struct.pack('H', size) + bytes(size))
+    return b''.join(frames)
+
+
+def bench_decode():
+    # The previous decoder copied the rest of the buffer for every frame, so
+    # its cost grows with the size of each read: socket-sized reads bound the
+    # copy, while a backlog delivered in a single read makes it quadratic.
+    for frame_count in (1000, 10000):
+        data = _burst(frame_count)
+        for read_size, read_name in ((65536, '64k reads'), (len(data), '1 read')):
+            for proto_cls in (_ResliceProtocol, _CountingProtocol, _MeteredProtocol,
+                              _TimedProtocol):
+                def run():
+                    proto = proto_cls()
+                    for i in range(0, len(data), read_size):
+                        proto.data_received(data[i:i+read_size])
+                    assert proto.count == frame_count
+                _report('decode %s %s' % (proto_cls.__name__, read_name),
+                        frame_count, _timeit(run, repeat=3))
+
+
+#### CLAD message sending ####
+
+class _NullTransport:
+    def __init__(self):
+        self.write_count = 0
+
+    def write(self, data):
+        self.write_count += 1
+
+    def is_closing(self):
+        return False
+
+
+class _SendProtocol(clad_protocol.CLADProtocol):
+    clad_encode_union = _clad_to_engine_iface.MessageGameToEngine
+
+
+class _LegacySendProtocol(_SendProtocol):
+    '''The previous sender: a union per message and two writes per message.'''
+    def send_msg(self, msg, **params):
+        name = msg.__class__.__name__
+        msg = self.clad_encode_union(**{name: msg})
+        msg_buf = msg.pack()
+        self.transport.write(struct.pack('H', len(msg_buf)))
+        self.transport.write(msg_buf)
+
+
+def bench_send():
+    # a burst of lights for three cubes and the backpack, plus a drive
+    msgs = [_clad_to_engine_iface.SetAllActiveObjectLEDs(objectID=i) for i in range(3)]
+    msgs.append(_clad_to_engine_iface.SetBackpackLEDs())
+    msgs.append(_clad_to_engine_iface.DriveWheels(lwheel_speed_mmps=50, rwheel_speed_mmps=50))
+    loop = asyncio.new_event_loop()
+    count = 2000
+    for proto_cls in (_LegacySendProtocol, _SendProtocol):
+        transport = _NullTransport()
+        proto = proto_cls()
+        proto._loop = loop
+        proto.connection_made(transport)
+        def run():
+            for i in range(count):
+                for msg in msgs:
+                    proto.send_msg(msg)
+                proto.flush()
+        transport.write_count = 0
+        _report('send %s' % proto_cls.__name__, count * len(msgs), _timeit(run, repeat=1))
+        print('%40s %8.2f writes/msg' % ('', transport.write_count / (count * len(msgs))))
+    loop.close()
+
+
+#### Control message encoding ####
+
+def bench_encode():
+    iface = _clad_to_engine_iface
+    union = iface.MessageGameToEngine
+    template = clad_protocol.MessageTemplate(iface.DriveWheels(), union)
+    tags = clad_protocol._tags_for_union(union)
+    count = 20000
+
+    def legacy(speed):
+        # a union per message, as sent before messages were packed directly
+        msg = iface.DriveWheels(lwheel_speed_mmps=speed, rwheel_speed_mmps=speed,
+                lwheel_accel_mmps2=speed, rwheel_accel_mmps2=speed)
+        data = union(DriveWheels=msg).pack()
+        return struct.pack('H', len(data)) + data
+
+    def direct(speed):
+        msg = iface.DriveWheels(lwheel_speed_mmps=speed, rwheel_speed_mmps=speed,
+                lwheel_accel_mmps2=speed, rwheel_accel_mmps2=speed)
+        data = msg.pack()
+        return clad_protocol._frame_header.pack(len(data) + 1, tags['DriveWheels']) + data
+
+    def templated(speed):
+        return template.pack(lwheel_speed_mmps=speed, rwheel_speed_mmps=speed,
+                lwheel_accel_mmps2=speed, rwheel_accel_mmps2=speed)
+
+    for name, f in (('union', legacy), ('direct', direct), ('template', templated)):
+        def run():
+            for i in range(count):
+                f(i)
+        _report('encode DriveWheels %s' % name, count, _timeit(run))
+
+
+#### Incoming message routing ####
+
+class _RoutingConnection(conn.CozmoConnection):
+    # measure routing alone, not the dispatch that follows it
+    def dispatch_event(self, evttype, **kw):
+        pass
+
+    def _process_robot_msg(self, robot_id, evttype, msg):
+        pass
+
+
+class _LegacyRoutingConnection(_RoutingConnection):
+    '''The previous router, which looked up the event type by name for every message.'''
+    def msg_received(self, msg):
+        tag_name = msg.tag_name
+        if tag_name == 'Ping':
+            return self._handle_ping(msg._data)
+        elif tag_name == 'UiDeviceConnected':
+            return self._handle_ui_device_connected(msg._data)
+
+        msg = msg._data
+        robot_id = getattr(msg, 'robotID', None)
+        if not robot_id and self._primary_robot and (tag_name in conn.FORCED_ROBOT_MESSAGES):
+            robot_id = self._primary_robot.robot_id
+
+        evttype = getattr(_clad, '_Msg' + tag_name, None)
+        if evttype is None:
+            return
+        if robot_id:
+            return self._process_robot_msg(robot_id, evttype, msg)
+        self.dispatch_event(evttype, msg=msg)
+
+
+def bench_routing():
+    union = _clad_to_game_iface.MessageEngineToGame
+    power_level_cls = union.typeByTag(union.Tag.ObjectPowerLevel)
+    msgs = [union(RobotState=_clad_to_game_iface.RobotState(robotID=1)),
+            union(DebugString=_clad_to_game_iface.DebugString(text='debug')),
+            union(ObjectPowerLevel=power_level_cls(objectID=1))]
+    loop = asyncio.new_event_loop()
+    count = 20000
+    for conn_cls in (_LegacyRoutingConnection, _RoutingConnection):
+        sdk_conn = conn_cls(loop=loop)
+        def run():
+            for i in range(count):
+                for msg in msgs:
+                    sdk_conn.msg_received(msg)
+        _report('route %s' % conn_cls.__name__, count * len(msgs), _timeit(run))
+        sdk_conn._running = False
+    loop.close()
+
+
+#### Camera image conversion ####
+
+def bench_mini_jpeg():
+    # roughly the size of a QVGA JPEGMinimizedGray frame
+    mini = test_camera.make_mini_image(12000, 0, ff_ratio=0.01)
+    header = camera._MINIGRAY_JPEG_HEADER
+    for name, f in (('legacy', test_camera.legacy_mini_to_jpeg),
+                    ('vectorized', camera._mini_to_jpeg_helper)):
+        def run():
+            for i in range(10):
+                f(mini, 320, 240, header)
+        _report('mini_to_jpeg %s' % name, 10, _timeit(run))
+
+
+#### Event dispatch ####
+
+class EvtBenchmarkState(event.Event):
+    'Benchmark event'
+    state = 'Some state'
+
+
+class _EvtBenchmarkInternal(event.Event):
+    'Benchmark internal event'
+    msg = 'Message data'
+
+
+class _BenchRobot(event.Dispatcher):
+    def _recv_evt_benchmark_internal(self, evt, *, msg):
+        pass
+
+
+class _BenchWorld(event.Dispatcher):
+    def recv_default_handler(self, evt, **kw):
+        pass
+
+
+class _BenchObject(event.Dispatcher):
+    def recv_evt_benchmark_state(self, evt, **kw):
+        pass
+
+
+def bench_dispatch():
+    # mirrors the robot -> world <- objects layout of the SDK
+    loop = asyncio.new_event_loop()
+    task_count = 0
+    def task_factory(loop, coro):
+        nonlocal task_count
+        task_count += 1
+        return asyncio.Task(coro, loop=loop)
+    loop.set_task_factory(task_factory)
+
+    robot = _BenchRobot(loop=loop)
+    world = _BenchWorld(loop=loop, dispatch_parent=robot)
+    robot._add_child_dispatcher(world)
+    objects = [_BenchObject(loop=loop, dispatch_parent=world) for i in range(3)]
+    world.add_event_handler(EvtBenchmarkState, lambda evt, **kw: None)
+
+    count = 10000
+    for inline in (False, True):
+        event.Dispatcher.inline_dispatch = inline
+        mode = 'inline' if inline else 'task'
+        for name, evt_cls, targets in (
+                ('robot internal msg', _EvtBenchmarkInternal, [robot]),
+                ('object state', EvtBenchmarkState, objects)):
+            def run():
+                for i in range(count):
+                    for target in targets:
+                        target.dispatch_event(evt_cls)
+                # drain the scheduled dispatch tasks
+                while _pending_tasks(loop):
+                    loop.run_until_complete(asyncio.sleep(0))
+            task_count = 0
+            ops = count * len(targets)
+            _report('dispatch %s %s' % (mode, name), ops, _timeit(run, repeat=1))
+            print('%40s %8.2f tasks/op' % ('', task_count / ops))
+    event.Dispatcher.inline_dispatch = False
+    loop.close()
+
+
+class _LegacyHandlerDispatcher(event.Dispatcher):
+    '''The previous registry: a list per event, scanned to remove a handler.'''
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._dispatch_handlers = collections.defaultdict(list)
+
+    def add_event_handler(self, evt, f):
+        handler = event.Handler(self, evt, f)
+        self._dispatch_handlers[evt.event_name].append(handler)
+        return handler
+
+    def remove_event_handler(self, evt, f):
+        for i, h in enumerate(self._dispatch_handlers[evt.event_name]):
+            if h == f:
+                del self._dispatch_handlers[evt.event_name][i]
+                return
+        raise ValueError(f)
+
+
+def bench_handlers():
+    # thousands of concurrent waiters, removed in no particular order (as
+    # timeouts and completions would)
+    loop = asyncio.new_event_loop()
+    rand = random.Random(42)
+    for waiters in (1000, 5000):
+        for dispatcher_cls in (_LegacyHandlerDispatcher, event.Dispatcher):
+            def run():
+                dispatcher = dispatcher_cls(loop=loop)
+                handlers = [dispatcher.add_event_handler(EvtBenchmarkState,
+                        event.oneshot(asyncio.Future(loop=loop))) for i in range(waiters)]
+                rand.shuffle(handlers)
+                for handler in handlers:
+                    dispatcher.remove_event_handler(EvtBenchmarkState, handler)
+            _report('handlers %s x%d' % (dispatcher_cls.__name__, waiters), waiters,
+                    _timeit(run, repeat=3))
+    loop.close()
+
+
+class EvtBenchmarkObserved(event.Event):
+    'Benchmark observation event'
+    obj = 'The object'
+    updated = 'Updated fields'
+    image_box = 'Image box'
+    pose = 'Pose'
+
+
+class _LegacyObserved:
+    '''The previous Event implementation: a dict per instance, a set of
+    dispatchers delivered to, and the parameters rebuilt for every handler.'''
+    _props = EvtBenchmarkObserved._props
+    event_name = 'LegacyObserved'
+
+    def __init__(self, **kwargs):
+        unset = self._props.copy()
+        for k, v in kwargs.items():
+            if k not in self._props:
+                raise ValueError("Event %s has no parameter called %s" % (self.event_name, k))
+            setattr(self, k, v)
+            unset.remove(k)
+        for k in unset:
+            setattr(self, k, None)
+        self._delivered_to = set()
+
+    def _params(self):
+        return {k: getattr(self, k) for k in self._props}
+
+    def _mark_delivered(self, dispatcher):
+        if id(dispatcher) in self._delivered_to:
+            return False
+        self._delivered_to.add(id(dispatcher))
+        return True
+
+
+def bench_events():
+    # an observation event, as relayed object -> world -> robot with one
+    # handler at each
+    count = 100000
+    dispatchers = [object(), object(), object()]
+    handler = lambda evt, **kw: None
+    for evt_cls in (_LegacyObserved, EvtBenchmarkObserved):
+        def construct():
+            for i in range(count):
+                evt_cls(obj=i, updated=None, image_box=None, pose=None)
+        _report('events construct %s' % evt_cls.__name__, count, _timeit(construct, repeat=3))
+
+        def deliver():
+            for i in range(count):
+                evt = evt_cls(obj=i, updated=None, image_box=None, pose=None)
+                for dispatcher in dispatchers:
+                    if evt._mark_delivered(dispatcher):
+                        handler(evt, **evt._params())
+        _report('events deliver %s' % evt_cls.__name__, count, _timeit(deliver, repeat=3))
+
+
+class _UnprunedDispatcher(event.Dispatcher):
+    '''The previous dispatcher, which passed every event along every link.'''
+    def _may_deliver(self, event_cls):
+        return True
+
+
+def bench_prune():
+    # observations of an object that nothing is listening for, relayed
+    # object -> world -> robot
+    loop = asyncio.new_event_loop()
+    count = 10000
+    for dispatcher_cls in (_UnprunedDispatcher, event.Dispatcher):
+        robot = dispatcher_cls(loop=loop)
+        world = dispatcher_cls(loop=loop, dispatch_parent=robot)
+        robot._add_child_dispatcher(world)
+        obj = dispatcher_cls(loop=loop, dispatch_parent=world)
+        def run():
+            for i in range(count):
+                obj.dispatch_event(EvtBenchmarkObserved, obj=obj)
+            while _pending_tasks(loop):
+                loop.run_until_complete(asyncio.sleep(0))
+        _report('prune %s' % dispatcher_cls.__name__, count, _timeit(run, repeat=3))
+    loop.close()
+
+
+class _GlobalInvalidationDispatcher(event.Dispatcher):
+    '''The previous pruning, which rebuilt everything when anything was subscribed to.'''
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._cache_version = None
+
+    def _may_deliver(self, event_cls):
+        if self._cache_version != event._subscription_version:
+            self._subscribed.clear()
+            self._cache_version = event._subscription_version
+        return super()._may_deliver(event_cls)
+
+
+def bench_wait_for_churn():
+    # observations of an object that nothing is listening for, relayed
+    # object -> world -> robot, while a program repeatedly calls wait_for on
+    # the robot for another event, adding and removing a handler each time
+    loop = asyncio.new_event_loop()
+    waits = 2000
+    observations = 10
+    for dispatcher_cls in (_GlobalInvalidationDispatcher, event.Dispatcher):
+        robot = dispatcher_cls(loop=loop)
+        world = dispatcher_cls(loop=loop, dispatch_parent=robot)
+        robot._add_child_dispatcher(world)
+        obj = dispatcher_cls(loop=loop, dispatch_parent=world)
+        async def waiter():
+            for i in range(waits):
+                await robot.wait_for(EvtBenchmarkState, timeout=None)
+        def run():
+            task = asyncio.ensure_future(waiter(), loop=loop)
+            while not task.done():
+                loop.run_until_complete(asyncio.sleep(0, loop=loop))
+                for i in range(observations):
+                    obj.dispatch_event(EvtBenchmarkObserved, obj=obj)
+                robot.dispatch_event(EvtBenchmarkState, state=0)
+            while _pending_tasks(loop):
+                loop.run_until_complete(asyncio.sleep(0, loop=loop))
+        _report('wait_for churn %s' % dispatcher_cls.__name__, waits * observations,
+                _timeit(run, repeat=3))
+    loop.close()
+
+
+class _ScanningHandlerList(event._HandlerList):
+    '''The previous dispatch: every handler's filters checked for every event.'''
+    def matching(self, evt):
+        return self._handlers
+
+
+class _ScanningFilterDispatcher(event.Dispatcher):
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._dispatch_handlers = collections.defaultdict(_ScanningHandlerList)
+
+
+def bench_filters():
+    # many coroutines each waiting on an event for one particular object
+    loop = asyncio.new_event_loop()
+    events = 1000
+    for waiters in (100, 1000):
+        for dispatcher_cls in (_ScanningFilterDispatcher, event.Dispatcher):
+            dispatcher = dispatcher_cls(loop=loop)
+            # deliver synchronously, so only handler selection is measured
+            dispatcher.inline_dispatch = True
+            for i in range(waiters):
+                f = event.filter_handler(EvtBenchmarkState, state=i)(lambda evt, **kw: None)
+                dispatcher.add_event_handler(EvtBenchmarkState, f)
+            def run():
+                for i in range(events):
+                    dispatcher.dispatch_event(EvtBenchmarkState, state=i % waiters)
+            _report('filters %s x%d' % (dispatcher_cls.__name__, waiters), events,
+                    _timeit(run, repeat=3))
+    loop.close()
+
+
+def main(names):
+    benchmarks = {name[6:]: f for name, f in sorted(globals().items())
+                  if name.startswith('bench_')}
+    for name in names or sorted(benchmarks):
+        benchmarks[name]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
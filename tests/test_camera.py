@@ -0,0 +1,207 @@
+# Copyright (c) 2016 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import concurrent.futures
+import random
+import unittest
+import unittest.mock
+
+from cozmo import camera
+
+np = camera.np
+
+
+def legacy_mini_to_jpeg(mini, width, height, header):
+    '''The original byte-at-a-time converter, kept as a reference.'''
+    header = np.frombuffer(header, dtype=np.uint8)
+    bufferIn = mini.tolist()
+    currLen = len(mini)
+
+    headerLength = len(header)
+    bufferOut = np.array([0] * (currLen*2 + headerLength), dtype=np.uint8)
+
+    for i in range(headerLength):
+        bufferOut[i] = header[i]
+
+    bufferOut[0x5e] = height >> 8
+    bufferOut[0x5f] = height & 0xff
+    bufferOut[0x60] = width  >> 8
+    bufferOut[0x61] = width  & 0xff
+    while (bufferIn[currLen-1] == 0xff):
+        currLen -= 1
+
+    off = headerLength
+    for i in range(currLen-1):
+        bufferOut[off] = bufferIn[i+1]
+        off += 1
+        if (bufferIn[i+1] == 0xff):
+            bufferOut[off] = 0
+            off += 1
+
+    bufferOut[off] = 0xff
+    off += 1
+    bufferOut[off] = 0xD9
+    return bufferOut
+
+
+def make_mini_image(size, seed, ff_ratio=0.1, padding=3):
+    '''Generates a fake minimized image with plenty of 0xFF bytes to stuff.'''
+    rnd = random.Random(seed)
+    data = [0xff if rnd.random() < ff_ratio else rnd.randrange(0xff)
+            for i in range(size)]
+    data[0] = 1 # color flag
+    data[-1] = 0x12 # ensure the padding below is the only trailing 0xFF
+    return np.array(data + [0xff] * padding, dtype=np.uint8)
+
+
+@unittest.skipIf(np is None, 'NumPy not available')
+class MiniJpegTests(unittest.TestCase):
+    def assert_matches_legacy(self, mini, width, height, header):
+        result = camera._mini_to_jpeg_helper(mini, width, height, header)
+        expected = legacy_mini_to_jpeg(mini, width, height, header)
+        # The legacy converter returned its worst-case sized buffer; everything
+        # after the end of image marker was zero filled.
+        self.assertEqual(result.tobytes(), expected[:len(result)].tobytes())
+        self.assertFalse(expected[len(result):].any())
+        self.assertEqual(result[-2:].tolist(), [0xff, 0xd9])
+
+    def test_gray_matches_legacy(self):
+        for seed in range(10):
+            mini = make_mini_image(2000, seed)
+            self.assert_matches_legacy(mini, 320, 240, camera._MINIGRAY_JPEG_HEADER)
+
+    def test_color_matches_legacy(self):
+        for seed in range(10):
+            mini = make_mini_image(4000, seed, ff_ratio=0.3, padding=0)
+            self.assert_matches_legacy(mini, 160, 240, camera._MINICOLOR_JPEG_HEADER)
+
+    def test_consecutive_ff(self):
+        mini = np.array([0, 0xff, 0xff, 0xff, 0x10, 0xff, 0x20, 0xff, 0xff], dtype=np.uint8)
+        self.assert_matches_legacy(mini, 16, 16, camera._MINIGRAY_JPEG_HEADER)
+
+    def test_header_dimensions(self):
+        mini = make_mini_image(100, 0)
+        result = camera._minigray_to_jpeg(mini, 0x140, 0xf0)
+        self.assertEqual(result[0x5e:0x62].tolist(), [0x00, 0xf0, 0x01, 0x40])
+        # the cached header must not be modified
+        self.assertEqual(camera._MINIGRAY_JPEG_HEADER[0x5e:0x62], bytes([0x01, 0x28, 0x01, 0x90]))
+
+
+class ManualExecutor(concurrent.futures.Executor):
+    '''An executor whose futures are only resolved by the test.'''
+    def __init__(self):
+        self.futures = []
+        self.is_shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        fut = concurrent.futures.Future()
+        self.futures.append(fut)
+        return fut
+
+    def start(self, i):
+        # a worker has picked up the image, so it can no longer be cancelled
+        self.futures[i].set_running_or_notify_cancel()
+
+    def finish(self, i, image):
+        if not self.futures[i].running():
+            self.start(i)
+        self.futures[i].set_result(image)
+
+    def shutdown(self, wait=True):
+        self.is_shutdown = True
+
+
+@unittest.skipIf(np is None, 'NumPy not available')
+class DecodeExecutorTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.camera = camera.Camera(unittest.mock.Mock(robot_id=1), loop=self.loop)
+        self.executor = ManualExecutor()
+        self.camera.enable_decode_executor(executor=self.executor)
+        self.received = []
+        self.camera.add_event_handler(camera.EvtNewRawCameraImage,
+                lambda evt, **kw: self.received.append((evt.image, evt.robot_timestamp)))
+
+    def tearDown(self):
+        self.camera.disable_decode_executor()
+        self.loop.close()
+
+    def complete_image(self, image_id):
+        self.camera._partial_data = np.zeros(4, dtype=np.uint8)
+        self.camera._partial_size = 4
+        self.camera._partial_metadata = unittest.mock.Mock(imageId=image_id,
+                frameTimeStamp=image_id * 10, imageEncoding=0, resolution=0)
+        self.camera._process_completed_image()
+
+    def run_loop(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def assert_counts(self, decoded, dropped, failed=0):
+        self.assertEqual(self.camera.decoded_image_count, decoded)
+        self.assertEqual(self.camera.dropped_image_count, dropped)
+        self.assertEqual(self.camera.failed_image_count, failed)
+
+    def test_dispatched_in_order(self):
+        for i in range(3):
+            self.complete_image(i)
+            self.executor.start(i)
+        for i in range(3):
+            self.executor.finish(i, 'image%d' % i)
+        self.run_loop()
+        self.assertEqual(self.received, [('image0', 0), ('image1', 10), ('image2', 20)])
+        self.assert_counts(3, 0)
+
+    def test_waiting_image_dropped(self):
+        self.complete_image(0)
+        self.complete_image(1)
+        self.assertTrue(self.executor.futures[0].cancelled())
+        self.executor.finish(1, 'image1')
+        self.run_loop()
+        self.assertEqual(self.received, [('image1', 10)])
+        self.assert_counts(1, 1)
+
+    def test_overtaken_image_dropped(self):
+        self.complete_image(0)
+        self.executor.start(0)
+        self.complete_image(1)
+        self.executor.finish(1, 'image1')
+        self.run_loop()
+        self.assertEqual(self.received, [('image1', 10)])
+        # the older image finishing late isn't dispatched
+        self.executor.finish(0, 'image0')
+        self.run_loop()
+        self.assertEqual(self.received, [('image1', 10)])
+        self.assert_counts(1, 1)
+
+    def test_failed_decode_counted(self):
+        self.complete_image(0)
+        self.executor.start(0)
+        self.complete_image(1)
+        self.executor.start(1)
+        self.executor.futures[0].set_exception(ValueError('bad image'))
+        self.executor.finish(1, 'image1')
+        with self.assertLogs('cozmo.general', 'ERROR'):
+            self.run_loop()
+        self.assertEqual(self.received, [('image1', 10)])
+        self.assert_counts(1, 0, 1)
+
+    def test_disable_cancels_pending(self):
+        self.complete_image(0)
+        self.camera.disable_decode_executor()
+        self.assertTrue(self.executor.futures[0].cancelled())
+        self.assertFalse(self.executor.is_shutdown)
+        self.run_loop()
+        self.assertEqual(self.received, [])
+        self.assert_counts(0, 1)
@@ -0,0 +1,150 @@
+# Copyright (c) 2016 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+
+from cozmo import clad_protocol
+
+
+class FakeMsg:
+    def __init__(self, payload):
+        self.payload = payload
+        self.tag_name = 'Fake'
+        self._data = payload
+
+    def __len__(self):
+        # as for CLAD messages, messages without any fields are falsy
+        return len(self.payload)
+
+
+class FakeUnion:
+    '''Stands in for a CLAD union; "decodes" a frame to its raw bytes.'''
+    @classmethod
+    def unpack(cls, buf):
+        if bytes(buf[:1]) == b'!':
+            raise ValueError('bad frame')
+        return FakeMsg(bytes(buf))
+
+
+class RecordingProtocol(clad_protocol.CLADProtocol):
+    clad_decode_union = FakeUnion
+
+    def __init__(self):
+        super().__init__()
+        self.received = []
+
+    def msg_received(self, msg):
+        self.received.append(msg.payload)
+
+
+def frame(payload):
+    return struct.pack('H', len(payload)) + payload
+
+
+class CLADProtocolDecodeTests(unittest.TestCase):
+    def test_decode_multiple_frames(self):
+        proto = RecordingProtocol()
+        proto.data_received(frame(b'one') + frame(b'two') + frame(b'three'))
+        self.assertEqual(proto.received, [b'one', b'two', b'three'])
+        # fully consumed buffer is reset
+        self.assertEqual(proto._buf_offset, 0)
+        self.assertEqual(len(proto._buf), 0)
+
+    def test_decode_split_frames(self):
+        proto = RecordingProtocol()
+        data = frame(b'hello') + frame(b'world')
+        for i in range(len(data)):
+            proto.data_received(data[i:i+1])
+        self.assertEqual(proto.received, [b'hello', b'world'])
+
+    def test_partial_frame_retained(self):
+        proto = RecordingProtocol()
+        data = frame(b'first') + frame(b'second')
+        proto.data_received(data[:-2])
+        self.assertEqual(proto.received, [b'first'])
+        # below the compaction threshold the decoded bytes are left in place
+        self.assertEqual(proto._buf_offset, len(frame(b'first')))
+        proto.data_received(data[-2:])
+        self.assertEqual(proto.received, [b'first', b'second'])
+        self.assertEqual(len(proto._buf), 0)
+
+    def test_compact_past_threshold(self):
+        proto = RecordingProtocol()
+        proto.recv_compact_threshold = 16
+        data = frame(b'x' * 20) + frame(b'tail')
+        proto.data_received(data[:-1])
+        self.assertEqual(proto.received, [b'x' * 20])
+        self.assertEqual(proto._buf_offset, 0)
+        self.assertEqual(bytes(proto._buf), frame(b'tail')[:-1])
+        proto.data_received(data[-1:])
+        self.assertEqual(proto.received, [b'x' * 20, b'tail'])
+
+    def test_empty_message(self):
+        proto = RecordingProtocol()
+        proto.data_received(frame(b'one') + frame(b'') + frame(b'two'))
+        self.assertEqual(proto.received, [b'one', b'', b'two'])
+
+    def test_decode_error_skips_frame(self):
+        proto = RecordingProtocol()
+        proto.data_received(frame(b'!bad') + frame(b'good'))
+        self.assertEqual(proto.received, [b'good'])
+
+
+class MessageTemplateTests(unittest.TestCase):
+    def setUp(self):
+        from cozmo._clad import _clad_to_engine_iface
+        self.iface = _clad_to_engine_iface
+        self.union = _clad_to_engine_iface.MessageGameToEngine
+
+    def expected_frame(self, msg):
+        data = self.union(**{msg.__class__.__name__: msg}).pack()
+        return struct.pack('H', len(data)) + data
+
+    def test_matches_clad_packing(self):
+        template = clad_protocol.MessageTemplate(self.iface.DriveWheels(), self.union)
+        packed = template.pack(lwheel_speed_mmps=10, rwheel_speed_mmps=-20.5,
+                lwheel_accel_mmps2=30, rwheel_accel_mmps2=40)
+        expected = self.expected_frame(self.iface.DriveWheels(lwheel_speed_mmps=10,
+                rwheel_speed_mmps=-20.5, lwheel_accel_mmps2=30, rwheel_accel_mmps2=40))
+        self.assertEqual(packed.frame, expected)
+        self.assertEqual(packed.name, 'DriveWheels')
+        self.assertIsNone(packed.objectID)
+
+    def test_arrays_and_object_id(self):
+        template = clad_protocol.MessageTemplate(self.iface.SetAllActiveObjectLEDs(), self.union)
+        packed = template.pack(objectID=3, onColor=[1, 2, 3, 4], robotID=1)
+        expected = self.expected_frame(self.iface.SetAllActiveObjectLEDs(
+                objectID=3, onColor=[1, 2, 3, 4], robotID=1))
+        self.assertEqual(packed.frame, expected)
+        self.assertEqual(packed.objectID, 3)
+        self.assertEqual(template.get('onColor'), (1, 2, 3, 4))
+
+    def test_packed_messages_are_independent(self):
+        template = clad_protocol.MessageTemplate(self.iface.MoveHead(), self.union)
+        first = template.pack(speed_rad_per_sec=1)
+        second = template.pack(speed_rad_per_sec=2)
+        self.assertNotEqual(first.frame, second.frame)
+        self.assertEqual(template.get('speed_rad_per_sec'), 2)
+
+    def test_invalid_values(self):
+        template = clad_protocol.MessageTemplate(self.iface.SetAllActiveObjectLEDs(), self.union)
+        with self.assertRaises(ValueError):
+            template.pack(objectID=-1)
+        with self.assertRaises(ValueError):
+            template.pack(noSuchField=1)
+
+    def test_unsupported_message(self):
+        with self.assertRaises(ValueError):
+            clad_protocol.MessageTemplate(self.iface.SayText(), self.union)
@@ -0,0 +1,61 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from cozmo import clocksync
+
+
+class RobotClockSyncTests(unittest.TestCase):
+    def test_not_synced(self):
+        sync = clocksync.RobotClockSync()
+        self.assertIsNone(sync.robot_to_host_time(1000))
+        sync.add_sample(1000, 5000.0)
+        self.assertFalse(sync.is_synced)
+        self.assertIsNone(sync.drift)
+
+    def test_offset_uses_fastest_delivery(self):
+        sync = clocksync.RobotClockSync()
+        # robot ms -> host receive time, with varying delivery delays
+        delays = (0.03, 0.01, 0.05, 0.02)
+        for i in range(200):
+            robot_ms = i * 50
+            sync.add_sample(robot_ms, 5000.0 + robot_ms / 1000 + delays[i % 4])
+        self.assertTrue(sync.is_synced)
+        self.assertAlmostEqual(sync.drift, 0, places=3)
+        self.assertAlmostEqual(sync.robot_to_host_time(1000), 5001.01, places=2)
+
+    def test_drift(self):
+        sync = clocksync.RobotClockSync()
+        # host clock runs 100ppm faster than the robot's
+        for robot_ms in range(0, 10000, 100):
+            sync.add_sample(robot_ms, 5000.0 + robot_ms / 1000 * 1.0001)
+        self.assertAlmostEqual(sync.drift, 1e-4)
+        self.assertAlmostEqual(sync.offset, 5000.0)
+        self.assertAlmostEqual(sync.robot_to_host_time(20000), 5020.002)
+
+    def test_duplicate_timestamps_ignored(self):
+        sync = clocksync.RobotClockSync()
+        sync.add_sample(100, 1.0)
+        sync.add_sample(100, 2.0)
+        self.assertFalse(sync.is_synced)
+
+    def test_robot_clock_reset(self):
+        sync = clocksync.RobotClockSync()
+        sync.add_sample(5000, 10.0)
+        sync.add_sample(6000, 11.0)
+        sync.add_sample(100, 12.0)
+        self.assertFalse(sync.is_synced)
+        sync.add_sample(200, 12.1)
+        self.assertAlmostEqual(sync.robot_to_host_time(100), 12.0)
@@ -0,0 +1,546 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import struct
+import time
+import unittest
+import unittest.mock
+
+from cozmo import clad_protocol
+from cozmo import conn
+from cozmo import event
+from cozmo import _clad
+from cozmo._clad import _clad_to_engine_iface, _clad_to_game_iface
+
+
+class FakeTransport(asyncio.Transport):
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+        self.closed = False
+        self.write_count = 0
+
+    def write(self, data):
+        self.data.extend(data)
+        self.write_count += 1
+
+    def writelines(self, list_of_data):
+        for data in list_of_data:
+            self.write(data)
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def sent_msgs(self):
+        '''Decodes and clears the messages written so far.'''
+        msgs = []
+        offset = 0
+        while offset < len(self.data):
+            size = struct.unpack_from('H', self.data, offset)[0]
+            frame = bytes(self.data[offset+2:offset+2+size])
+            msgs.append(_clad_to_engine_iface.MessageGameToEngine.unpack(frame)._data)
+            offset += 2 + size
+        del self.data[:]
+        return msgs
+
+
+class ConnTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.conn = conn.CozmoConnection(loop=self.loop)
+        self.transport = FakeTransport()
+        self.conn.connection_made(self.transport)
+
+    def tearDown(self):
+        self.conn._running = False
+        self.loop.close()
+
+    def run_for(self, delay):
+        self.loop.run_until_complete(asyncio.sleep(delay))
+
+
+class CoalesceTests(ConnTestCase):
+    def test_disabled_by_default(self):
+        for speed in (1, 2, 3):
+            self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=speed))
+        self.conn.flush()
+        self.assertEqual(len(self.transport.sent_msgs()), 3)
+        self.assertEqual(self.conn.coalesced_message_count, 0)
+
+    def test_latest_wins(self):
+        self.conn.coalesce_window = 0.01
+        for speed in (1, 2, 3):
+            self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=speed))
+            self.conn.send_msg(_clad_to_engine_iface.MoveLift(speed_rad_per_sec=-speed))
+        self.assertEqual(self.transport.sent_msgs(), [])
+
+        self.run_for(0.02)
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.__class__.__name__ for msg in msgs], ['MoveHead', 'MoveLift'])
+        self.assertEqual(msgs[0].speed_rad_per_sec, 3)
+        self.assertEqual(msgs[1].speed_rad_per_sec, -3)
+        self.assertEqual(self.conn.coalesced_message_count, 4)
+        self.assertEqual(self.conn.coalesced_message_counts, {'MoveHead': 2, 'MoveLift': 2})
+
+    def test_coalesce_per_object(self):
+        self.conn.coalesce_window = 0.01
+        for object_id in (1, 2, 1):
+            self.conn.send_msg(_clad_to_engine_iface.SetAllActiveObjectLEDs(objectID=object_id))
+        self.run_for(0.02)
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.objectID for msg in msgs], [1, 2])
+        self.assertEqual(self.conn.coalesced_message_count, 1)
+
+    def test_other_messages_flush(self):
+        self.conn.coalesce_window = 10
+        self.conn.send_msg(_clad_to_engine_iface.DriveWheels(lwheel_speed_mmps=50))
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.flush()
+        # the held message must be sent before the one that followed it
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.__class__.__name__ for msg in msgs], ['DriveWheels', 'StopAllMotors'])
+        self.assertIsNone(self.conn._coalesce_handle)
+
+
+class WriteGatheringTests(ConnTestCase):
+    def test_single_write_per_iteration(self):
+        for speed in (1, 2, 3):
+            self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=speed))
+        self.assertEqual(self.transport.write_count, 0)
+        self.run_for(0)
+        self.assertEqual(self.transport.write_count, 1)
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.speed_rad_per_sec for msg in msgs], [1, 2, 3])
+
+    def test_flush(self):
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.flush()
+        self.assertEqual(self.transport.write_count, 1)
+        self.assertIsNone(self.conn._flush_handle)
+        # nothing left for the scheduled flush to write
+        self.run_for(0)
+        self.assertEqual(self.transport.write_count, 1)
+
+    def test_flush_includes_coalesced(self):
+        self.conn.coalesce_window = 10
+        self.conn.send_msg(_clad_to_engine_iface.MoveLift(speed_rad_per_sec=1))
+        self.conn.flush()
+        self.assertEqual(len(self.transport.sent_msgs()), 1)
+
+    def test_gathering_disabled(self):
+        self.conn.write_gathering = False
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.assertEqual(self.transport.write_count, 2)
+
+    def test_frame_matches_union(self):
+        msg = _clad_to_engine_iface.DriveWheels(lwheel_speed_mmps=10, rwheel_speed_mmps=20)
+        self.conn.send_msg(msg)
+        self.conn.flush()
+        expected = _clad_to_engine_iface.MessageGameToEngine(DriveWheels=msg).pack()
+        self.assertEqual(bytes(self.transport.data), struct.pack('H', len(expected)) + expected)
+
+    def test_abort_writes_gathered(self):
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.abort(Exception('test'))
+        self.assertTrue(self.transport.closed)
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.__class__.__name__ for msg in msgs], ['StopAllMotors'])
+
+    def test_wrong_version_written(self):
+        msg = _clad_to_game_iface.UiDeviceConnected(
+                connectionType=_clad._clad_to_game_cozmo.UiConnectionType.SdkOverTcp,
+                deviceID=1, buildVersion='0.0.0')
+        self.conn.data_received(engine_frame(msg))
+        self.assertTrue(self.transport.closed)
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.__class__.__name__ for msg in msgs], ['UiDeviceConnectionWrongVersion'])
+
+
+def engine_frame(msg):
+    union = _clad_to_game_iface.MessageEngineToGame(**{msg.__class__.__name__: msg})
+    data = union.pack()
+    return struct.pack('H', len(data)) + data
+
+
+class LazyDecodeTests(ConnTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conn.lazy_decode = True
+        self.received = []
+        self.conn.msg_received = lambda msg: self.received.append(msg.tag_name)
+
+    def test_skip_unsubscribed(self):
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')) +
+                                engine_frame(_clad_to_game_iface.EndOfMessage()))
+        # the connection has a receiver method for EndOfMessage
+        self.assertEqual(self.received, ['EndOfMessage'])
+        self.assertEqual(self.conn.skipped_message_counts, {'DebugString': 1})
+
+    def test_handler_subscribes(self):
+        frame = engine_frame(_clad_to_game_iface.DebugString(text='hi'))
+        self.conn.data_received(frame)
+        self.assertEqual(self.received, [])
+
+        handler = self.conn.add_event_handler(_clad._MsgDebugString, lambda evt, **kw: None)
+        self.conn.data_received(frame)
+        self.assertEqual(self.received, ['DebugString'])
+
+        # removed handlers are only noticed once the table is next rebuilt
+        handler.disable()
+        event._subscription_added((_clad._MsgDebugString._handler_name,))
+        self.conn.data_received(frame)
+        self.assertEqual(self.received, ['DebugString'])
+        self.assertEqual(self.conn.skipped_message_counts, {'DebugString': 2})
+
+    def test_receiver_method_subscribes(self):
+        class DebugStringReceiver(event.Dispatcher):
+            def _recv_msg_debug_string(self, evt, **kw):
+                pass
+
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        receiver = DebugStringReceiver(loop=self.loop)
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        self.assertEqual(self.received, ['DebugString'])
+
+    def test_disabled(self):
+        self.conn.lazy_decode = False
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        self.assertEqual(self.received, ['DebugString'])
+
+
+class RoutingTests(ConnTestCase):
+    def setUp(self):
+        super().setUp()
+        self.routed = []
+        self.conn._process_robot_msg = lambda robot_id, evttype, msg: \
+                self.routed.append((robot_id, evttype))
+        self.conn.dispatch_event = lambda evttype, **kw: self.routed.append((None, evttype))
+
+    def receive(self, msg):
+        self.conn.data_received(engine_frame(msg))
+
+    def test_route_table(self):
+        tags = _clad_to_game_iface.MessageEngineToGame.Tag
+        route = self.conn._msg_routes[tags.RobotState]
+        self.assertEqual(route.tag_name, 'RobotState')
+        self.assertIs(route.evttype, _clad._MsgRobotState)
+        self.assertTrue(route.has_robot_id)
+        self.assertFalse(route.is_forced)
+        route = self.conn._msg_routes[tags.ObjectPowerLevel]
+        self.assertFalse(route.has_robot_id)
+        self.assertTrue(route.is_forced)
+
+    def test_robot_messages(self):
+        self.receive(_clad_to_game_iface.RobotState(robotID=1))
+        self.receive(_clad_to_game_iface.DebugString(text='hi'))
+        self.assertEqual(self.routed, [(1, _clad._MsgRobotState), (None, _clad._MsgDebugString)])
+
+    def test_forced_messages(self):
+        union = _clad_to_game_iface.MessageEngineToGame
+        power_level_cls = union.typeByTag(union.Tag.ObjectPowerLevel)
+        # only forced to the robot once there is one
+        self.receive(power_level_cls(objectID=1))
+        self.conn._primary_robot = unittest.mock.Mock(robot_id=1)
+        self.receive(power_level_cls(objectID=1))
+        self.assertEqual(self.routed, [(None, _clad._MsgObjectPowerLevel),
+                                       (1, _clad._MsgObjectPowerLevel)])
+
+
+class MetricsTests(ConnTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conn.msg_received = lambda msg: None
+
+    def test_received(self):
+        self.conn.metrics_timing_interval = 1
+        frame = engine_frame(_clad_to_game_iface.DebugString(text='hi'))
+        self.conn.data_received(frame + frame)
+        stats = self.conn.metrics().received['DebugString']
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.bytes, 2 * len(frame))
+        self.assertEqual(stats.decode_time.count, 2)
+        self.assertEqual(stats.route_time.count, 2)
+
+    def test_timing_sampled(self):
+        self.conn.metrics_timing_interval = 4
+        frame = engine_frame(_clad_to_game_iface.DebugString(text='hi'))
+        self.conn.data_received(frame * 9)
+        stats = self.conn.metrics().received['DebugString']
+        self.assertEqual(stats.count, 9)
+        self.assertEqual(stats.decode_time.count, 3)
+        self.assertEqual(stats.route_time.count, 3)
+
+    def test_timing_disabled(self):
+        self.conn.metrics_timing_interval = None
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        stats = self.conn.metrics().received['DebugString']
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.decode_time.count, 0)
+
+    def test_skipped_messages_counted(self):
+        self.conn.lazy_decode = True
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        stats = self.conn.metrics().received['DebugString']
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.decode_time.count, 0)
+
+    def test_sent(self):
+        msg = _clad_to_engine_iface.StopAllMotors()
+        self.conn.send_msg(msg)
+        self.conn.send_msg(msg)
+        self.conn.flush()
+        stats = self.conn.metrics().sent['StopAllMotors']
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.bytes, len(self.transport.data))
+
+    def test_disabled(self):
+        self.conn.collect_metrics = False
+        self.conn.data_received(engine_frame(_clad_to_game_iface.DebugString(text='hi')))
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        snapshot = self.conn.metrics()
+        self.assertEqual(snapshot.received, {})
+        self.assertEqual(snapshot.sent, {})
+
+    def test_dump(self):
+        snapshots = []
+        self.conn.start_metrics_dump(0.01, snapshots.append)
+        self.run_for(0.035)
+        self.assertGreaterEqual(len(snapshots), 2)
+        self.conn.stop_metrics_dump()
+        count = len(snapshots)
+        self.run_for(0.02)
+        self.assertEqual(len(snapshots), count)
+
+
+class LatencyTests(ConnTestCase):
+    def respond(self):
+        '''Answer the pings the connection has sent.'''
+        for msg in self.transport.sent_msgs():
+            if msg.__class__.__name__ == 'Ping':
+                self.conn.data_received(engine_frame(_clad_to_game_iface.Ping(
+                        counter=msg.counter, timeSent_ms=msg.timeSent_ms, isResponse=True)))
+
+    def test_round_trip(self):
+        self.conn.start_pinging(interval=0.01)
+        self.conn.flush()
+        self.run_for(0.005)
+        self.respond()
+        latency = self.conn.link_latency
+        self.assertEqual(latency.rtt_histogram.count, 1)
+        self.assertGreaterEqual(latency.rtt, 0.005)
+        self.assertEqual(latency.percentile(50), latency.rtt)
+        self.conn.stop_pinging()
+
+    def test_lost_pings(self):
+        self.conn.start_pinging(interval=0.01, timeout=0.015)
+        self.run_for(0.045)
+        self.conn.stop_pinging()
+        self.assertGreaterEqual(self.conn.link_latency.pings_lost, 2)
+
+    def test_unsolicited_response(self):
+        with self.assertLogs('cozmo.general', 'ERROR'):
+            self.conn.data_received(engine_frame(_clad_to_game_iface.Ping(isResponse=True)))
+
+    def test_clock_offset(self):
+        self.assertIsNone(self.conn.link_latency.clock_offset)
+        self.conn.data_received(engine_frame(_clad_to_game_iface.Ping(
+                counter=1, timeSent_ms=5000, isResponse=False)))
+        self.assertAlmostEqual(self.conn.link_latency.engine_to_host_time(5), time.monotonic(), 1)
+        # the engine's ping is still answered
+        self.conn.flush()
+        msgs = self.transport.sent_msgs()
+        self.assertEqual(msgs[0].counter, 1)
+        self.assertTrue(msgs[0].isResponse)
+
+    def test_threshold_event(self):
+        events = []
+        self.conn.add_event_handler(conn.EvtLinkLatencyChanged,
+                lambda evt, **kw: events.append(evt.is_high))
+        self.conn.start_pinging(interval=10, latency_threshold=0.005)
+        self.conn.flush()
+        self.run_for(0.01)
+        self.respond()
+        self.run_for(0)
+        self.assertEqual(events, [True])
+        self.assertTrue(self.conn._is_latency_high)
+        self.conn.stop_pinging()
+
+
+class LoopLagTests(ConnTestCase):
+    def test_lag_event(self):
+        def block():
+            time.sleep(0.05)
+        events = []
+        self.conn.add_event_handler(conn.EvtLoopLag, lambda evt, **kw: events.append(evt))
+        monitor = self.conn.start_lag_monitor(interval=0.005, threshold=0.02, dump_stacks=True)
+        self.run_for(0.01)
+        self.loop.call_soon(block)
+        with self.assertLogs('cozmo.general', 'WARNING'):
+            self.run_for(0.02)
+        self.conn.stop_lag_monitor()
+        self.assertFalse(monitor.is_running)
+        self.assertIs(self.conn.loop_lag, monitor)
+        evt = max(events, key=lambda evt: evt.lag)
+        self.assertGreaterEqual(evt.lag, 0.02)
+        self.assertIn('block', evt.stack)
+        self.assertGreaterEqual(monitor.max_lag, 0.02)
+
+
+class ConnectionLostTests(ConnTestCase):
+    def test_decode_executor_disabled(self):
+        robot = unittest.mock.Mock()
+        self.conn._robots[1] = robot
+        self.conn.connection_lost(None)
+        robot.camera.disable_decode_executor.assert_called_once_with()
+
+
+class BackpressureTests(ConnTestCase):
+    def names(self):
+        return [msg.__class__.__name__ for msg in self.transport.sent_msgs()]
+
+    def test_queued_while_paused(self):
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.flush()
+        self.assertEqual(self.transport.write_count, 0)
+        self.assertEqual(self.conn.queued_msg_count, 1)
+        self.conn.resume_writing()
+        self.assertEqual(self.names(), ['StopAllMotors'])
+        self.assertEqual(self.conn.queued_msg_count, 0)
+
+    def test_priority_order(self):
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.SetBackpackLEDs())
+        self.conn.send_msg(_clad_to_engine_iface.DriveWheels())
+        self.conn.send_msg(_clad_to_engine_iface.CancelActionByIdTag())
+        self.conn.send_msg(_clad_to_engine_iface.QueueSingleAction(
+                action=_clad_to_engine_iface.RobotActionUnion(
+                    setHeadAngle=_clad_to_engine_iface.SetHeadAngle())))
+        self.conn.resume_writing()
+        self.assertEqual(self.names(), ['CancelActionByIdTag', 'QueueSingleAction',
+                                        'DriveWheels', 'SetBackpackLEDs'])
+
+    def test_cancel_before_later_action(self):
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.DriveWheels())
+        self.conn.send_msg(_clad_to_engine_iface.CancelAction(
+                actionType=_clad._clad_to_engine_cozmo.RobotActionType.UNKNOWN))
+        self.conn.send_msg(_clad_to_engine_iface.QueueSingleAction(
+                action=_clad_to_engine_iface.RobotActionUnion(
+                    setHeadAngle=_clad_to_engine_iface.SetHeadAngle())))
+        self.conn.resume_writing()
+        self.assertEqual(self.names(), ['CancelAction', 'QueueSingleAction', 'DriveWheels'])
+
+    def test_stale_messages_replaced(self):
+        self.conn.pause_writing()
+        for speed in (1, 2, 3):
+            self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=speed))
+            self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.send_msg(_clad_to_engine_iface.SetAllActiveObjectLEDs(objectID=1))
+        self.conn.send_msg(_clad_to_engine_iface.SetAllActiveObjectLEDs(objectID=2))
+        self.assertEqual(self.conn.queued_msg_count, 5)
+        self.conn.resume_writing()
+        msgs = self.transport.sent_msgs()
+        # each stop drops the MoveHead queued before it, so no motion follows
+        self.assertEqual([msg.__class__.__name__ for msg in msgs],
+                         ['StopAllMotors'] * 3 + ['SetAllActiveObjectLEDs'] * 2)
+        snapshot = self.conn.metrics()
+        self.assertEqual(snapshot.sent['MoveHead'].dropped, 3)
+        self.assertEqual(snapshot.dropped_count, 3)
+        self.assertEqual(snapshot.max_queue_depth, 5)
+
+    def test_counted_when_written(self):
+        self.conn._recorder = unittest.mock.Mock()
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=1))
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=2))
+        self.assertEqual(self.conn.metrics().sent['MoveHead'].count, 0)
+        self.assertEqual(self.conn._recorder.record.call_count, 0)
+        self.conn.resume_writing()
+        snapshot = self.conn.metrics()
+        self.assertEqual(snapshot.sent['MoveHead'].count, 1)
+        self.assertEqual(snapshot.sent['MoveHead'].dropped, 1)
+        self.assertEqual(self.conn._recorder.record.call_count, 1)
+        self.conn._recorder = None
+
+    def test_motion_after_stop_kept(self):
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=1))
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=2))
+        self.conn.resume_writing()
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.__class__.__name__ for msg in msgs], ['StopAllMotors', 'MoveHead'])
+        self.assertEqual(msgs[1].speed_rad_per_sec, 2)
+
+    def test_replaced_message_moves_to_end(self):
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=1))
+        self.conn.send_msg(_clad_to_engine_iface.MoveLift(speed_rad_per_sec=1))
+        self.conn.send_msg(_clad_to_engine_iface.MoveHead(speed_rad_per_sec=2))
+        self.conn.resume_writing()
+        self.assertEqual(self.names(), ['MoveLift', 'MoveHead'])
+
+    def test_overflow_drops_lowest_priority(self):
+        self.conn.max_queued_msgs = 3
+        self.conn.pause_writing()
+        self.conn.send_msg(_clad_to_engine_iface.SetAllActiveObjectLEDs(objectID=1))
+        self.conn.send_msg(_clad_to_engine_iface.DriveWheels())
+        for i in range(3):
+            self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.assertEqual(self.conn.queued_msg_count, 3)
+        self.conn.resume_writing()
+        self.assertEqual(self.names(), ['StopAllMotors'] * 3)
+        snapshot = self.conn.metrics()
+        self.assertEqual(snapshot.sent['SetAllActiveObjectLEDs'].dropped, 1)
+        self.assertEqual(snapshot.sent['DriveWheels'].dropped, 1)
+
+    def test_high_priority_never_dropped(self):
+        self.conn.max_queued_msgs = 1
+        self.conn.pause_writing()
+        for i in range(3):
+            self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.assertEqual(self.conn.queued_msg_count, 3)
+
+    def test_closed_transport(self):
+        self.transport.closed = True
+        self.conn.send_msg(_clad_to_engine_iface.StopAllMotors())
+        self.assertEqual(self.conn.metrics().sent['StopAllMotors'].dropped, 1)
+
+
+class MessageTemplateTests(ConnTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = clad_protocol.MessageTemplate(
+                _clad_to_engine_iface.SetAllActiveObjectLEDs(), self.conn.clad_encode_union)
+
+    def test_send(self):
+        self.conn.send_msg(self.template.pack(objectID=2))
+        self.conn.flush()
+        msgs = self.transport.sent_msgs()
+        self.assertEqual(msgs[0].objectID, 2)
+        self.assertEqual(self.conn.metrics().sent['SetAllActiveObjectLEDs'].count, 1)
+
+    def test_coalesced_per_object(self):
+        self.conn.coalesce_window = 10
+        for object_id in (1, 2, 1):
+            self.conn.send_msg(self.template.pack(objectID=object_id))
+        self.conn.flush()
+        msgs = self.transport.sent_msgs()
+        self.assertEqual([msg.objectID for msg in msgs], [1, 2])
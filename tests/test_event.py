@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
 import unittest
 
 import asyncio
@@ -443,6 +444,34 @@ class EventTests(test_utils.TestCase):
         self.assertEqual(recv._result_evt_child1.__class__, self.evt_child2)
         self.assertIsNone(recv._result_evt_one)
 
+    def test_parent_event_classes(self):
+        ev = self.evt_child2(param1=123)
+        self.assertEqual(tuple(ev._parent_event_classes()),
+                (self.evt_child2, self.evt_child1, self.evt_one))
+        self.assertEqual(self.evt_child2._handler_method_name(), '_recv_evt_child2')
+        self.assertEqual(self.evt_one._handler_method_name(), 'recv_evt_one')
+
+    def test_dispatch_obj_per_class(self):
+        # receiver method lookups are cached per class; ensure classes
+        # receiving the same event don't interfere with each other.
+        class ReceiverA:
+            def recv_evt_one(self, evt, **kw):
+                return 'a'
+        class ReceiverB:
+            def _recv_evt_child1(self, evt, **kw):
+                return 'b'
+        class ReceiverC(ReceiverB):
+            def recv_default_handler(self, evt, **kw):
+                return 'c'
+
+        ev = self.evt_child2(param1=123)
+        for i in range(2):
+            self.assertEqual(ev._dispatch_to_obj(ReceiverA()), 'a')
+            self.assertEqual(ev._dispatch_to_obj(ReceiverB()), 'b')
+            self.assertEqual(ev._dispatch_to_obj(ReceiverC()), 'b')
+            self.assertEqual(self.evt_two()._dispatch_to_obj(ReceiverC()), 'c')
+            self.assertIsNone(self.evt_two()._dispatch_to_obj(ReceiverB()))
+
     def test_dispatch_oneshot(self):
         count = 0
         @event.oneshot
@@ -577,6 +606,87 @@ class EventTests(test_utils.TestCase):
         self.assertEqual(child1.count, 1)
         self.assertEqual(child2.count, 1)
 
+    def test_inline_dispatch_sync(self):
+        class InlineReceiver(EventReceiver):
+            inline_dispatch = True
+
+        parent = InlineReceiver(loop=self.loop)
+        recv = InlineReceiver(loop=self.loop, dispatch_parent=parent)
+        cap_evt = None
+        def capture(evt, **kw):
+            nonlocal cap_evt
+            cap_evt = evt
+        recv.add_event_handler(self.evt_one, capture)
+
+        # all handlers are synchronous; should be delivered without a Task
+        result = recv.dispatch_event(self.evt_one, param1=False, param2=123)
+        self.assertIsNone(result)
+        self.assertEqual(cap_evt.param2, 123)
+        self.assertEqual(recv._result_evt_one.param2, 123)
+        self.assertEqual(parent._result_evt_one.param2, 123)
+
+    def test_inline_dispatch_async_ordering(self):
+        class InlineDispatcher(event.Dispatcher):
+            inline_dispatch = True
+
+        recv = InlineDispatcher(loop=self.loop)
+        calls = []
+        async def async_handler(evt, **kw):
+            calls.append(('async', evt.param2))
+        def sync_handler(evt, **kw):
+            calls.append(('sync', evt.param2))
+        recv.add_event_handler(self.evt_two, async_handler)
+        recv.add_event_handler(self.evt_one, sync_handler)
+
+        task = recv.dispatch_event(self.evt_two, param2=1)
+        self.assertIsInstance(task, asyncio.Task)
+        # must not overtake the event still being dispatched
+        recv.dispatch_event(self.evt_one, param2=2)
+        self.assertEqual(calls, [])
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(calls, [('async', 1), ('sync', 2)])
+
+        # nothing in progress; back to delivering immediately
+        self.assertIsNone(recv.dispatch_event(self.evt_one, param2=3))
+        self.assertEqual(calls[-1], ('sync', 3))
+
+    def test_inline_dispatch_awaiting_handler(self):
+        class InlineDispatcher(event.Dispatcher):
+            inline_dispatch = True
+
+        recv = InlineDispatcher(loop=self.loop)
+        calls = []
+        async def async_handler(evt, **kw):
+            calls.append(('start', evt.param2))
+            await asyncio.sleep(0, loop=self.loop)
+            calls.append(('end', evt.param2))
+        def sync_handler(evt, **kw):
+            calls.append(('sync', evt.param2))
+        recv.add_event_handler(self.evt_two, async_handler)
+        recv.add_event_handler(self.evt_one, sync_handler)
+
+        task = recv.dispatch_event(self.evt_two, param2=1)
+        recv.dispatch_event(self.evt_one, param2=2)
+        self.loop.run_until_complete(task)
+        # delivered after the handler started, but without waiting for it
+        self.assertEqual(calls, [('start', 1), ('sync', 2), ('end', 1)])
+
+    def test_inline_dispatch_exception(self):
+        class InlineDispatcher(event.Dispatcher):
+            inline_dispatch = True
+
+        contexts = []
+        self.loop.set_exception_handler(lambda loop, context: contexts.append(context))
+        recv = InlineDispatcher(loop=self.loop)
+        exc = ValueError('test exception')
+        def handler(evt, **kw):
+            raise exc
+        recv.add_event_handler(self.evt_one, handler)
+        recv.dispatch_event(self.evt_one, param2=123)
+        self.assertEqual(len(contexts), 1)
+        self.assertIs(contexts[0]['exception'], exc)
+
     def test_stop_dispatcher(self):
         count = 0
         def handler(evt, *a, **kw):
@@ -709,3 +819,376 @@ class EventTests(test_utils.TestCase):
         with self.assertRaises(TestExc):
             result = self.loop.run_until_complete(co)
         self.assertTrue(fut1.cancelled())
+
+    def test_handler_order_and_duplicates(self):
+        ins = DispatchTest(loop=self.loop)
+        ins.add_event_handler(self.evt_one, "one")
+        ins.add_event_handler(self.evt_one, "two")
+        ins.add_event_handler(self.evt_one, "one")
+        ins.add_event_handler(self.evt_one, "three")
+        ins.remove_event_handler(self.evt_one, "two")
+        self.assertEqual(ins._dispatch_handlers["EvtOne"],
+                [event.Handler(ins, self.evt_one, 'one'), event.Handler(ins, self.evt_one, 'three')])
+        # added twice, so needs removing twice
+        ins.remove_event_handler(self.evt_one, "one")
+        self.assertIn(event.Handler(ins, self.evt_one, 'one'), ins._dispatch_handlers["EvtOne"])
+        ins.remove_event_handler(self.evt_one, "one")
+        self.assertEqual(ins._dispatch_handlers["EvtOne"],
+                [event.Handler(ins, self.evt_one, 'three')])
+
+    def test_unhashable_handler(self):
+        class Owner:
+            def __init__(self):
+                self.called = []
+            def __eq__(self, other):
+                return self is other
+            def handle(self, evt, **kw):
+                self.called.append(evt)
+
+        ins = DispatchTest(loop=self.loop)
+        owner = Owner()
+        handler = ins.add_event_handler(self.evt_one, owner.handle)
+        ins.dispatch_event(self.evt_one)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(len(owner.called), 1)
+        # a newly bound method still finds the registered handler
+        ins.remove_event_handler(self.evt_one, owner.handle)
+        self.assertEqual(len(ins._dispatch_handlers["EvtOne"]), 0)
+        ins.add_event_handler(self.evt_one, owner.handle)
+        handler.disable()
+        self.assertEqual(len(ins._dispatch_handlers["EvtOne"]), 0)
+
+    def test_remove_by_event_instance(self):
+        ins = DispatchTest(loop=self.loop)
+        handler = lambda evt, **kw: None
+        ins.add_event_handler(self.evt_one, handler)
+        ins.remove_event_handler(self.evt_one(), handler)
+        self.assertEqual(len(ins._dispatch_handlers["EvtOne"]), 0)
+
+    def test_oneshot_handlers_dispatch_in_order(self):
+        recv = DispatchTest(loop=self.loop)
+        called = []
+        for i in range(5):
+            recv.add_event_handler(self.evt_one, event.oneshot(
+                    lambda evt, i=i, **kw: called.append(i)))
+        recv.dispatch_event(self.evt_one)
+        recv.dispatch_event(self.evt_one)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(called, [0, 1, 2, 3, 4])
+        self.assertEqual(len(recv._dispatch_handlers["EvtOne"]), 0)
+
+    def test_indexed_filters_only_match_their_value(self):
+        recv = DispatchTest(loop=self.loop)
+        called = []
+        for value in (1, 2, 2):
+            recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                    param1=value)(lambda evt, value=value, **kw: called.append(value)))
+        handlers = recv._dispatch_handlers["EvtOne"]
+        self.assertEqual(len(handlers.matching(self.evt_one(param1=2))), 2)
+        self.assertEqual(len(handlers.matching(self.evt_one(param1=3))), 0)
+        recv.dispatch_event(self.evt_one, param1=2)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(called, [2, 2])
+
+    def test_indexed_filters_keep_order_with_unindexed(self):
+        recv = DispatchTest(loop=self.loop)
+        called = []
+        recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                param1=1)(lambda evt, **kw: called.append('indexed')))
+        recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                param1=lambda v: v > 0)(lambda evt, **kw: called.append('predicate')))
+        recv.add_event_handler(self.evt_one, lambda evt, **kw: called.append('plain'))
+        recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                param1=1, param2=lambda v: v is None)(lambda evt, **kw: called.append('mixed')))
+        recv.dispatch_event(self.evt_one, param1=1)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(called, ['indexed', 'predicate', 'plain', 'mixed'])
+
+        del called[:]
+        recv.dispatch_event(self.evt_one, param1=2, param2='x')
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(called, ['predicate', 'plain'])
+
+    def test_indexed_filters_unhashable_values(self):
+        recv = DispatchTest(loop=self.loop)
+        called = []
+        recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                param1=[1])(lambda evt, **kw: called.append('list')))
+        recv.add_event_handler(self.evt_one, event.filter_handler(self.evt_one,
+                param1=1)(lambda evt, **kw: called.append('int')))
+        recv.dispatch_event(self.evt_one, param1=[1])
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(called, ['list'])
+
+    def test_indexed_wait_for_removed_on_completion(self):
+        recv = DispatchTest(loop=self.loop)
+        futs = [asyncio.ensure_future(recv.wait_for(event.Filter(self.evt_one, param1=i),
+                timeout=None), loop=self.loop) for i in range(3)]
+        test_utils.run_briefly(self.loop)
+        recv.dispatch_event(self.evt_one, param1=1)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual([f.done() for f in futs], [False, True, False])
+        handlers = recv._dispatch_handlers["EvtOne"]
+        self.assertEqual(len(handlers), 2)
+        self.assertEqual(list(handlers._index['param1']), [0, 2])
+        recv._abort_event_futures(exceptions.SDKShutdown())
+        test_utils.run_briefly(self.loop)
+        self.assertIsInstance(futs[0].exception(), exceptions.SDKShutdown)
+        self.assertEqual(len(handlers), 0)
+        self.assertEqual(handlers._index, {})
+
+    def test_stream_buffers_between_awaits(self):
+        recv = DispatchTest(loop=self.loop)
+        stream = recv.stream(self.evt_one)
+        for i in range(3):
+            recv.dispatch_event(self.evt_one, param1=i)
+        test_utils.run_briefly(self.loop)
+
+        async def consume():
+            return [(await stream.__anext__()).param1 for i in range(3)]
+        self.assertEqual(self.loop.run_until_complete(consume()), [0, 1, 2])
+        self.assertEqual(stream.received_count, 3)
+        self.assertEqual(stream.dropped_count, 0)
+
+    def test_stream_waits_for_events(self):
+        recv = DispatchTest(loop=self.loop)
+        stream = recv.stream(event.Filter(self.evt_one, param1=2))
+
+        async def consume():
+            result = []
+            async for evt in stream:
+                result.append(evt.param1)
+            return result
+        task = asyncio.ensure_future(consume(), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        for i in range(4):
+            recv.dispatch_event(self.evt_one, param1=i % 3)
+            test_utils.run_briefly(self.loop)
+        stream.close()
+        self.assertEqual(self.loop.run_until_complete(task), [2])
+        self.assertEqual(len(recv._dispatch_handlers["EvtOne"]), 0)
+
+    def test_stream_overflow(self):
+        recv = DispatchTest(loop=self.loop)
+        oldest = recv.stream(self.evt_one, maxlen=2)
+        newest = recv.stream(self.evt_one, maxlen=2, overflow='drop_newest')
+        for i in range(5):
+            recv.dispatch_event(self.evt_one, param1=i)
+        test_utils.run_briefly(self.loop)
+        oldest.close()
+        newest.close()
+
+        async def consume(stream):
+            result = []
+            async for evt in stream:
+                result.append(evt.param1)
+            return result
+        self.assertEqual(self.loop.run_until_complete(consume(oldest)), [3, 4])
+        self.assertEqual(self.loop.run_until_complete(consume(newest)), [0, 1])
+        self.assertEqual(oldest.dropped_count, 3)
+        self.assertEqual(newest.dropped_count, 3)
+        self.assertEqual(newest.received_count, 5)
+
+        with self.assertRaises(ValueError):
+            recv.stream(self.evt_one, overflow='block')
+        with self.assertRaises(ValueError):
+            recv.stream(self.evt_one, maxlen=0)
+
+    def test_stream_aborted(self):
+        recv = DispatchTest(loop=self.loop)
+
+        async def consume():
+            async with recv.stream(self.evt_one) as stream:
+                async for evt in stream:
+                    pass
+        task = asyncio.ensure_future(consume(), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        recv._abort_event_futures(exceptions.SDKShutdown())
+        with self.assertRaises(exceptions.SDKShutdown):
+            self.loop.run_until_complete(task)
+        self.assertEqual(len(recv._dispatch_handlers["EvtOne"]), 0)
+
+    def test_dispatch_profiling(self):
+        recv = EventReceiver(loop=self.loop)
+        slow = []
+        def slow_handler(evt, **kw):
+            time.sleep(0.005)
+        recv.add_event_handler(self.evt_one, slow_handler)
+        recv.add_event_handler(event.EvtSlowEventHandler, lambda evt, **kw: slow.append(evt))
+        profiler = event.enable_dispatch_profiling(budget=0.002)
+        try:
+            with self.assertLogs('cozmo.general', 'WARNING'):
+                recv.dispatch_event(self.evt_one)
+                test_utils.run_briefly(self.loop)
+                test_utils.run_briefly(self.loop)
+        finally:
+            self.assertIs(event.disable_dispatch_profiling(), profiler)
+        stats = profiler.stats()
+        handler_stats = stats[(slow_handler.__qualname__, 'EvtOne')]
+        self.assertEqual(handler_stats.count, 1)
+        self.assertEqual(handler_stats.slow_count, 1)
+        self.assertIn(('EventReceiver.recv_evt_one', 'EvtOne'), stats)
+        self.assertIn(slow_handler.__qualname__, profiler.report())
+        self.assertEqual(len(slow), 1)
+        self.assertEqual(slow[0].handler_name, slow_handler.__qualname__)
+        self.assertEqual(slow[0].handled_event_name, 'EvtOne')
+
+        # nothing is recorded once disabled
+        recv.dispatch_event(self.evt_one)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(profiler.stats()[(slow_handler.__qualname__, 'EvtOne')].count, 1)
+
+    def test_dispatch_profiling_async(self):
+        recv = DispatchTest(loop=self.loop)
+        slow = []
+        fut = asyncio.Future(loop=self.loop)
+        async def slow_handler(evt, **kw):
+            time.sleep(0.003)
+            await fut
+            time.sleep(0.003)
+        recv.add_event_handler(self.evt_one, slow_handler)
+        recv.add_event_handler(event.EvtSlowEventHandler, lambda evt, **kw: slow.append(evt))
+        profiler = event.enable_dispatch_profiling(budget=0.005)
+        try:
+            with self.assertLogs('cozmo.general', 'WARNING'):
+                task = recv.dispatch_event(self.evt_one)
+                test_utils.run_briefly(self.loop)
+                # time spent waiting isn't counted
+                time.sleep(0.01)
+                fut.set_result(None)
+                self.loop.run_until_complete(task)
+                test_utils.run_briefly(self.loop)
+                test_utils.run_briefly(self.loop)
+        finally:
+            event.disable_dispatch_profiling()
+        handler_stats = profiler.stats()[(slow_handler.__qualname__, 'EvtOne')]
+        self.assertEqual(handler_stats.count, 1)
+        self.assertEqual(handler_stats.slow_count, 1)
+        self.assertGreaterEqual(handler_stats.time.total, 0.006)
+        self.assertLess(handler_stats.time.total, 0.015)
+        self.assertEqual(len(slow), 1)
+        self.assertEqual(slow[0].handler_name, slow_handler.__qualname__)
+
+    def test_event_slots(self):
+        ev = self.evt_one(param1=123)
+        self.assertFalse(hasattr(ev, '__dict__'))
+        with self.assertRaises(AttributeError):
+            ev.not_a_param = 1
+        with self.assertRaises(ValueError):
+            self.evt_one(param4=1)
+        # parameters are documented by their slots
+        self.assertEqual(self.evt_one.__slots__['param1'], 'Parameter one')
+        child = self.evt_child1(param1=1, param2=2)
+        self.assertEqual((child.param1, child.param2), (1, 2))
+
+    def test_event_param_conflicts(self):
+        with self.assertRaises(ValueError):
+            class EvtBadName(event.Event):
+                "Event with a parameter clashing with event_name"
+                event_name = "The name"
+
+    def test_event_params_cached(self):
+        ev = self.evt_one(param1=123)
+        params = ev._params()
+        self.assertEqual(params, {'param1': 123, 'param2': None, 'param3': None})
+        self.assertIs(ev._params(), params)
+
+    def test_event_delivery_marker(self):
+        ev = self.evt_one()
+        first = DispatchTest(loop=self.loop)
+        second = DispatchTest(loop=self.loop)
+        self.assertTrue(ev._mark_delivered(first))
+        self.assertFalse(ev._mark_delivered(first))
+        self.assertTrue(ev._mark_delivered(second))
+        self.assertFalse(ev._mark_delivered(first))
+        self.assertFalse(ev._mark_delivered(second))
+
+    def test_prune_unsubscribed(self):
+        root = DispatchTest(loop=self.loop)
+        parent = DispatchTest(loop=self.loop, dispatch_parent=root)
+        leaf = DispatchTest(loop=self.loop, dispatch_parent=parent)
+        self.assertIsNone(leaf.dispatch_event(self.evt_one))
+
+        # a handler added anywhere up the chain is reached
+        called = []
+        handler = root.add_event_handler(self.evt_one, lambda evt, **kw: called.append(evt))
+        self.assertIsNotNone(leaf.dispatch_event(self.evt_one))
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(len(called), 1)
+
+        # handlers for parent event classes count too
+        self.assertIsNotNone(leaf.dispatch_event(self.evt_child1))
+        self.assertIsNone(leaf.dispatch_event(self.evt_two))
+
+        # removed handlers are noticed once the event is next subscribed to,
+        # here by something that isn't linked to leaf
+        handler.disable()
+        DispatchTest(loop=self.loop).add_event_handler(self.evt_one, lambda evt, **kw: None)
+        self.assertIsNone(leaf.dispatch_event(self.evt_one))
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+
+    def test_prune_invalidated_per_event(self):
+        leaf = DispatchTest(loop=self.loop, dispatch_parent=DispatchTest(loop=self.loop))
+        self.assertIsNone(leaf.dispatch_event(self.evt_one))
+        self.assertIsNone(leaf.dispatch_event(self.evt_child1))
+        entry = leaf._subscribed[self.evt_one]
+
+        # subscribing to another event leaves the entry for evt_one alone
+        handler = leaf.add_event_handler(self.evt_two, lambda evt, **kw: None)
+        handler.disable()
+        self.assertIsNone(leaf.dispatch_event(self.evt_one))
+        self.assertIs(leaf._subscribed[self.evt_one], entry)
+
+        # but subscribing to a parent event class reaches its subclasses
+        leaf.add_event_handler(self.evt_one, lambda evt, **kw: None)
+        self.assertIsNotNone(leaf.dispatch_event(self.evt_child1))
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+
+    def test_prune_children_and_late_links(self):
+        root = DispatchTest(loop=self.loop)
+        child = DispatchTest(loop=self.loop, dispatch_parent=root)
+        other = DispatchTest(loop=self.loop)
+        self.assertIsNone(child.dispatch_event(self.evt_one))
+
+        # events are passed on to the parent's children
+        root._add_child_dispatcher(other)
+        fut = asyncio.ensure_future(other.wait_for(self.evt_one, timeout=None), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertIsNotNone(child.dispatch_event(self.evt_one))
+        self.loop.run_until_complete(fut)
+
+        orphan = DispatchTest(loop=self.loop)
+        self.assertIsNone(orphan.dispatch_event(self.evt_two))
+        orphan._set_parent_dispatcher(EventReceiver(loop=self.loop))
+        self.assertIsNotNone(orphan.dispatch_event(self.evt_two))
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+
+    def test_prune_receiver_methods(self):
+        called = []
+        class PassiveReceiver(event.Dispatcher):
+            @event._passive_receiver
+            def recv_default_handler(self, evt, **kw):
+                called.append(evt)
+
+        recv = EventReceiver(loop=self.loop)
+        self.assertIsNotNone(recv.dispatch_event(self.evt_one))
+        self.assertIsNotNone(recv.dispatch_event(self.evt_two))
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        test_utils.run_briefly(self.loop)
+        passive = PassiveReceiver(loop=self.loop)
+        self.assertIsNone(passive.dispatch_event(self.evt_one))
+        self.assertEqual(called, [])
+        # but passive receivers still see events dispatched for something else
+        passive.add_event_handler(self.evt_one, lambda evt, **kw: None)
+        passive.dispatch_event(self.evt_one)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(len(called), 1)
@@ -0,0 +1,141 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import unittest
+
+import cozmo.world
+from cozmo import action
+from cozmo import conn
+from cozmo import loadgen
+
+from .test_replay import run_until
+
+
+class SyntheticEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.engine = None
+        self.sdk_conn = None
+
+    def tearDown(self):
+        if self.sdk_conn is not None:
+            self.sdk_conn._running = False
+            self.sdk_conn.transport.close()
+        if self.engine is not None:
+            if self.engine._thread is not None:
+                self.engine.stop_thread()
+            else:
+                self.loop.run_until_complete(self.engine.stop())
+        self.loop.close()
+
+    def connect(self, engine):
+        self.engine = engine
+        connector = engine.connector()
+        factory = functools.partial(conn.CozmoConnection, loop=self.loop)
+        transport, self.sdk_conn = self.loop.run_until_complete(
+                self.loop.create_connection(factory, connector.ip_addr, connector.tcp_port))
+        return self.sdk_conn
+
+    def start(self, **kw):
+        engine = loadgen.SyntheticEngine(loop=self.loop, **kw)
+        self.loop.run_until_complete(engine.start())
+        return self.connect(engine)
+
+    def test_robot_ready(self):
+        sdk_conn = self.start(num_objects=3, num_faces=5, observation_hz=50)
+        run_until(self.loop, lambda: sdk_conn._primary_robot and sdk_conn._primary_robot.is_ready)
+        world = sdk_conn._primary_robot.world
+        run_until(self.loop, lambda: len(world._faces) == 5 and len(world._objects) == 3)
+
+    def test_observations_batch(self):
+        sdk_conn = self.start(num_objects=2, num_faces=3, observation_hz=50)
+        run_until(self.loop, lambda: sdk_conn._primary_robot and sdk_conn._primary_robot.is_ready)
+        world = sdk_conn._primary_robot.world
+        world.batch_observations = True
+        batches = []
+        world.add_event_handler(cozmo.world.EvtObservationsBatch,
+                lambda evt, **kw: batches.append(evt))
+        run_until(self.loop, lambda: batches)
+        evt = batches[0]
+        self.assertEqual(len(evt.objects), 2)
+        self.assertEqual(len(evt.faces), 3)
+        self.assertEqual(len(evt.pets), 0)
+        face, updated = next(iter(evt.faces.items()))
+        self.assertIn('last_observed_time', updated)
+        self.assertIs(world._faces[face.face_id], face)
+
+    def test_action_completed(self):
+        sdk_conn = self.start(action_delay=0.05)
+        run_until(self.loop, lambda: sdk_conn._primary_robot and sdk_conn._primary_robot.is_ready)
+        robot = sdk_conn._primary_robot
+        act = robot.set_head_angle(robot.head_angle or 0)
+        run_until(self.loop, lambda: act.is_completed)
+        self.assertEqual(act.state, action.ACTION_SUCCEEDED)
+
+    def test_images(self):
+        sdk_conn = self.start(image_hz=30)
+        run_until(self.loop, lambda: sdk_conn._primary_robot and sdk_conn._primary_robot.is_ready)
+        camera = sdk_conn._primary_robot.camera
+        run_until(self.loop, lambda: camera.decoded_image_count >= 3)
+
+    def test_ping(self):
+        sdk_conn = self.start()
+        sdk_conn.start_pinging(interval=0.01)
+        latency = sdk_conn.link_latency
+        run_until(self.loop, lambda: latency.rtt_histogram.count >= 3)
+        self.assertLess(latency.mean_rtt, 1)
+
+    def test_offered_rate(self):
+        engine = loadgen.SyntheticEngine(robot_state_hz=10, num_faces=2,
+                observation_hz=5, loop=self.loop)
+        self.assertEqual(engine.offered_rate, 20)
+        engine.rate_scale = 2
+        self.assertEqual(engine.offered_rate, 40)
+
+    def test_measure_capacity(self):
+        engine = loadgen.SyntheticEngine(robot_state_hz=100, num_faces=2, loop=self.loop)
+        engine.start_in_thread()
+        sdk_conn = self.connect(engine)
+        run_until(self.loop, lambda: sdk_conn._primary_robot and sdk_conn._primary_robot.is_ready)
+        report = self.loop.run_until_complete(loadgen.measure_capacity(engine, sdk_conn,
+                lag_threshold=1, step_duration=0.5, max_steps=2))
+        self.assertEqual(len(report.steps), 2)
+        self.assertGreater(report.sustained_rate, 0)
+        self.assertEqual(engine.rate_scale, 1.0)
+
+    def test_measure_capacity_needs_metrics(self):
+        sdk_conn = self.start()
+        run_until(self.loop, lambda: self.engine.connection_for(sdk_conn))
+        sdk_conn.collect_metrics = False
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(loadgen.measure_capacity(self.engine, sdk_conn))
+
+    def test_measure_capacity_per_connection(self):
+        engine = loadgen.SyntheticEngine(robot_state_hz=100, loop=self.loop)
+        engine.start_in_thread()
+        other_conn = self.connect(engine)
+        sdk_conn = self.connect(engine)
+        try:
+            run_until(self.loop, lambda: len(engine.connections) == 2)
+            self.assertIsNot(engine.connection_for(sdk_conn), engine.connection_for(other_conn))
+            report = self.loop.run_until_complete(loadgen.measure_capacity(engine, sdk_conn,
+                    lag_threshold=1, step_duration=0.5, max_steps=1))
+            # traffic to the other connection isn't counted
+            step = report.steps[0]
+            self.assertLess(step.achieved_rate, step.offered_rate * 1.25)
+        finally:
+            other_conn._running = False
+            other_conn.transport.close()
@@ -0,0 +1,135 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+import unittest
+
+from cozmo import metrics
+
+
+class HistogramTests(unittest.TestCase):
+    def test_empty(self):
+        hist = metrics.Histogram()
+        self.assertIsNone(hist.mean)
+        self.assertIsNone(hist.percentile(50))
+
+    def test_record(self):
+        hist = metrics.Histogram()
+        for value in (1e-6, 3e-6, 3e-6, 3e-6, 1e-3):
+            hist.record(value)
+        self.assertEqual(hist.count, 5)
+        self.assertEqual(hist.min, 1e-6)
+        self.assertEqual(hist.max, 1e-3)
+        self.assertAlmostEqual(hist.mean, 2.02e-4)
+        # 3us falls in the (2us, 4us] bucket
+        self.assertEqual(hist.percentile(50), 4e-6)
+        # capped at the largest value
+        self.assertEqual(hist.percentile(100), 1e-3)
+
+    def test_overflow(self):
+        hist = metrics.Histogram()
+        hist.record(10)
+        self.assertEqual(hist.counts[-1], 1)
+        self.assertEqual(hist.percentile(99), 10)
+
+    def test_copy(self):
+        hist = metrics.Histogram()
+        hist.record(1e-6)
+        copy = hist.copy()
+        hist.record(1e-6)
+        self.assertEqual(copy.count, 1)
+        self.assertEqual(sum(copy.counts), 1)
+
+
+class ProtocolMetricsTests(unittest.TestCase):
+    def test_snapshot(self):
+        proto_metrics = metrics.ProtocolMetrics()
+        stats = proto_metrics.received(3)
+        stats.count += 1
+        stats.bytes += 10
+        stats.decode_time.record(1e-5)
+        proto_metrics.sent(4).count += 2
+
+        snapshot = proto_metrics.snapshot({'Three': 3, 'Five': 5}, {'Four': 4})
+        self.assertEqual(list(snapshot.received), ['Three'])
+        self.assertEqual(snapshot.received_count, 1)
+        self.assertEqual(snapshot.received_bytes, 10)
+        self.assertEqual(snapshot.sent_count, 2)
+        self.assertIsNone(snapshot.sent['Four'].decode_time)
+
+        # snapshots don't change as more messages arrive
+        stats.count += 1
+        self.assertEqual(snapshot.received['Three'].count, 1)
+        self.assertIn('Three', str(snapshot))
+
+
+class LinkLatencyTests(unittest.TestCase):
+    def test_rolling_window(self):
+        latency = metrics.LinkLatency(window=2)
+        for rtt in (0.1, 0.2, 0.4):
+            latency.record_rtt(rtt)
+        self.assertEqual(latency.rtt, 0.4)
+        self.assertAlmostEqual(latency.mean_rtt, 0.3)
+        self.assertEqual(latency.rtt_histogram.count, 3)
+
+    def test_clock_offset(self):
+        latency = metrics.LinkLatency()
+        # the least delayed sample wins
+        latency.record_engine_time(100.0, 10.5)
+        latency.record_engine_time(101.0, 11.0)
+        self.assertAlmostEqual(latency.clock_offset, 90.0)
+        latency.record_rtt(0.2)
+        self.assertAlmostEqual(latency.clock_offset, 90.1)
+        self.assertAlmostEqual(latency.engine_to_host_time(100.1), 10.0)
+
+
+class DispatchProfilerTests(unittest.TestCase):
+    def test_record(self):
+        profiler = metrics.DispatchProfiler(budget=0.01)
+        self.assertFalse(profiler.record('fast', 'EvtOne', 0.001))
+        self.assertTrue(profiler.record('slow', 'EvtOne', 0.02))
+        self.assertFalse(profiler.record('fast', 'EvtOne', 0.003))
+        stats = profiler.stats()
+        self.assertEqual(stats[('fast', 'EvtOne')].count, 2)
+        self.assertEqual(stats[('fast', 'EvtOne')].slow_count, 0)
+        self.assertEqual(stats[('slow', 'EvtOne')].slow_count, 1)
+        # most total time first
+        lines = profiler.report().splitlines()
+        self.assertTrue(lines[1].startswith('slow'))
+        self.assertEqual(len(profiler.report(limit=1).splitlines()), 2)
+        profiler.reset()
+        self.assertEqual(profiler.stats(), {})
+
+
+class LoopLagMonitorTests(unittest.TestCase):
+    def test_measure(self):
+        loop = asyncio.new_event_loop()
+        lags = []
+        monitor = metrics.LoopLagMonitor(loop, interval=0.005, threshold=0.05,
+                callback=lambda lag, stack: lags.append((lag, stack)))
+        try:
+            monitor.start()
+            loop.run_until_complete(asyncio.sleep(0.02))
+            self.assertGreater(monitor.lag_histogram.count, 0)
+            loop.call_soon(time.sleep, 0.1)
+            loop.run_until_complete(asyncio.sleep(0.02))
+        finally:
+            monitor.stop()
+            loop.close()
+        lag, stack = max(lags)
+        self.assertGreaterEqual(lag, 0.05)
+        # stacks are only captured by the watchdog thread
+        self.assertIsNone(stack)
+        self.assertGreaterEqual(monitor.percentile(100), 0.05)
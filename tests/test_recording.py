@@ -0,0 +1,88 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os.path
+import shutil
+import struct
+import tempfile
+import unittest
+
+from cozmo import recording
+
+from .test_clad_protocol import RecordingProtocol, frame
+
+
+class SessionRecordingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'session.rec')
+
+    def test_round_trip(self):
+        recorder = recording.SessionRecorder(self.path)
+        recorder.record(recording.DIRECTION_RECV, b'one', timestamp=1.0)
+        recorder.record(recording.DIRECTION_SEND, memoryview(b'two'), timestamp=2.0)
+        recorder.record(recording.DIRECTION_RECV, b'', timestamp=3.0)
+        self.assertEqual(recorder.message_count, 3)
+        recorder.close()
+        self.assertTrue(recorder.is_closed)
+
+        with recording.SessionReader(self.path) as reader:
+            self.assertEqual(reader.start_time, recorder.start_time)
+            msgs = [(t, d, bytes(data)) for t, d, data in reader]
+        self.assertEqual(msgs, [
+            (1.0, recording.DIRECTION_RECV, b'one'),
+            (2.0, recording.DIRECTION_SEND, b'two'),
+            (3.0, recording.DIRECTION_RECV, b'')])
+
+    def test_seek(self):
+        recorder = recording.SessionRecorder(self.path, index_interval=10)
+        for i in range(100):
+            recorder.record(recording.DIRECTION_RECV, struct.pack('I', i), timestamp=float(i))
+        recorder.close()
+
+        with recording.SessionReader(self.path) as reader:
+            self.assertEqual(len(reader._index_offsets), 10)
+            msgs = [struct.unpack('I', data)[0] for t, d, data in reader.messages(start_time=55)]
+        self.assertEqual(msgs, list(range(55, 100)))
+
+    def test_truncated_recording(self):
+        recorder = recording.SessionRecorder(self.path, index_interval=1)
+        recorder.record(recording.DIRECTION_RECV, b'complete', timestamp=1.0)
+        recorder.record(recording.DIRECTION_RECV, b'partial', timestamp=2.0)
+        recorder.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+
+        with recording.SessionReader(self.path) as reader:
+            msgs = [bytes(data) for t, d, data in reader.messages(start_time=0)]
+        self.assertEqual(msgs, [b'complete'])
+
+    def test_not_a_recording(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 100)
+        with self.assertRaises(ValueError):
+            recording.SessionReader(self.path)
+
+    def test_protocol_records_received(self):
+        proto = RecordingProtocol()
+        proto._recorder = recording.SessionRecorder(self.path)
+        proto.data_received(frame(b'hello') + frame(b'world'))
+        proto.connection_lost(None)
+        self.assertIsNone(proto._recorder)
+
+        with recording.SessionReader(self.path) as reader:
+            msgs = [(d, bytes(data)) for t, d, data in reader]
+        self.assertEqual(msgs, [(recording.DIRECTION_RECV, b'hello'),
+                                (recording.DIRECTION_RECV, b'world')])
@@ -0,0 +1,102 @@
+# Copyright (c) 2017 Anki, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License in the file LICENSE.txt or at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import os
+import tempfile
+import unittest
+
+from cozmo import conn
+from cozmo import recording
+from cozmo import replay
+from cozmo._clad import _clad_to_game_iface
+
+
+def run_until(loop, predicate, timeout=5):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    loop.run_until_complete(asyncio.wait_for(poll(), timeout))
+
+
+def anim_messages(names):
+    msgs = [_clad_to_game_iface.AnimationAvailable(animName=name) for name in names]
+    msgs.append(_clad_to_game_iface.EndOfMessage())
+    return [(i * 0.01, msg) for i, msg in enumerate(msgs)]
+
+
+class ReplayEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.engine = None
+        self.sdk_conn = None
+
+    def tearDown(self):
+        if self.sdk_conn is not None:
+            self.sdk_conn._running = False
+            self.sdk_conn.transport.close()
+        if self.engine is not None:
+            self.loop.run_until_complete(self.engine.stop())
+        self.loop.close()
+
+    def connect(self, engine):
+        self.engine = engine
+        self.loop.run_until_complete(engine.start())
+        connector = engine.connector()
+        factory = functools.partial(conn.CozmoConnection, loop=self.loop)
+        transport, self.sdk_conn = self.loop.run_until_complete(
+                self.loop.create_connection(factory, connector.ip_addr, connector.tcp_port))
+        return self.sdk_conn
+
+    def test_handshake(self):
+        sdk_conn = self.connect(replay.ReplayEngine([], loop=self.loop))
+        run_until(self.loop, lambda: sdk_conn._is_ui_connected)
+        self.assertTrue(sdk_conn._running)
+
+    def test_replay_messages(self):
+        engine = replay.ReplayEngine(anim_messages(['anim1', 'anim2']), speed=None, loop=self.loop)
+        sdk_conn = self.connect(engine)
+        run_until(self.loop, lambda: sdk_conn.anim_names.is_loaded)
+        self.assertEqual(sorted(sdk_conn.anim_names), ['anim1', 'anim2'])
+        self.assertEqual(engine.messages_sent, 3)
+
+    def test_replay_speed(self):
+        # 0.02s of messages replayed at half speed take at least 0.04s
+        engine = replay.ReplayEngine(anim_messages(['anim1', 'anim2']), speed=0.5, loop=self.loop)
+        start = self.loop.time()
+        self.connect(engine)
+        run_until(self.loop, lambda: engine._replays)
+        self.assertEqual(self.loop.run_until_complete(engine.wait_for_replay(timeout=5)), [3])
+        self.assertGreaterEqual(self.loop.time() - start, 0.03)
+
+    def test_replay_recording(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.addCleanup(os.remove, path + '.idx')
+
+        recorder = recording.SessionRecorder(path)
+        for i, (timestamp, msg) in enumerate(anim_messages(['anim1'])):
+            union = _clad_to_game_iface.MessageEngineToGame(**{msg.__class__.__name__: msg})
+            recorder.record(recording.DIRECTION_RECV, union.pack(), timestamp)
+            # SDK traffic in the recording isn't replayed
+            recorder.record(recording.DIRECTION_SEND, b'\x00\x01', timestamp)
+        recorder.close()
+
+        engine = replay.ReplayEngine(path, speed=None, loop=self.loop)
+        sdk_conn = self.connect(engine)
+        run_until(self.loop, lambda: sdk_conn.anim_names.is_loaded)
+        self.assertEqual(list(sdk_conn.anim_names), ['anim1'])
+        self.assertEqual(engine.messages_sent, 2)